@@ -76,6 +76,10 @@ ROOT_URLCONF = 'core_fixed.urls'
 
 
 WSGI_APPLICATION = 'core_fixed.wsgi.application'
+ASGI_APPLICATION = 'core_fixed.asgi.application'
+
+# "wsgi" (sync gunicorn workers) or "asgi" (gunicorn + uvicorn workers, see start.sh)
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
 
 
 # ---------------------------------------------------------
@@ -118,7 +122,9 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if DATABASE_URL:
     DATABASES['default'] = dj_database_url.config(
         default=DATABASE_URL,
-        conn_max_age=600,
+        # Persistent connections are per-thread; under ASGI they would leak
+        # across the sync_to_async thread pool, so close them per request.
+        conn_max_age=0 if SERVER_MODE == "asgi" else 600,
         conn_health_checks=True,
         ssl_require=True,
     )
@@ -191,6 +197,47 @@ GOOGLE_REDIRECT_URI = os.environ.get("GOOGLE_REDIRECT_URI", "http://127.0.0.1:80
 GOOGLE_AUTH_SCOPE = "https://www.googleapis.com/auth/fitness.activity.read https://www.googleapis.com/auth/fitness.heart_rate.read"
 
 
+# ---------------------------------------------------------
+# SODIUM TRACKING
+# ---------------------------------------------------------
+
+# "sync": recompute DailySummary/alerts inside the meal request.
+# "deferred": the request only stores the meal and marks the day dirty;
+# run `python manage.py process_dirty_summaries --loop` to apply them.
+SODIUM_SUMMARY_MODE = os.environ.get("SODIUM_SUMMARY_MODE", "sync")
+
+# Seconds a user's "today" summary/advice/alerts snapshot stays in the cache
+# (default local-memory cache). Writes invalidate it; entries are also checked
+# against the user's data version, so per-process caches never serve stale data.
+SODIUM_TODAY_CACHE_TIMEOUT = int(os.environ.get("SODIUM_TODAY_CACHE_TIMEOUT", "300"))
+
+# Device tokens resolved by DeviceTokenMiddleware are cached per process.
+# Revocation (device delete/save) invalidates locally; the TTL bounds how
+# long other worker processes keep accepting a revoked token.
+DEVICE_AUTH_CACHE_TTL = int(os.environ.get("DEVICE_AUTH_CACHE_TTL", "60"))
+DEVICE_AUTH_CACHE_SIZE = 10000
+
+# Device.last_seen is buffered in memory and written in one UPDATE per
+# interval (see hypertension/presence.py). A device counts as online if seen
+# within DEVICE_ONLINE_WINDOW seconds; keep it well above the flush interval.
+DEVICE_PRESENCE_FLUSH_INTERVAL = int(os.environ.get("DEVICE_PRESENCE_FLUSH_INTERVAL", "30"))
+DEVICE_ONLINE_WINDOW = int(os.environ.get("DEVICE_ONLINE_WINDOW", "300"))
+
+# Live event stream (api/events/, ASGI mode only): seconds between keepalives,
+# each of which also checks the user's data version for writes made by
+# other processes.
+SSE_HEARTBEAT_SECONDS = int(os.environ.get("SSE_HEARTBEAT_SECONDS", "20"))
+
+# Raw vendor payloads sent with watch readings are stored zlib-compressed in
+# WatchRawPayload, off the hot reading table. Keep one in every N per upload
+# (1 = all, 0 = none), drop any over MAX_BYTES of JSON, and let
+# `python manage.py prune_raw_payloads` delete those older than RETENTION_DAYS
+# (0 = keep forever).
+WATCH_RAW_PAYLOAD_SAMPLE_EVERY = int(os.environ.get("WATCH_RAW_PAYLOAD_SAMPLE_EVERY", "1"))
+WATCH_RAW_PAYLOAD_MAX_BYTES = 65536
+WATCH_RAW_PAYLOAD_RETENTION_DAYS = int(os.environ.get("WATCH_RAW_PAYLOAD_RETENTION_DAYS", "90"))
+
+
 # ---------------------------------------------------------
 # LOGGING (for debugging in production)
 # ---------------------------------------------------------
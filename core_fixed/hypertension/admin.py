@@ -1,7 +1,6 @@
 ﻿from django.contrib import admin
-from django.http import HttpResponse
-import csv
-from .models import WatchSync, Profile, BloodPressureReading
+from .exports import export_kind, stream_export
+from .models import Alert, BPReading, Meal, WatchBloodPressure, WatchSync, Profile, BloodPressureReading
 
 # Inline BP readings under Profile
 class BloodPressureInline(admin.TabularInline):
@@ -25,40 +24,75 @@ class WatchSyncAdmin(admin.ModelAdmin):
     readonly_fields = ('last_synced',)
     ordering = ('-last_synced',)
 
-# Export action for BP readings
-def export_bp_csv(modeladmin, request, queryset):
-    """
-    Export selected BloodPressureReading rows as CSV.
-    """
-    meta = modeladmin.model._meta
-    field_names = ['profile__user__username', 'systolic', 'diastolic', 'pulse', 'notes', 'recorded_at']
+# Streaming export actions (see exports.py); available on every model with an export.
+def export_csv(modeladmin, request, queryset):
+    """Stream the selected rows as CSV."""
+    return stream_export(queryset.order_by('pk'), export_kind(modeladmin.model), 'csv')
+export_csv.short_description = "Export selected rows as CSV"
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=blood_pressure_readings.csv'
-    writer = csv.writer(response)
+def export_ndjson(modeladmin, request, queryset):
+    """Stream the selected rows as NDJSON (one JSON object per line)."""
+    return stream_export(queryset.order_by('pk'), export_kind(modeladmin.model), 'ndjson')
+export_ndjson.short_description = "Export selected rows as NDJSON"
 
-    # header
-    writer.writerow(['username', 'systolic', 'diastolic', 'pulse', 'notes', 'recorded_at'])
+# Rows written by the ingest services (which also keep the daily summaries,
+# rollups and mirrors in step) or derived from them: browsable and exportable
+# here, never edited.
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
 
-    for obj in queryset:
-        username = obj.profile.user.username if obj.profile and obj.profile.user else ''
-        writer.writerow([
-            username,
-            obj.systolic,
-            obj.diastolic,
-            obj.pulse or '',
-            obj.notes or '',
-            obj.recorded_at.isoformat() if obj.recorded_at else ''
-        ])
+    def has_add_permission(self, request):
+        return False
 
-    return response
-export_bp_csv.short_description = "Export selected readings as CSV"
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(BloodPressureReading)
 class BloodPressureReadingAdmin(admin.ModelAdmin):
     list_display = ('profile', 'systolic', 'diastolic', 'pulse', 'recorded_at')
     list_filter = ('recorded_at',)
+    list_select_related = ('profile__user',)
     search_fields = ('profile__user__username',)
     date_hierarchy = 'recorded_at'
-    actions = [export_bp_csv]
-    readonly_fields = ('recorded_at',)
+    actions = [export_csv, export_ndjson]
+    readonly_fields = ('recorded_at',)
+
+@admin.register(WatchBloodPressure)
+class WatchBloodPressureAdmin(ReadOnlyAdmin):
+    list_display = ('watch_sync', 'systolic', 'diastolic', 'pulse', 'severity', 'recorded_at')
+    list_filter = ('severity',)
+    list_select_related = ('watch_sync__user',)
+    search_fields = ('watch_sync__user__username',)
+    date_hierarchy = 'recorded_at'
+    actions = [export_csv, export_ndjson]
+
+@admin.register(BPReading)
+class BPReadingAdmin(ReadOnlyAdmin):
+    list_display = ('user', 'source', 'systolic', 'diastolic', 'pulse', 'severity', 'recorded_at')
+    list_filter = ('source', 'severity')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'recorded_at'
+    actions = [export_csv, export_ndjson]
+
+@admin.register(Meal)
+class MealAdmin(ReadOnlyAdmin):
+    list_display = ('user', 'name', 'sodium_mg', 'source', 'recorded_at')
+    list_filter = ('source',)
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'name')
+    date_hierarchy = 'recorded_at'
+    actions = [export_csv, export_ndjson]
+
+@admin.register(Alert)
+class AlertAdmin(ReadOnlyAdmin):
+    list_display = ('user', 'date', 'threshold', 'severity', 'is_read', 'created_at')
+    list_filter = ('severity', 'threshold', 'is_read')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+    actions = [export_csv, export_ndjson]
@@ -0,0 +1,906 @@
+import base64
+import binascii
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Subquery, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import events
+from .data_version import bump_data_version
+from .downsample import lttb_indices
+from .models import BPAggregate, BPReading, BPStatistics, Profile, BloodPressureReading, WatchRawPayload, WatchSync, WatchBloodPressure
+from .utils import SEVERITY_KEYS, classify_bp
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 600)
+DASHBOARD_CHART_POINTS = 50
+BP_CHART_POINTS = getattr(settings, 'BP_CHART_POINTS', 500)
+BP_CHART_RAW_LIMIT = getattr(settings, 'BP_CHART_RAW_LIMIT', 20000)
+CHART_SOURCES = ('manual', 'watch')
+AGGREGATE_PERIODS = ('hour', 'day')
+# ACC/AHA treatment target (< 130/80) expressed as severity keys.
+TIME_IN_RANGE_SEVERITIES = ('normal', 'elevated')
+WATCH_INSERT_ATTEMPTS = 3
+RAW_PAYLOAD_SAMPLE_EVERY = getattr(settings, 'WATCH_RAW_PAYLOAD_SAMPLE_EVERY', 1)
+RAW_PAYLOAD_MAX_BYTES = getattr(settings, 'WATCH_RAW_PAYLOAD_MAX_BYTES', 65536)
+RAW_PAYLOAD_RETENTION_DAYS = getattr(settings, 'WATCH_RAW_PAYLOAD_RETENTION_DAYS', 90)
+
+
+def get_watch_sync(user):
+    sync, _ = WatchSync.objects.get_or_create(user=user)
+    return sync
+
+
+@transaction.atomic
+def add_watch_readings_bulk(user, readings, watch_sync=None):
+    """Insert watch BP readings for ``user`` with a single INSERT.
+
+    ``readings`` is a list of dicts with systolic, diastolic and optional
+    pulse, recorded_at and raw (kept per the raw payload policy, see
+    store_raw_payloads). Readings whose timestamp is already stored for
+    the watch (or repeated within the batch) are skipped, found with one
+    query on the (watch_sync, recorded_at) unique index. If an overlapping
+    upload stores some of the timestamps first, the insert is retried
+    without them (up to WATCH_INSERT_ATTEMPTS times). Returns the created
+    WatchBloodPressure rows.
+    """
+    if not readings:
+        return []
+    sync = watch_sync or get_watch_sync(user)
+    now = timezone.now()
+    pending = {}
+    for r in readings:
+        pending.setdefault(r.get('recorded_at') or now, r)
+    for attempt in range(1, WATCH_INSERT_ATTEMPTS + 1):
+        stored = WatchBloodPressure.objects.filter(
+            watch_sync=sync, recorded_at__range=(min(pending), max(pending)),
+        ).values_list('recorded_at', flat=True)
+        for recorded_at in stored:
+            pending.pop(recorded_at, None)
+        if not pending:
+            return []
+        objs = [
+            WatchBloodPressure(
+                watch_sync=sync,
+                systolic=r['systolic'],
+                diastolic=r['diastolic'],
+                pulse=r.get('pulse'),
+                recorded_at=recorded_at,
+            )
+            for recorded_at, r in pending.items()
+        ]
+        try:
+            with transaction.atomic():
+                WatchBloodPressure.objects.bulk_create(objs)
+            break
+        except IntegrityError:
+            if attempt == WATCH_INSERT_ATTEMPTS:
+                raise
+    raw = {recorded_at: r['raw'] for recorded_at, r in pending.items() if r.get('raw')}
+    store_raw_payloads([(obj, raw[obj.recorded_at]) for obj in objs if obj.recorded_at in raw])
+    mirror_bp_readings(user, 'watch', objs)
+    apply_bp_aggregate_inserts(user, 'watch', objs)
+    record_bp_statistics(user, 'watch', objs)
+    advance_latest_reading(user, 'latest_watch', max(objs, key=lambda o: o.recorded_at))
+    bump_data_version(user)
+    for obj in objs:
+        events.publish(user, 'watch_reading', {
+            'id': obj.pk,
+            'systolic': obj.systolic,
+            'diastolic': obj.diastolic,
+            'pulse': obj.pulse,
+            'recorded_at': obj.recorded_at.isoformat(),
+        })
+    return objs
+
+
+@transaction.atomic
+def sync_watch_batch(user, readings, battery_level=None, device_name=None):
+    """Store a batch of readings uploaded by the user's watch and record the
+    sync on WatchSync with one UPDATE. Returns the created readings.
+    """
+    sync = get_watch_sync(user)
+    created = add_watch_readings_bulk(user, readings, watch_sync=sync)
+    changes = {'is_connected': True, 'last_synced': timezone.now()}
+    if battery_level is not None:
+        changes['battery_level'] = battery_level
+    if device_name:
+        changes['device_name'] = device_name
+    # QuerySet.update() skips the WatchSync post_save signal; the reading
+    # insert (or the bump below) moves the data version for the dashboard.
+    WatchSync.objects.filter(pk=sync.pk).update(**changes)
+    if not created:
+        bump_data_version(user)
+    return created
+
+
+def advance_latest_reading(user, field, reading):
+    """Point ``Profile.<field>`` (latest_manual/latest_watch) at a newly
+    inserted ``reading`` unless it already points at a newer one. One UPDATE.
+    """
+    Profile.objects.filter(
+        Q(**{f'{field}__isnull': True}) | Q(**{f'{field}__recorded_at__lte': reading.recorded_at}),
+        user_id=getattr(user, 'pk', user),
+    ).update(**{field: reading})
+    invalidate_dashboard(user)
+
+
+def refresh_latest_readings(user):
+    """Recompute both latest-reading pointers (after edits and deletes). One UPDATE."""
+    user_id = getattr(user, 'pk', user)
+    Profile.objects.filter(user_id=user_id).update(
+        latest_manual=Subquery(
+            BloodPressureReading.objects.filter(profile__user_id=user_id)
+            .order_by('-recorded_at', '-pk').values('pk')[:1]
+        ),
+        latest_watch=Subquery(
+            WatchBloodPressure.objects.filter(watch_sync__user_id=user_id)
+            .order_by('-recorded_at', '-pk').values('pk')[:1]
+        ),
+    )
+    invalidate_dashboard(user)
+
+
+def _dashboard_cache_key(user_id):
+    return f'dashboard:{user_id}'
+
+
+def invalidate_dashboard(user):
+    """Drop the cached dashboard snapshot once the current transaction commits."""
+    key = _dashboard_cache_key(getattr(user, 'pk', user))
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _reading_card(reading):
+    if reading is None:
+        return None, None, None
+    label, color, advice, severity = classify_bp(reading.systolic, reading.diastolic)
+    card = {
+        'systolic': reading.systolic,
+        'diastolic': reading.diastolic,
+        'pulse': reading.pulse,
+        'recorded_at': reading.recorded_at,
+        'severity': severity,
+    }
+    return card, (label, color), advice
+
+
+def dashboard_snapshot(user):
+    """Everything the dashboard renders, as plain data, from the cache.
+
+    A hit costs one query (the profile's data version, which every reading
+    write bumps). A miss loads the profile with both latest-reading pointers,
+    the last chart points and the watch sync state: three queries however
+    long the history is.
+    """
+    version = Profile.objects.filter(user=user).values_list('data_version', flat=True).first()
+    if version is None:
+        Profile.objects.get_or_create(user=user)
+        version = 0
+    key = _dashboard_cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None and cached['version'] == version:
+        return cached['snapshot']
+
+    profile = Profile.objects.select_related('latest_manual', 'latest_watch').get(user=user)
+    chart = list(
+        BloodPressureReading.objects.filter(profile=profile)
+        .order_by('-recorded_at').values_list('recorded_at', 'systolic', 'diastolic')[:DASHBOARD_CHART_POINTS]
+    )[::-1]
+    watchsync = WatchSync.objects.filter(user=user).values(
+        'is_connected', 'device_name', 'battery_level', 'last_synced'
+    ).first()
+    latest, stage, advice = _reading_card(profile.latest_manual)
+    latest_watch, watch_stage, watch_advice = _reading_card(profile.latest_watch)
+    snapshot = {
+        'latest': latest,
+        'stage': stage,
+        'advice': advice,
+        'latest_watch': latest_watch,
+        'watch_stage': watch_stage,
+        'watch_advice': watch_advice,
+        'watchsync': watchsync,
+        'labels': [timezone.localtime(ts).strftime("%Y-%m-%d %H:%M") for ts, _, _ in chart],
+        'systolic': [s for _, s, _ in chart],
+        'diastolic': [d for _, _, d in chart],
+    }
+    cache.set(key, {'version': version, 'snapshot': snapshot}, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+TIMELINE_FIELDS = ('recorded_at', 'source', 'pk', 'systolic', 'diastolic', 'pulse', 'notes')
+
+
+def _timeline_query(user, cursor=None):
+    """The user's unified readings, newest first, after ``cursor``.
+
+    Rows are ordered by (recorded_at, source, source_id) descending and carry
+    the legacy pk as ``pk``, so links to the manual reading views keep working.
+    """
+    readings = BPReading.objects.filter(user=user)
+    if cursor is not None:
+        ts, source, pk = cursor
+        readings = readings.filter(
+            Q(recorded_at__lt=ts)
+            | Q(recorded_at=ts, source__lt=source)
+            | Q(recorded_at=ts, source=source, source_id__lt=pk)
+        )
+    return (
+        readings.annotate(legacy_pk=F('source_id'))
+        .order_by('-recorded_at', '-source', '-source_id')
+        .values_list('recorded_at', 'source', 'legacy_pk', 'systolic', 'diastolic', 'pulse', 'notes')
+    )
+
+
+def encode_timeline_cursor(row):
+    raw = f"{row['recorded_at'].isoformat()}|{row['source']}|{row['pk']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_timeline_cursor(value):
+    """(recorded_at, source, pk) from an opaque cursor; ValueError if malformed."""
+    try:
+        ts, source, pk = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        recorded_at = parse_datetime(ts)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if recorded_at is None or source not in ('manual', 'watch'):
+        raise ValueError('Invalid cursor')
+    return recorded_at, source, pk
+
+
+def bp_timeline(user, limit=50, cursor=None):
+    """Manual and watch readings merged newest-first by the database.
+
+    One (user, recorded_at) index range scan of the unified BPReading table
+    with ORDER BY/LIMIT, so the cost is bounded by ``limit`` rather than the
+    history length. ``cursor`` is a
+    decoded cursor from a previous page. Returns ``(rows, next_cursor)`` where
+    rows are dicts with TIMELINE_FIELDS and next_cursor is None on the last page.
+    """
+    rows = [
+        dict(zip(TIMELINE_FIELDS, values))
+        for values in _timeline_query(user, cursor)[:limit + 1]
+    ]
+    next_cursor = encode_timeline_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def bp_chart_buckets(user, points=50, batch=200):
+    """Chart arrays for the newest ``points`` distinct minutes of the timeline.
+
+    Walks the merged timeline newest-first in ``batch``-sized pages (normally
+    one) and buckets readings by local minute in a dict, keeping the newest
+    reading per source and minute. Linear in the rows read.
+    """
+    buckets = {}
+    cursor = None
+    while len(buckets) < points:
+        rows, next_cursor = bp_timeline(user, limit=batch, cursor=cursor)
+        for row in rows:
+            label = timezone.localtime(row['recorded_at']).strftime("%Y-%m-%d %H:%M")
+            if label not in buckets:
+                if len(buckets) == points:
+                    break
+                buckets[label] = {}
+            buckets[label].setdefault(row['source'], (row['systolic'], row['diastolic']))
+        if next_cursor is None:
+            break
+        cursor = decode_timeline_cursor(next_cursor)
+
+    labels = list(buckets)[::-1]
+
+    def series(source, index):
+        return [buckets[label][source][index] if source in buckets[label] else None for label in labels]
+    return {
+        'labels': labels,
+        'manual_systolic': series('manual', 0),
+        'manual_diastolic': series('manual', 1),
+        'watch_systolic': series('watch', 0),
+        'watch_diastolic': series('watch', 1),
+    }
+
+
+def _chart_queryset(user, source, start=None, end=None):
+    if source == 'manual':
+        qs = BloodPressureReading.objects.filter(profile__user=user)
+    elif source == 'watch':
+        qs = WatchBloodPressure.objects.filter(watch_sync__user=user)
+    else:
+        raise ValueError(f"source must be one of {', '.join(CHART_SOURCES)}")
+    if start is not None:
+        qs = qs.filter(day__gte=start)
+    if end is not None:
+        qs = qs.filter(day__lte=end)
+    return qs.order_by()
+
+
+def _aggregated_chart_rows(user, source, start, end, readings):
+    """(resolution, [(period_start, count, systolic_sum, diastolic_sum)]) for a
+    range too long to draw from raw rows: hourly BPAggregate rows, or daily
+    ones when even the hours exceed BP_CHART_RAW_LIMIT.
+
+    Aggregates that do not cover ``readings`` (not built yet) are not trusted;
+    the readings are then grouped by local day in the database instead.
+    """
+    hours = _aggregate_range(BPAggregate.objects.filter(user=user, source=source, period='hour'), start, end)
+    if hours[:BP_CHART_RAW_LIMIT + 1].count() <= BP_CHART_RAW_LIMIT:
+        resolution, aggregates = 'hour', hours
+    else:
+        resolution = 'day'
+        aggregates = _aggregate_range(BPAggregate.objects.filter(user=user, source=source, period='day'), start, end)
+    rows = list(aggregates.order_by('period_start').values_list(
+        'period_start', 'count', 'systolic_sum', 'diastolic_sum',
+    ))
+    if sum(row[1] for row in rows) <= BP_CHART_RAW_LIMIT:
+        resolution = 'day'
+        rows = [
+            (row['start'], row['count'], row['systolic_sum'], row['diastolic_sum'])
+            for row in _grouped_stats(source, 'day', readings).order_by('start')
+        ]
+    return resolution, rows
+
+
+def bp_chart_series(user, source, start=None, end=None, points=BP_CHART_POINTS):
+    """Downsampled BP chart data for ``source`` between local dates ``start``
+    and ``end`` (inclusive, either may be None for an open range).
+
+    A count capped at BP_CHART_RAW_LIMIT + 1 decides the resolution: ranges
+    within the limit are loaded as raw rows; larger ones are drawn from
+    hourly or daily means, so the rows pulled into Python stay bounded.
+    LTTB on the mean arterial pressure then picks at most ``points`` indices,
+    shared by the systolic and diastolic series.
+    """
+    readings = _chart_queryset(user, source, start, end)
+    resolution = 'raw'
+    if readings[:BP_CHART_RAW_LIMIT + 1].count() > BP_CHART_RAW_LIMIT:
+        resolution, aggregates = _aggregated_chart_rows(user, source, start, end, readings)
+        count = sum(row[1] for row in aggregates)
+        rows = [
+            (period_start, round(systolic / n, 1), round(diastolic / n, 1))
+            for period_start, n, systolic, diastolic in aggregates
+        ]
+    else:
+        rows = list(readings.order_by('recorded_at', 'pk').values_list('recorded_at', 'systolic', 'diastolic'))
+        count = len(rows)
+
+    keep = lttb_indices(
+        [r[0].timestamp() for r in rows],
+        [(r[1] + 2 * r[2]) / 3 for r in rows],
+        points,
+    )
+    return {
+        'source': source,
+        'start': start,
+        'end': end,
+        'count': count,
+        'resolution': resolution,
+        'labels': [timezone.localtime(rows[i][0]).strftime("%Y-%m-%d %H:%M") for i in keep],
+        'systolic': [rows[i][1] for i in keep],
+        'diastolic': [rows[i][2] for i in keep],
+    }
+
+
+def bp_stage_distribution(user, start=None, end=None, source=None):
+    """Reading counts per severity key between local dates ``start`` and
+    ``end`` (inclusive, open when None), optionally for one ``source``.
+
+    One GROUP BY over the unified table's (user, severity, day) index.
+    ``time_in_range`` is the share of readings within TIME_IN_RANGE_SEVERITIES
+    (None without readings). Rows not yet classified count as 'unknown'.
+    """
+    readings = BPReading.objects.filter(user=user)
+    if source is not None:
+        if source not in CHART_SOURCES:
+            raise ValueError(f"source must be one of {', '.join(CHART_SOURCES)}")
+        readings = readings.filter(source=source)
+    if start is not None:
+        readings = readings.filter(day__gte=start)
+    if end is not None:
+        readings = readings.filter(day__lte=end)
+    stages = dict.fromkeys(SEVERITY_KEYS, 0)
+    for severity, count in readings.order_by().values_list('severity').annotate(n=Count('pk')):
+        stages[severity or 'unknown'] += count
+    total = sum(stages.values())
+    in_range = sum(stages[key] for key in TIME_IN_RANGE_SEVERITIES)
+    return {
+        'total': total,
+        'stages': stages,
+        'time_in_range': round(in_range / total, 3) if total else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Hourly/daily BP aggregates
+# ---------------------------------------------------------------------------
+
+_READING_MODELS = {'manual': BloodPressureReading, 'watch': WatchBloodPressure}
+_READING_OWNER = {'manual': 'profile__user', 'watch': 'watch_sync__user'}
+_TRUNC = {'hour': TruncHour, 'day': TruncDay}
+_STAT_FIELDS = ('systolic', 'diastolic', 'pulse')
+
+
+def _local_midnight(day_date):
+    return timezone.make_aware(datetime.combine(day_date, time.min))
+
+
+def _aggregate_range(aggregates, start=None, end=None):
+    """Restrict BPAggregate rows to local dates ``start``..``end`` (inclusive)."""
+    if start is not None:
+        aggregates = aggregates.filter(period_start__gte=_local_midnight(start))
+    if end is not None:
+        aggregates = aggregates.filter(period_start__lt=_local_midnight(end + timedelta(days=1)))
+    return aggregates
+
+
+def aggregate_period_start(recorded_at, period):
+    """Aware start of the local hour/day containing ``recorded_at``."""
+    local = timezone.localtime(recorded_at).replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        local = timezone.make_aware(datetime.combine(local.date(), time.min))
+    return local
+
+
+def _stat_aggregates():
+    aggregates = {'count': Count('pk'), 'pulse_count': Count('pulse')}
+    for field in _STAT_FIELDS:
+        aggregates.update({
+            f'{field}_sum': Sum(field),
+            f'{field}_sum_sq': Sum(F(field) * F(field)),
+            f'{field}_min': Min(field),
+            f'{field}_max': Max(field),
+        })
+    return aggregates
+
+
+def _grouped_stats(source, period, readings):
+    """One row per (user, local hour/day) of ``readings``, with BPAggregate fields."""
+    return (
+        readings
+        .annotate(owner=F(_READING_OWNER[source]), start=_TRUNC[period]('recorded_at', tzinfo=timezone.get_current_timezone()))
+        .values('owner', 'start')
+        .annotate(**_stat_aggregates())
+        .order_by()
+    )
+
+
+def _upsert_bp_aggregates(source, period, rows):
+    fields = ['count', 'pulse_count'] + [
+        f'{field}_{stat}' for field in _STAT_FIELDS for stat in ('sum', 'sum_sq', 'min', 'max')
+    ]
+    aggregates = [
+        BPAggregate(
+            user_id=row['owner'],
+            source=source,
+            period=period,
+            period_start=row['start'],
+            **{name: row[name] if row[name] is not None or name.endswith(('_min', '_max')) else 0 for name in fields},
+        )
+        for row in rows
+    ]
+    BPAggregate.objects.bulk_create(
+        aggregates,
+        update_conflicts=True,
+        unique_fields=['user', 'source', 'period', 'period_start'],
+        update_fields=fields + ['last_updated'],
+    )
+    return len(aggregates)
+
+
+@transaction.atomic
+def rebuild_bp_aggregates(user_ids=None, since=None, until=None):
+    """Recompute hourly and daily BPAggregate rows from raw readings with one
+    grouped query and one upsert per source and period.
+
+    ``since``/``until`` are local dates (inclusive). Aggregates in scope whose
+    readings are gone are deleted. Returns the number of rows written.
+    """
+    written = 0
+    for source, model in _READING_MODELS.items():
+        readings = model.objects.all()
+        stale = BPAggregate.objects.filter(source=source)
+        if user_ids is not None:
+            readings = readings.filter(**{f'{_READING_OWNER[source]}__in': user_ids})
+            stale = stale.filter(user_id__in=user_ids)
+        if since is not None:
+            readings = readings.filter(recorded_at__gte=_local_midnight(since))
+        if until is not None:
+            readings = readings.filter(recorded_at__lt=_local_midnight(until + timedelta(days=1)))
+        stale = _aggregate_range(stale, since, until)
+        stale.delete()
+        for period in AGGREGATE_PERIODS:
+            written += _upsert_bp_aggregates(source, period, _grouped_stats(source, period, readings))
+    return written
+
+
+def _refresh_period(user_id, source, period, starts):
+    readings = _READING_MODELS[source].objects.filter(**{_READING_OWNER[source]: user_id})
+    span = timedelta(hours=1) if period == 'hour' else timedelta(days=1)
+    rows = [
+        row for row in _grouped_stats(source, period, readings.filter(
+            recorded_at__gte=min(starts), recorded_at__lt=max(starts) + span,
+        ))
+        if row['start'] in starts
+    ]
+    _upsert_bp_aggregates(source, period, rows)
+    BPAggregate.objects.filter(
+        user_id=user_id, source=source, period=period,
+        period_start__in=starts - {row['start'] for row in rows},
+    ).delete()
+
+
+def refresh_bp_aggregates(user, source, timestamps):
+    """Recompute, from raw readings, the hourly and daily aggregates of
+    ``user``'s ``source`` readings that contain any of ``timestamps``.
+
+    Used for edits and deletes, where a min/max cannot be "un-applied".
+    Costs a grouped query, an upsert and a delete per period, each bounded by
+    the affected hours/days.
+    """
+    user_id = getattr(user, 'pk', user)
+    for period in AGGREGATE_PERIODS:
+        starts = {aggregate_period_start(ts, period) for ts in timestamps}
+        if starts:
+            _refresh_period(user_id, source, period, starts)
+
+
+@transaction.atomic
+def apply_bp_aggregate_inserts(user, source, readings):
+    """Fold newly saved ``readings`` of ``user`` into their hour and day
+    aggregates in three queries, however many buckets they touch.
+
+    Missing buckets are first created empty (ignoring conflicts), then all
+    affected rows are locked, merged with the batch in Python and written
+    back with one bulk UPDATE. Concurrent ingests into the same new hour/day
+    therefore serialize on the row instead of overwriting each other's
+    counts. Rebuilding from raw readings is left to edits/deletes
+    (refresh_bp_aggregates) and the rebuild_bp_aggregates command.
+    """
+    user_id = getattr(user, 'pk', user)
+    deltas = defaultdict(lambda: {'count': 0, 'pulse_count': 0, **{
+        f'{field}_{stat}': 0 if stat.startswith('sum') else None
+        for field in _STAT_FIELDS for stat in ('sum', 'sum_sq', 'min', 'max')
+    }})
+    for reading in readings:
+        for period in AGGREGATE_PERIODS:
+            delta = deltas[period, aggregate_period_start(reading.recorded_at, period)]
+            delta['count'] += 1
+            if reading.pulse is not None:
+                delta['pulse_count'] += 1
+            for field in _STAT_FIELDS:
+                value = getattr(reading, field)
+                if value is None:
+                    continue
+                delta[f'{field}_sum'] += value
+                delta[f'{field}_sum_sq'] += value * value
+                delta[f'{field}_min'] = value if delta[f'{field}_min'] is None else min(delta[f'{field}_min'], value)
+                delta[f'{field}_max'] = value if delta[f'{field}_max'] is None else max(delta[f'{field}_max'], value)
+    if not deltas:
+        return
+
+    BPAggregate.objects.bulk_create(
+        [
+            BPAggregate(user_id=user_id, source=source, period=period, period_start=start)
+            for period, start in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    buckets = Q()
+    for period, start in deltas:
+        buckets |= Q(period=period, period_start=start)
+    # Lock in primary-key order so overlapping batches cannot deadlock.
+    aggregates = list(
+        BPAggregate.objects.select_for_update()
+        .filter(buckets, user_id=user_id, source=source).order_by('pk')
+    )
+    now = timezone.now()
+    for aggregate in aggregates:
+        for name, value in deltas[aggregate.period, aggregate.period_start].items():
+            if value is None:
+                continue
+            stored = getattr(aggregate, name)
+            if name.endswith('_min'):
+                value = value if stored is None else min(stored, value)
+            elif name.endswith('_max'):
+                value = value if stored is None else max(stored, value)
+            else:
+                value += stored
+            setattr(aggregate, name, value)
+        aggregate.last_updated = now
+    fields = ['count', 'pulse_count', 'last_updated'] + [
+        f'{field}_{stat}' for field in _STAT_FIELDS for stat in ('sum', 'sum_sq', 'min', 'max')
+    ]
+    BPAggregate.objects.bulk_update(aggregates, fields)
+
+
+# ---------------------------------------------------------------------------
+# Unified BPReading table
+# ---------------------------------------------------------------------------
+
+_MIRROR_FIELDS = ['user', 'systolic', 'diastolic', 'pulse', 'notes', 'recorded_at', 'day', 'severity']
+
+
+def _upsert_mirrors(source, owned_readings):
+    BPReading.objects.bulk_create(
+        [
+            BPReading(
+                user_id=user_id,
+                source=source,
+                source_id=reading.pk,
+                systolic=reading.systolic,
+                diastolic=reading.diastolic,
+                pulse=reading.pulse,
+                notes=getattr(reading, 'notes', ''),
+                recorded_at=reading.recorded_at,
+            )
+            for user_id, reading in owned_readings
+        ],
+        update_conflicts=True,
+        unique_fields=['source', 'source_id'],
+        update_fields=_MIRROR_FIELDS,
+    )
+
+
+def mirror_bp_readings(user, source, readings):
+    """Insert or update the BPReading copies of saved legacy ``readings``
+    (BloodPressureReading for 'manual', WatchBloodPressure for 'watch') in one
+    upsert keyed on (source, source_id).
+    """
+    user_id = getattr(user, 'pk', user)
+    _upsert_mirrors(source, [(user_id, reading) for reading in readings])
+
+
+def unmirror_bp_reading(source, pk):
+    BPReading.objects.filter(source=source, source_id=pk).delete()
+
+
+def sync_bp_readings(user_ids=None, chunk_size=5000):
+    """Repair BPReading from the legacy tables: upsert every legacy reading
+    (in primary-key chunks) and delete copies whose legacy row is gone.
+
+    Needed only for writes that bypass model signals (QuerySet.update(), raw
+    SQL). Returns ``(upserted, deleted)``.
+    """
+    upserted = deleted = 0
+    for source, model in _READING_MODELS.items():
+        owner = _READING_OWNER[source]
+        readings = model.objects.order_by('pk')
+        copies = BPReading.objects.filter(source=source)
+        if user_ids is not None:
+            readings = readings.filter(**{f'{owner}__in': user_ids})
+            copies = copies.filter(user_id__in=user_ids)
+        last_pk = 0
+        while True:
+            chunk = list(readings.filter(pk__gt=last_pk).annotate(owner=F(owner))[:chunk_size])
+            if not chunk:
+                break
+            _upsert_mirrors(source, [(reading.owner, reading) for reading in chunk])
+            upserted += len(chunk)
+            last_pk = chunk[-1].pk
+        deleted += copies.exclude(source_id__in=model.objects.values('pk')).delete()[0]
+    return upserted, deleted
+
+
+# ---------------------------------------------------------------------------
+# Raw watch payloads
+# ---------------------------------------------------------------------------
+
+def store_raw_payloads(pairs):
+    """Compress and store the raw payloads of ``(reading, payload)`` pairs.
+
+    Skips empty payloads, keeps every RAW_PAYLOAD_SAMPLE_EVERY-th of the rest
+    (1 keeps all, 0 none) and drops payloads over RAW_PAYLOAD_MAX_BYTES of
+    JSON. Returns the number stored.
+    """
+    if RAW_PAYLOAD_SAMPLE_EVERY < 1:
+        return 0
+    payloads = []
+    for index, (reading, payload) in enumerate(pair for pair in pairs if pair[1]):
+        if index % RAW_PAYLOAD_SAMPLE_EVERY:
+            continue
+        data, size = WatchRawPayload.encode(payload)
+        if size > RAW_PAYLOAD_MAX_BYTES:
+            logger.warning("Dropping %d-byte raw payload of watch reading %s", size, reading.pk)
+            continue
+        payloads.append(WatchRawPayload(reading=reading, data=data, size=size))
+    WatchRawPayload.objects.bulk_create(payloads)
+    return len(payloads)
+
+
+def prune_raw_payloads(retention_days=RAW_PAYLOAD_RETENTION_DAYS, chunk_size=5000):
+    """Delete raw payloads of readings older than ``retention_days`` (0 keeps
+    everything), in primary-key chunks. Returns the number deleted."""
+    if not retention_days:
+        return 0
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = WatchRawPayload.objects.filter(reading__recorded_at__lt=cutoff)
+    deleted = 0
+    while True:
+        pks = list(expired.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        deleted += WatchRawPayload.objects.filter(pk__in=pks).delete()[0]
+
+
+# ---------------------------------------------------------------------------
+# Rolling BP statistics
+# ---------------------------------------------------------------------------
+
+BP_STAT_WINDOWS = (7, 30)
+# Local hours [start, end) whose readings count as morning / evening ones.
+MORNING_HOURS = (4, 12)
+EVENING_HOURS = (18, 24)
+_STAT_STATE_FIELDS = [
+    field.name for field in BPStatistics._meta.concrete_fields
+    if field.name not in ('id', 'user', 'source', 'window_days')
+]
+
+
+def _add_to_statistics(stats, recorded_at, systolic, diastolic):
+    """Fold one reading, not older than any already in ``stats``, into it."""
+    stats.count += 1
+    for field, value in (('systolic', systolic), ('diastolic', diastolic)):
+        # Welford: running mean and sum of squared deviations.
+        mean = getattr(stats, f'{field}_mean')
+        delta = value - mean
+        mean += delta / stats.count
+        setattr(stats, f'{field}_mean', mean)
+        setattr(stats, f'{field}_m2', getattr(stats, f'{field}_m2') + delta * (value - mean))
+    hour = timezone.localtime(recorded_at).hour
+    for part, (first, last) in (('morning', MORNING_HOURS), ('evening', EVENING_HOURS)):
+        if first <= hour < last:
+            setattr(stats, f'{part}_count', getattr(stats, f'{part}_count') + 1)
+            setattr(stats, f'{part}_systolic_sum', getattr(stats, f'{part}_systolic_sum') + systolic)
+            setattr(stats, f'{part}_diastolic_sum', getattr(stats, f'{part}_diastolic_sum') + diastolic)
+    if stats.last_systolic is not None:
+        stats.arv_count += 1
+        stats.systolic_arv_sum += abs(systolic - stats.last_systolic)
+        stats.diastolic_arv_sum += abs(diastolic - stats.last_diastolic)
+    stats.last_systolic = systolic
+    stats.last_diastolic = diastolic
+    stats.last_recorded_at = recorded_at
+
+
+def _window_start(as_of, days):
+    return as_of - timedelta(days=days - 1)
+
+
+def _build_bp_statistics(user_id, source, as_of, reading_model=BPReading, statistics_model=BPStatistics):
+    """Fresh statistics rows (one per window) for ``user_id``'s ``source``
+    readings, from one chronological scan of BPReading over the longest window.
+
+    Migrations pass their historical models as ``reading_model`` and
+    ``statistics_model``."""
+    windows = {
+        days: statistics_model(user_id=user_id, source=source, window_days=days, as_of=as_of)
+        for days in BP_STAT_WINDOWS
+    }
+    starts = {days: _window_start(as_of, days) for days in windows}
+    readings = reading_model.objects.filter(
+        user_id=user_id, source=source, day__gte=min(starts.values()), day__lte=as_of,
+    ).order_by('recorded_at', 'pk').values_list('day', 'recorded_at', 'systolic', 'diastolic')
+    for day, recorded_at, systolic, diastolic in readings.iterator(chunk_size=2000):
+        for days, stats in windows.items():
+            if day >= starts[days]:
+                _add_to_statistics(stats, recorded_at, systolic, diastolic)
+    return list(windows.values())
+
+
+@transaction.atomic
+def rebuild_bp_statistics(user, sources=CHART_SOURCES):
+    """Recompute ``user``'s statistics rows for the windows ending today from
+    BPReading and store them with one upsert. Used by the write path (new
+    day, edits, deletes, back-fills) and the daily rebuild_bp_statistics
+    command. Returns the rows."""
+    user_id = getattr(user, 'pk', user)
+    # Lock the stored rows first: a concurrent insert either commits before
+    # the scan below (and is seen by it) or waits and folds into the result.
+    list(BPStatistics.objects.select_for_update().filter(
+        user_id=user_id, source__in=sources,
+    ).values_list('pk', flat=True))
+    as_of = timezone.localdate()
+    rows = [row for source in sources for row in _build_bp_statistics(user_id, source, as_of)]
+    BPStatistics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'source', 'window_days'],
+        update_fields=_STAT_STATE_FIELDS,
+    )
+    return rows
+
+
+@transaction.atomic
+def record_bp_statistics(user, source, readings):
+    """Fold newly saved ``readings`` of ``user`` into the ``source``
+    statistics rows: one locked SELECT and one bulk UPDATE, however long the
+    history is.
+
+    The rows are rebuilt instead when they are missing or left from an
+    earlier day (their windows have moved), or when a reading is older than
+    the newest one already folded in (a back-filled history cannot be
+    appended in order).
+    """
+    user_id = getattr(user, 'pk', user)
+    as_of = timezone.localdate()
+    rows = list(BPStatistics.objects.select_for_update().filter(user_id=user_id, source=source))
+    readings = sorted(readings, key=lambda r: r.recorded_at)
+    if len(rows) < len(BP_STAT_WINDOWS) or any(
+        stats.as_of != as_of or (stats.last_recorded_at and readings[0].recorded_at < stats.last_recorded_at)
+        for stats in rows
+    ):
+        rebuild_bp_statistics(user_id, [source])
+        return
+    now = timezone.now()
+    for stats in rows:
+        start = _window_start(as_of, stats.window_days)
+        for reading in readings:
+            if start <= timezone.localdate(reading.recorded_at) <= as_of:
+                _add_to_statistics(stats, reading.recorded_at, reading.systolic, reading.diastolic)
+        stats.last_updated = now
+    BPStatistics.objects.bulk_update(rows, _STAT_STATE_FIELDS)
+
+
+def _rounded(value):
+    return round(value, 1) if value is not None else None
+
+
+def _statistics_payload(stats):
+    def part(name):
+        count = getattr(stats, f'{name}_count')
+        return {
+            'count': count,
+            'systolic': _rounded(getattr(stats, f'{name}_systolic_sum') / count) if count else None,
+            'diastolic': _rounded(getattr(stats, f'{name}_diastolic_sum') / count) if count else None,
+        }
+
+    return {
+        'start': str(_window_start(stats.as_of, stats.window_days)),
+        'end': str(stats.as_of),
+        'count': stats.count,
+        'systolic': {
+            'mean': _rounded(stats.systolic_mean) if stats.count else None,
+            'sd': _rounded(stats.systolic_sd),
+            'arv': _rounded(stats.systolic_arv),
+        },
+        'diastolic': {
+            'mean': _rounded(stats.diastolic_mean) if stats.count else None,
+            'sd': _rounded(stats.diastolic_sd),
+            'arv': _rounded(stats.diastolic_arv),
+        },
+        'morning': part('morning'),
+        'evening': part('evening'),
+    }
+
+
+def bp_statistics(user):
+    """``user``'s rolling BP statistics as plain data:
+    {source: {'7d': {...}, '30d': {...}}}.
+
+    Read-only, one query. Rows are kept current by the write path and the
+    daily ``rebuild_bp_statistics`` run; a row not rebuilt since an earlier
+    day is served as stored (its ``end`` says so), a missing one as empty.
+    """
+    user_id = getattr(user, 'pk', user)
+    stored = {
+        (stats.source, stats.window_days): stats
+        for stats in BPStatistics.objects.filter(user_id=user_id)
+    }
+    as_of = timezone.localdate()
+    return {
+        source: {
+            f'{days}d': _statistics_payload(
+                stored.get((source, days)) or BPStatistics(source=source, window_days=days, as_of=as_of)
+            )
+            for days in BP_STAT_WINDOWS
+        }
+        for source in CHART_SOURCES
+    }
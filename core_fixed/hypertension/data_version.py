@@ -0,0 +1,110 @@
+"""
+Per-user data version for conditional GETs.
+
+Every write that can change what the read APIs return (meals, summaries,
+readings, alerts) calls `bump_data_version(user)`, one UPDATE on the user's
+Profile. Read views decorated with `@conditional_on_data_version` look up
+(version, changed_at) once and answer `If-None-Match` / `If-Modified-Since`
+with 304 before running any aggregation.
+
+The local date is part of the ETag and Last-Modified never predates local
+midnight, because "today"-relative responses change at day rollover even
+without a write.
+"""
+from datetime import datetime, time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Profile
+
+
+def bump_data_version(user):
+    """Mark `user`'s data (a User or its pk) as changed.
+
+    The UPDATE runs once the current transaction commits, so a poll can never
+    pair the new version with the old data and get a stale 304 later.
+    """
+    user_id = getattr(user, 'pk', user)
+    transaction.on_commit(lambda: Profile.objects.filter(user_id=user_id).update(
+        data_version=F('data_version') + 1,
+        data_changed_at=timezone.now(),
+    ))
+
+
+def _stamp_query(user):
+    return Profile.objects.filter(user_id=user.pk).values_list('data_version', 'data_changed_at')
+
+
+def poll_data_version(user):
+    """The user's current data version (None without a Profile), for
+    long-lived streams that check it periodically.
+
+    The DB connection is closed right after the lookup, so a stream holds no
+    connection between checks (run it in the stream's own thread, i.e. with
+    the default thread-sensitive sync_to_async).
+    """
+    try:
+        stamp = _stamp_query(user).first()
+    finally:
+        connection.close()
+    return stamp[0] if stamp else None
+
+
+def _validators(user, stamp):
+    """(etag, last_modified timestamp) for a (version, changed_at) stamp, or Nones."""
+    if stamp is None:
+        return None, None
+    version, changed_at = stamp
+    today = timezone.localdate()
+    etag = quote_etag(f'{user.pk}-{version}-{today.isoformat()}')
+    midnight = timezone.make_aware(datetime.combine(today, time.min))
+    last_modified = max(changed_at, midnight) if changed_at else midnight
+    return etag, int(last_modified.timestamp())
+
+
+def _finish(request, response, etag, last_modified):
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+    # Responses are per user; keep shared caches from reusing them.
+    response.headers.setdefault('Cache-Control', 'private, no-cache')
+    return response
+
+
+def conditional_on_data_version(view):
+    """Like django's `condition()`, with validators from the user's data
+    version (one indexed lookup) and support for async views.
+
+    The looked-up version is left on `request.data_version` for the view.
+    Apply below `login_required`.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            user = await request.auser()
+            stamp = await _stamp_query(user).afirst()
+            request.data_version = stamp[0] if stamp else None
+            etag, last_modified = _validators(user, stamp)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _finish(request, response, etag, last_modified)
+    else:
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            stamp = _stamp_query(request.user).first()
+            request.data_version = stamp[0] if stamp else None
+            etag, last_modified = _validators(request.user, stamp)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finish(request, response, etag, last_modified)
+    return inner
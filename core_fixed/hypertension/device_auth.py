@@ -0,0 +1,108 @@
+"""
+Shared device-token authentication.
+
+Devices authenticate with `Authorization: Token <token>` or `X-Device-Token`.
+Token -> (device_id, user_id, name) lookups are kept in a small in-process
+TTL/LRU cache, so a warm token costs no queries: the request gets a Device and
+an owner User built from the cached ids (other fields load lazily if touched).
+Entries are dropped when a Device is saved or deleted in this process (see
+signals.py); other processes pick up revocations when the TTL expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Device
+
+
+class TokenCache:
+    """Thread-safe LRU mapping of token -> (device_id, user_id, name) with a TTL."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return value
+
+    def set(self, token, value):
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    ttl=getattr(settings, 'DEVICE_AUTH_CACHE_TTL', 60),
+    max_entries=getattr(settings, 'DEVICE_AUTH_CACHE_SIZE', 10000),
+)
+
+
+def get_request_token(request):
+    """Return the device token carried by the request, or None."""
+    auth_hdr = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_hdr:
+        if auth_hdr.lower().startswith('token '):
+            return auth_hdr.split(None, 1)[1].strip() or None
+        # Session/basic auth headers are not device tokens.
+        if ' ' not in auth_hdr.strip():
+            return auth_hdr.strip()
+    return request.META.get('HTTP_X_DEVICE_TOKEN') or None
+
+
+def authenticate_token(token):
+    """Resolve a token to a Device (with its owner attached) or None."""
+    if not token:
+        return None
+    token = str(token).strip().lower()
+    cached = token_cache.get(token)
+    if cached is None:
+        try:
+            cached = Device.objects.filter(token=token).values_list('id', 'user_id', 'name').first()
+        except ValidationError:
+            # Not a UUID, so it cannot match any device.
+            return None
+        if cached is None:
+            return None
+        token_cache.set(token, cached)
+
+    device_id, user_id, name = cached
+    # Instances built from cached ids, like `.only()` results: no query now,
+    # deferred fields load on first access.
+    device = Device.from_db(DEFAULT_DB_ALIAS, ['id', 'user_id', 'name', 'token'], [device_id, user_id, name, token])
+    device.user = get_user_model().from_db(DEFAULT_DB_ALIAS, ['id'], [user_id])
+    return device
+
+
+def authenticate_request(request):
+    return authenticate_token(get_request_token(request))
+
+
+def invalidate_token(token):
+    token_cache.invalidate(str(token).strip().lower())
+
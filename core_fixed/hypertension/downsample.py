@@ -0,0 +1,78 @@
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling for chart series.
+
+`lttb_indices(x, y, threshold)` picks at most `threshold` points of a series
+(always keeping the first and last) that preserve its visual shape, so a long
+BP history can be drawn from a bounded payload.
+
+The per-bucket triangle areas are computed with NumPy when it is installed;
+otherwise a pure-Python loop gives the same result. NumPy is optional and not
+listed in requirements.txt.
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+
+def _bucket_bounds(n, threshold):
+    """(start, end) index ranges of the threshold - 2 middle buckets."""
+    every = (n - 2) / (threshold - 2)
+    return [
+        (int(i * every) + 1, int((i + 1) * every) + 1)
+        for i in range(threshold - 2)
+    ] + [(n - 1, n)]
+
+
+def _lttb_numpy(x, y, threshold):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bounds = _bucket_bounds(len(x), threshold)
+    selected = [0]
+    a = 0
+    for (start, end), (next_start, next_end) in zip(bounds, bounds[1:]):
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected.append(a)
+    selected.append(len(x) - 1)
+    return selected
+
+
+def _lttb_python(x, y, threshold):
+    bounds = _bucket_bounds(len(x), threshold)
+    selected = [0]
+    a = 0
+    for (start, end), (next_start, next_end) in zip(bounds, bounds[1:]):
+        count = next_end - next_start
+        avg_x = sum(x[next_start:next_end]) / count
+        avg_y = sum(y[next_start:next_end]) / count
+        best_area = -1.0
+        for i in range(start, end):
+            area = abs((x[a] - avg_x) * (y[i] - y[a]) - (x[a] - x[i]) * (avg_y - y[a]))
+            if area > best_area:
+                best_area, best = area, i
+        a = best
+        selected.append(a)
+    selected.append(len(x) - 1)
+    return selected
+
+
+def lttb_indices(x, y, threshold):
+    """Indices (ascending) of the points LTTB keeps from the series (x, y).
+
+    `x` must be increasing. Series no longer than `threshold` are returned
+    whole; thresholds below 3 keep just the end points.
+    """
+    n = len(x)
+    if n <= threshold:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:max(threshold, 0)]
+    if np is not None:
+        return _lttb_numpy(x, y, threshold)
+    return _lttb_python(x, y, threshold)
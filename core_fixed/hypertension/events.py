@@ -0,0 +1,80 @@
+"""
+In-process fan-out of live user events for the SSE stream.
+
+Services call `publish(user, event, data)` when a write commits; each open
+`api/events/` stream of that user holds an asyncio queue registered here and
+is woken with `call_soon_threadsafe`, so idle streams cost no work until
+something happens (plus a periodic heartbeat).
+
+Fan-out is per process: a stream only sees events published by the worker
+process serving it. The SSE view covers writes made elsewhere (other web
+workers, the deferred summary worker) by checking the user's data version on
+each heartbeat and sending a `refresh` event when it moved.
+"""
+import asyncio
+import logging
+import threading
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker:
+    """user_id -> open subscriber queues, safe to publish to from any thread."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register a queue for `user_id` on the running event loop."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        message = {'event': event, 'data': data}
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                # The stream's loop is gone; its finally-block unsubscribes.
+                pass
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # A stalled client loses events rather than growing memory; the
+        # heartbeat version check still tells it to refresh.
+        logger.debug("Dropping %s event for a full SSE queue", message['event'])
+
+
+broker = EventBroker()
+
+
+def publish(user, event, data):
+    """Send `event` to `user`'s open streams once the current transaction commits."""
+    user_id = getattr(user, 'pk', user)
+    if not broker.subscriber_count(user_id):
+        return
+    transaction.on_commit(lambda: broker.publish(user_id, event, data))
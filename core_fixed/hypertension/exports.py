@@ -0,0 +1,152 @@
+"""
+Streaming CSV / NDJSON exports of readings, meals and alerts.
+
+Each entry of EXPORTS names a model, the lookup of the user owning a row and
+the exported columns as `values_list` paths, so related fields (the owner's
+username, a meal's device) are joined in SQL instead of fetched per row.
+`stream_export()` feeds a StreamingHttpResponse from
+`values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)`: rows are encoded
+as they are read, and memory stays flat however many rows are exported.
+
+Used by the admin export actions and the per-user `api/export/<kind>/`
+download.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import Alert, BloodPressureReading, BPReading, Meal, WatchBloodPressure
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# kind -> model, owner lookup, file name and (column, values_list path) pairs.
+EXPORTS = {
+    'bp': {
+        'model': BloodPressureReading,
+        'owner': 'profile__user',
+        'filename': 'blood_pressure_readings',
+        'columns': (
+            ('username', 'profile__user__username'),
+            ('systolic', 'systolic'),
+            ('diastolic', 'diastolic'),
+            ('pulse', 'pulse'),
+            ('severity', 'severity'),
+            ('notes', 'notes'),
+            ('recorded_at', 'recorded_at'),
+        ),
+    },
+    'watch': {
+        'model': WatchBloodPressure,
+        'owner': 'watch_sync__user',
+        'filename': 'watch_blood_pressure_readings',
+        'columns': (
+            ('username', 'watch_sync__user__username'),
+            ('systolic', 'systolic'),
+            ('diastolic', 'diastolic'),
+            ('pulse', 'pulse'),
+            ('severity', 'severity'),
+            ('recorded_at', 'recorded_at'),
+        ),
+    },
+    'readings': {
+        'model': BPReading,
+        'owner': 'user',
+        'filename': 'all_blood_pressure_readings',
+        'columns': (
+            ('username', 'user__username'),
+            ('source', 'source'),
+            ('systolic', 'systolic'),
+            ('diastolic', 'diastolic'),
+            ('pulse', 'pulse'),
+            ('severity', 'severity'),
+            ('notes', 'notes'),
+            ('recorded_at', 'recorded_at'),
+        ),
+    },
+    'meals': {
+        'model': Meal,
+        'owner': 'user',
+        'filename': 'meals',
+        'columns': (
+            ('username', 'user__username'),
+            ('name', 'name'),
+            ('sodium_mg', 'sodium_mg'),
+            ('portion', 'portion'),
+            ('source', 'source'),
+            ('device', 'device__name'),
+            ('day', 'day'),
+            ('recorded_at', 'recorded_at'),
+        ),
+    },
+    'alerts': {
+        'model': Alert,
+        'owner': 'user',
+        'filename': 'sodium_alerts',
+        'columns': (
+            ('username', 'user__username'),
+            ('date', 'date'),
+            ('threshold', 'threshold'),
+            ('severity', 'severity'),
+            ('message', 'message'),
+            ('sodium_total', 'sodium_total'),
+            ('threshold_percent', 'threshold_percent'),
+            ('is_read', 'is_read'),
+            ('created_at', 'created_at'),
+        ),
+    },
+}
+_EXPORT_BY_MODEL = {spec['model']: kind for kind, spec in EXPORTS.items()}
+
+
+def export_kind(model):
+    """The EXPORTS key for `model`, or None when it has no export."""
+    return _EXPORT_BY_MODEL.get(model)
+
+
+def user_export_queryset(kind, user):
+    """All of `user`'s rows for export `kind`, oldest first."""
+    spec = EXPORTS[kind]
+    order = 'created_at' if spec['model'] is Alert else 'recorded_at'
+    return spec['model'].objects.filter(**{spec['owner']: user}).order_by(order, 'pk')
+
+
+class _Echo:
+    """File-like object whose write() hands back what csv.writer wrote."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(names, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow([
+            '' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        ])
+
+
+def _ndjson_lines(names, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(queryset, kind, fmt='csv'):
+    """A StreamingHttpResponse attachment of `queryset` (rows of export
+    `kind`) as CSV or NDJSON. One query, read in EXPORT_CHUNK_SIZE chunks."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    spec = EXPORTS[kind]
+    names = [name for name, _ in spec['columns']]
+    rows = queryset.values_list(*(path for _, path in spec['columns'])).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lines = _csv_lines(names, rows) if fmt == 'csv' else _ndjson_lines(names, rows)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename={spec["filename"]}.{fmt}'
+    return response
@@ -0,0 +1,48 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from ...models import BloodPressureReading, BPReading, WatchBloodPressure
+from ...utils import classify_bp_batch
+
+MODELS = {
+    'bp': BloodPressureReading,
+    'watch': WatchBloodPressure,
+    'unified': BPReading,
+}
+
+
+class Command(BaseCommand):
+    help = 'Fill the `severity` column of unclassified BP readings (migration 0022 does the initial fill) or reclassify all with --all'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append', help='Only backfill this table (repeatable)')
+        parser.add_argument('--all', action='store_true', help='Reclassify every row, not just unclassified ones')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows classified per batch')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for name in options.get('model') or sorted(MODELS):
+            model = MODELS[name]
+            rows = model.objects.order_by('pk')
+            if not options['all']:
+                rows = rows.filter(severity__isnull=True)
+            total = 0
+            last_pk = 0
+            while True:
+                chunk = list(rows.filter(pk__gt=last_pk).values_list('pk', 'systolic', 'diastolic')[:chunk_size])
+                if not chunk:
+                    break
+                pks, systolics, diastolics = zip(*chunk)
+                # Classify the whole chunk at once, then one UPDATE per severity.
+                by_severity = defaultdict(list)
+                for pk, severity in zip(pks, classify_bp_batch(systolics, diastolics)):
+                    by_severity[severity].append(pk)
+                for severity, severity_pks in by_severity.items():
+                    total += model.objects.filter(pk__in=severity_pks).update(severity=severity)
+                last_pk = pks[-1]
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'{name}: classified {total} rows'))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ...models import Meal, BloodPressureReading, BPReading, WatchBloodPressure
+
+MODELS = {
+    'meal': Meal,
+    'bp': BloodPressureReading,
+    'watch': WatchBloodPressure,
+    'unified': BPReading,
+}
+
+
+class Command(BaseCommand):
+    help = ('Fill the local `day` column of meals and BP readings where it is missing (migration 0014 '
+            'fills existing rows; use this to repair rows written with QuerySet.update())')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append', help='Only backfill this table (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Primary-key range updated per statement')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        local_day = TruncDate('recorded_at', tzinfo=timezone.get_current_timezone())
+        for name in options.get('model') or sorted(MODELS):
+            model = MODELS[name]
+            pending = model.objects.filter(day__isnull=True)
+            bounds = pending.aggregate(lo=Min('pk'), hi=Max('pk'))
+            total = 0
+            if bounds['lo'] is not None:
+                # Walk primary-key ranges so each UPDATE touches a bounded set of
+                # rows and no long transaction/lock is held on the table.
+                for start in range(bounds['lo'], bounds['hi'] + 1, chunk_size):
+                    total += pending.filter(pk__gte=start, pk__lt=start + chunk_size).update(day=local_day)
+                    if options['sleep']:
+                        time.sleep(options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'{name}: filled day on {total} rows'))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ...models import DailySummary
+from ...sodium_services import generate_weekly_reports, week_start
+
+
+class Command(BaseCommand):
+    help = 'Materialize WeeklyReport rows (one per user and completed ISO week) from DailySummary data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Only generate for this user')
+        parser.add_argument('--weeks', type=int, help='Only the last N completed weeks (default: all)')
+        parser.add_argument('--since', type=str, help='First day to cover (YYYY-MM-DD); widened to its week')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per grouped query')
+
+    def handle(self, *args, **options):
+        # The current week is served live by the API, so stop at last Sunday.
+        until = week_start(timezone.localdate()) - timedelta(days=1)
+        since = None
+        if options.get('since'):
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since must be YYYY-MM-DD')
+        elif options.get('weeks'):
+            since = until - timedelta(weeks=options['weeks']) + timedelta(days=1)
+
+        users = DailySummary.objects.filter(date__lte=until)
+        if since is not None:
+            users = users.filter(date__gte=week_start(since))
+        if options.get('username'):
+            User = get_user_model()
+            try:
+                users = users.filter(user=User.objects.get(username=options['username']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+        user_ids = sorted(set(users.values_list('user_id', flat=True).distinct().order_by()))
+
+        chunk_size = options['chunk_size']
+        total = 0
+        for i in range(0, len(user_ids), chunk_size):
+            total += generate_weekly_reports(user_ids=user_ids[i:i + chunk_size], since=since, until=until)
+
+        self.stdout.write(self.style.SUCCESS(f'Generated {total} weekly reports for {len(user_ids)} users'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...sodium_services import process_dirty_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute DailySummary/Alert rows for user-days marked dirty by deferred meal ingestion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Dirty user-days to drain per pass')
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll for new dirty user-days')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty (with --loop)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            processed = process_dirty_summaries(batch_size=batch_size)
+            total += processed
+            if processed:
+                self.stdout.write(f'Recomputed {processed} user-days')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Done: {total} user-days recomputed'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ...bp_services import RAW_PAYLOAD_RETENTION_DAYS, prune_raw_payloads
+
+
+class Command(BaseCommand):
+    help = 'Delete compressed raw watch payloads older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=RAW_PAYLOAD_RETENTION_DAYS,
+            help='Keep payloads of readings from the last N days (default: WATCH_RAW_PAYLOAD_RETENTION_DAYS; 0 keeps all)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Payloads deleted per statement')
+
+    def handle(self, *args, **options):
+        deleted = prune_raw_payloads(retention_days=options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} raw payloads'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.utils.dateparse import parse_date
+
+from ...models import Profile
+from ...bp_services import rebuild_bp_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly/daily BPAggregate rows from raw BP readings (repair; migration 0018 does the initial fill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Only rebuild this user')
+        parser.add_argument('--since', type=str, help='First local day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Users per grouped query')
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get('since'):
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since must be YYYY-MM-DD')
+
+        profiles = Profile.objects.all()
+        if options.get('username'):
+            User = get_user_model()
+            try:
+                profiles = profiles.filter(user=User.objects.get(username=options['username']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+        user_ids = sorted(profiles.values_list('user_id', flat=True))
+
+        chunk_size = options['chunk_size']
+        total = 0
+        for i in range(0, len(user_ids), chunk_size):
+            total += rebuild_bp_aggregates(user_ids=user_ids[i:i + chunk_size], since=since)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} BP aggregates for {len(user_ids)} users'))
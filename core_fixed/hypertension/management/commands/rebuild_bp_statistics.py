@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from ...models import BPReading, BPStatistics
+from ...bp_services import BP_STAT_WINDOWS, rebuild_bp_statistics
+
+
+class Command(BaseCommand):
+    help = ("Recompute today's rolling BPStatistics rows for users with recent readings or rows "
+            "left from an earlier day. Schedule it right after midnight: reads never rebuild, so "
+            "until then the dashboard shows the windows ending yesterday")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Only rebuild this user')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between users')
+
+    def handle(self, *args, **options):
+        since = timezone.localdate() - timedelta(days=max(BP_STAT_WINDOWS) - 1)
+        readings = BPReading.objects.filter(day__gte=since)
+        stale = BPStatistics.objects.exclude(as_of=timezone.localdate())
+        if options.get('username'):
+            User = get_user_model()
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+            readings = readings.filter(user=user)
+            stale = stale.filter(user=user)
+        user_ids = sorted(
+            set(readings.values_list('user_id', flat=True).distinct().order_by())
+            | set(stale.values_list('user_id', flat=True).distinct().order_by())
+        )
+
+        for user_id in user_ids:
+            rebuild_bp_statistics(user_id)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt BP statistics for {len(user_ids)} users'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from ...models import DailySummary
+from ...sodium_services import rebuild_sodium_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild month/year SodiumRollup rows from DailySummary data (initial fill or repair)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Only rebuild this user')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per grouped query')
+
+    def handle(self, *args, **options):
+        summaries = DailySummary.objects.all()
+        if options.get('username'):
+            User = get_user_model()
+            try:
+                summaries = summaries.filter(user=User.objects.get(username=options['username']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+        user_ids = sorted(set(summaries.values_list('user_id', flat=True).distinct().order_by()))
+
+        chunk_size = options['chunk_size']
+        total = 0
+        for i in range(0, len(user_ids), chunk_size):
+            total += rebuild_sodium_rollups(user_ids=user_ids[i:i + chunk_size])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} rollups for {len(user_ids)} users'))
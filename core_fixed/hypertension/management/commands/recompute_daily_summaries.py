@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.utils.dateparse import parse_date
+
+from ...models import Meal, DailySummary
+from ...sodium_services import recompute_daily_summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailySummary rows from Meal data (repair after edits, imports or drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Only repair this user')
+        parser.add_argument('--since', type=str, help='First day to repair (YYYY-MM-DD)')
+        parser.add_argument('--until', type=str, help='Last day to repair (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        meals = Meal.objects.all()
+        summaries = DailySummary.objects.all()
+
+        if options.get('username'):
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+            meals = meals.filter(user=user)
+            summaries = summaries.filter(user=user)
+
+        # Meals without a `day` yet need `backfill_local_days` first.
+        meals = meals.filter(day__isnull=False)
+        for option, lookup in (('since', 'gte'), ('until', 'lte')):
+            if options.get(option):
+                value = parse_date(options[option])
+                if value is None:
+                    raise CommandError(f'--{option} must be YYYY-MM-DD')
+                meals = meals.filter(**{f'day__{lookup}': value})
+                summaries = summaries.filter(**{f'date__{lookup}': value})
+
+        # Days that have meals plus days that only have a (possibly stale) summary.
+        keys = set(meals.values_list('user_id', 'day').distinct().order_by())
+        keys.update(summaries.values_list('user_id', 'date'))
+
+        users = User.objects.in_bulk({user_id for user_id, _ in keys})
+        for user_id, day in sorted(keys):
+            recompute_daily_summary(users[user_id], day)
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(keys)} daily summaries'))
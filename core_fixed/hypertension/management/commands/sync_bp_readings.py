@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from ...bp_services import sync_bp_readings
+
+
+class Command(BaseCommand):
+    help = 'Re-copy legacy BP readings into the unified BPReading table (repair after writes that bypassed signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Only sync this user')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Legacy rows upserted per statement')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options.get('username'):
+            User = get_user_model()
+            try:
+                user_ids = [User.objects.get(username=options['username']).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' does not exist")
+
+        upserted, deleted = sync_bp_readings(user_ids=user_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Upserted {upserted} readings, removed {deleted} orphaned copies'))
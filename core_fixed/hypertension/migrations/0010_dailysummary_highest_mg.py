@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:06
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_highest_mg(apps, schema_editor):
+    DailySummary = apps.get_model('hypertension', 'DailySummary')
+    Meal = apps.get_model('hypertension', 'Meal')
+    DailySummary.objects.filter(highest_meal__isnull=False).update(
+        highest_mg=Subquery(Meal.objects.filter(pk=OuterRef('highest_meal_id')).values('sodium_mg')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0009_alert_device_alert_sodium_total_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysummary',
+            name='highest_mg',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_highest_mg, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0010_dailysummary_highest_mg'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtySummaryDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('marked_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dirty_summary_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['marked_at'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
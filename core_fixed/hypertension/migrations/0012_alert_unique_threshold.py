@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_alerts(apps, schema_editor):
+    """Keep the oldest alert per user/date/threshold before adding the unique constraint."""
+    Alert = apps.get_model('hypertension', 'Alert')
+    duplicates = (
+        Alert.objects.values('user_id', 'date', 'threshold')
+        .annotate(n=Count('id'), keep_id=Min('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates.iterator():
+        Alert.objects.filter(
+            user_id=row['user_id'], date=row['date'], threshold=row['threshold'],
+        ).exclude(pk=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0011_dirtysummaryday'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_alerts, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='hypertensio_user_id_09df43_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'threshold'), name='uniq_alert_user_date_threshold'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0012_alert_unique_threshold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='device',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='meals', to='hypertension.device'),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='reading_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='meal',
+            constraint=models.UniqueConstraint(fields=('device', 'reading_id'), name='uniq_meal_device_reading'),
+        ),
+    ]
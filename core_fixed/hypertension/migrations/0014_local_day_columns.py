@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:15
+
+import hypertension.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def backfill_local_days(apps, schema_editor):
+    """Fill `day` from `recorded_at` (local date, as LocalDateField.pre_save
+    does) on existing rows, one primary-key range per UPDATE."""
+    local_day = TruncDate('recorded_at', tzinfo=timezone.get_current_timezone())
+    for name in ('Meal', 'BloodPressureReading', 'WatchBloodPressure'):
+        pending = apps.get_model('hypertension', name).objects.filter(day__isnull=True)
+        bounds = pending.aggregate(lo=Min('pk'), hi=Max('pk'))
+        if bounds['lo'] is None:
+            continue
+        for start in range(bounds['lo'], bounds['hi'] + 1, BACKFILL_CHUNK_SIZE):
+            pending.filter(pk__gte=start, pk__lt=start + BACKFILL_CHUNK_SIZE).update(day=local_day)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0013_meal_device_reading_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodpressurereading',
+            name='day',
+            field=hypertension.models.LocalDateField(blank=True, null=True, source='recorded_at'),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='day',
+            field=hypertension.models.LocalDateField(blank=True, null=True, source='recorded_at'),
+        ),
+        migrations.AddField(
+            model_name='watchbloodpressure',
+            name='day',
+            field=hypertension.models.LocalDateField(blank=True, null=True, source='recorded_at'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodpressurereading',
+            index=models.Index(fields=['profile', 'day'], name='hypertensio_profile_96bfd8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['user', 'day'], name='hypertensio_user_id_0e87b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchbloodpressure',
+            index=models.Index(fields=['watch_sync', 'day'], name='hypertensio_watch_s_60e1e4_idx'),
+        ),
+        migrations.RunPython(backfill_local_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0014_local_day_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SodiumRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('month', 'Month'), ('year', 'Year')], max_length=8)),
+                ('period_start', models.DateField()),
+                ('total_mg', models.PositiveBigIntegerField(default=0)),
+                ('days_logged', models.PositiveSmallIntegerField(default=0)),
+                ('days_over_limit', models.PositiveSmallIntegerField(default=0)),
+                ('max_day_mg', models.PositiveIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sodium_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['period', '-period_start'],
+                'unique_together': {('user', 'period', 'period_start')},
+            },
+        ),
+    ]
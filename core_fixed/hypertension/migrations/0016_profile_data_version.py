@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0015_sodiumrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='data_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_readings(apps, schema_editor):
+    Profile = apps.get_model('hypertension', 'Profile')
+    BloodPressureReading = apps.get_model('hypertension', 'BloodPressureReading')
+    WatchBloodPressure = apps.get_model('hypertension', 'WatchBloodPressure')
+    Profile.objects.update(
+        latest_manual=Subquery(
+            BloodPressureReading.objects.filter(profile=OuterRef('pk'))
+            .order_by('-recorded_at', '-pk').values('pk')[:1]
+        ),
+        latest_watch=Subquery(
+            WatchBloodPressure.objects.filter(watch_sync__user=OuterRef('user_id'))
+            .order_by('-recorded_at', '-pk').values('pk')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0016_profile_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='latest_manual',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hypertension.bloodpressurereading'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='latest_watch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hypertension.watchbloodpressure'),
+        ),
+        migrations.RunPython(backfill_latest_readings, migrations.RunPython.noop),
+    ]
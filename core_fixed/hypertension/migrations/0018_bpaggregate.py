@@ -0,0 +1,95 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+BACKFILL_USER_CHUNK_SIZE = 500
+BACKFILL_BATCH_SIZE = 5000
+READING_MODELS = (
+    ('manual', 'BloodPressureReading', 'profile__user'),
+    ('watch', 'WatchBloodPressure', 'watch_sync__user'),
+)
+STAT_FIELDS = ('systolic', 'diastolic', 'pulse')
+
+
+def backfill_bp_aggregates(apps, schema_editor):
+    """Fill hourly and daily BPAggregate rows from the existing readings with
+    the grouped query rebuild_bp_aggregates runs, one chunk of users at a time."""
+    BPAggregate = apps.get_model('hypertension', 'BPAggregate')
+    tz = timezone.get_current_timezone()
+    stats = {'count': Count('pk'), 'pulse_count': Count('pulse')}
+    for field in STAT_FIELDS:
+        stats.update({
+            f'{field}_sum': Sum(field),
+            f'{field}_sum_sq': Sum(F(field) * F(field)),
+            f'{field}_min': Min(field),
+            f'{field}_max': Max(field),
+        })
+    for source, model_name, owner in READING_MODELS:
+        readings = apps.get_model('hypertension', model_name).objects.order_by()
+        user_ids = sorted(set(readings.values_list(owner, flat=True)))
+        for i in range(0, len(user_ids), BACKFILL_USER_CHUNK_SIZE):
+            chunk = readings.filter(**{f'{owner}__in': user_ids[i:i + BACKFILL_USER_CHUNK_SIZE]})
+            for period, trunc in (('hour', TruncHour), ('day', TruncDay)):
+                rows = (
+                    chunk.annotate(owner=F(owner), start=trunc('recorded_at', tzinfo=tz))
+                    .values('owner', 'start')
+                    .annotate(**stats)
+                    .order_by()
+                )
+                BPAggregate.objects.bulk_create(
+                    [
+                        BPAggregate(
+                            user_id=row.pop('owner'), source=source, period=period, period_start=row.pop('start'),
+                            **{name: 0 if value is None and not name.endswith(('_min', '_max')) else value
+                               for name, value in row.items()},
+                        )
+                        for row in rows
+                    ],
+                    batch_size=BACKFILL_BATCH_SIZE,
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0017_profile_latest_readings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BPAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('manual', 'Manual'), ('watch', 'Watch')], max_length=8)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('period_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('systolic_sum', models.BigIntegerField(default=0)),
+                ('systolic_sum_sq', models.BigIntegerField(default=0)),
+                ('systolic_min', models.IntegerField(blank=True, null=True)),
+                ('systolic_max', models.IntegerField(blank=True, null=True)),
+                ('diastolic_sum', models.BigIntegerField(default=0)),
+                ('diastolic_sum_sq', models.BigIntegerField(default=0)),
+                ('diastolic_min', models.IntegerField(blank=True, null=True)),
+                ('diastolic_max', models.IntegerField(blank=True, null=True)),
+                ('pulse_count', models.PositiveIntegerField(default=0)),
+                ('pulse_sum', models.BigIntegerField(default=0)),
+                ('pulse_sum_sq', models.BigIntegerField(default=0)),
+                ('pulse_min', models.IntegerField(blank=True, null=True)),
+                ('pulse_max', models.IntegerField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bp_aggregates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['period', '-period_start'],
+                'unique_together': {('user', 'source', 'period', 'period_start')},
+            },
+        ),
+        migrations.RunPython(backfill_bp_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:30
+
+import django.db.models.deletion
+import hypertension.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def backfill_bp_readings(apps, schema_editor):
+    # Set-based copy of the legacy tables: two INSERT ... SELECT statements.
+    BPReading = apps.get_model('hypertension', 'BPReading')
+    BloodPressureReading = apps.get_model('hypertension', 'BloodPressureReading')
+    WatchBloodPressure = apps.get_model('hypertension', 'WatchBloodPressure')
+    Profile = apps.get_model('hypertension', 'Profile')
+    WatchSync = apps.get_model('hypertension', 'WatchSync')
+    qn = schema_editor.quote_name
+    target = qn(BPReading._meta.db_table)
+    columns = 'user_id, source, source_id, systolic, diastolic, pulse, notes, recorded_at, day'
+    schema_editor.execute(
+        f"INSERT INTO {target} ({columns}) "
+        f"SELECT p.user_id, 'manual', r.id, r.systolic, r.diastolic, r.pulse, r.notes, r.recorded_at, r.day "
+        f"FROM {qn(BloodPressureReading._meta.db_table)} r "
+        f"INNER JOIN {qn(Profile._meta.db_table)} p ON p.id = r.profile_id"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {target} ({columns}) "
+        f"SELECT s.user_id, 'watch', r.id, r.systolic, r.diastolic, r.pulse, '', r.recorded_at, r.day "
+        f"FROM {qn(WatchBloodPressure._meta.db_table)} r "
+        f"INNER JOIN {qn(WatchSync._meta.db_table)} s ON s.id = r.watch_sync_id"
+    )
+    # Legacy rows whose day was never filled (e.g. written with
+    # QuerySet.update()) get the local date of recorded_at, as
+    # LocalDateField.pre_save computes it, one primary-key range per UPDATE.
+    pending = BPReading.objects.filter(day__isnull=True)
+    bounds = pending.aggregate(lo=Min('pk'), hi=Max('pk'))
+    if bounds['lo'] is not None:
+        local_day = TruncDate('recorded_at', tzinfo=timezone.get_current_timezone())
+        for start in range(bounds['lo'], bounds['hi'] + 1, BACKFILL_CHUNK_SIZE):
+            pending.filter(pk__gte=start, pk__lt=start + BACKFILL_CHUNK_SIZE).update(day=local_day)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0018_bpaggregate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BPReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('manual', 'Manual'), ('watch', 'Watch')], max_length=8)),
+                ('source_id', models.BigIntegerField()),
+                ('systolic', models.IntegerField()),
+                ('diastolic', models.IntegerField()),
+                ('pulse', models.PositiveIntegerField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('recorded_at', models.DateTimeField()),
+                ('day', hypertension.models.LocalDateField(blank=True, null=True, source='recorded_at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unified_bp_readings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['user', 'recorded_at'], name='hypertensio_user_id_07472f_idx'), models.Index(fields=['user', 'day'], name='hypertensio_user_id_e2e1f8_idx')],
+                'unique_together': {('source', 'source_id')},
+            },
+        ),
+        migrations.RunPython(backfill_bp_readings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:32
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_watch_readings(apps, schema_editor):
+    """Keep the oldest watch reading per watch/timestamp before adding the
+    unique constraint, and drop the unified copies of the removed rows.
+    Run rebuild_bp_aggregates afterwards if any duplicates were removed."""
+    WatchBloodPressure = apps.get_model('hypertension', 'WatchBloodPressure')
+    BPReading = apps.get_model('hypertension', 'BPReading')
+    duplicates = (
+        WatchBloodPressure.objects.values('watch_sync_id', 'recorded_at')
+        .annotate(n=Count('id'), keep_id=Min('id'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for row in duplicates.iterator():
+        extra = list(
+            WatchBloodPressure.objects.filter(
+                watch_sync_id=row['watch_sync_id'], recorded_at=row['recorded_at'],
+            ).exclude(pk=row['keep_id']).values_list('pk', flat=True)
+        )
+        WatchBloodPressure.objects.filter(pk__in=extra).delete()
+        BPReading.objects.filter(source='watch', source_id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0019_bpreading'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_watch_readings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='watchbloodpressure',
+            constraint=models.UniqueConstraint(fields=('watch_sync', 'recorded_at'), name='uniq_watch_reading_time'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:33
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CHUNK_SIZE = 2000
+
+
+def move_raw_payloads(apps, schema_editor):
+    """Copy WatchBloodPressure.raw into compressed WatchRawPayload rows."""
+    WatchBloodPressure = apps.get_model('hypertension', 'WatchBloodPressure')
+    WatchRawPayload = apps.get_model('hypertension', 'WatchRawPayload')
+    readings = WatchBloodPressure.objects.filter(raw__isnull=False).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(readings.filter(pk__gt=last_pk).values_list('pk', 'raw')[:CHUNK_SIZE])
+        if not chunk:
+            break
+        payloads = []
+        for pk, payload in chunk:
+            raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            payloads.append(WatchRawPayload(reading_id=pk, codec='zlib', data=zlib.compress(raw, 6), size=len(raw)))
+        WatchRawPayload.objects.bulk_create(payloads)
+        last_pk = chunk[-1][0]
+
+
+def restore_raw_payloads(apps, schema_editor):
+    WatchBloodPressure = apps.get_model('hypertension', 'WatchBloodPressure')
+    WatchRawPayload = apps.get_model('hypertension', 'WatchRawPayload')
+    for payload in WatchRawPayload.objects.iterator(chunk_size=CHUNK_SIZE):
+        WatchBloodPressure.objects.filter(pk=payload.reading_id).update(
+            raw=json.loads(zlib.decompress(bytes(payload.data)).decode('utf-8')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0020_watch_reading_unique_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchRawPayload',
+            fields=[
+                ('reading', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='raw_payload', serialize=False, to='hypertension.watchbloodpressure')),
+                ('codec', models.CharField(choices=[('zlib', 'zlib')], default='zlib', max_length=8)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(move_raw_payloads, restore_raw_payloads),
+        migrations.RemoveField(
+            model_name='watchbloodpressure',
+            name='raw',
+        ),
+    ]
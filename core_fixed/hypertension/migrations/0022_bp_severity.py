@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:35
+
+from collections import defaultdict
+
+import hypertension.models
+from django.conf import settings
+from django.db import migrations, models
+from hypertension.utils import classify_bp_batch
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def backfill_severity(apps, schema_editor):
+    """Classify the existing readings with classify_bp_batch, one primary-key
+    chunk at a time and one UPDATE per severity in the chunk (as the
+    backfill_bp_severity command does)."""
+    for name in ('BloodPressureReading', 'WatchBloodPressure', 'BPReading'):
+        model = apps.get_model('hypertension', name)
+        rows = model.objects.filter(severity__isnull=True).order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk).values_list('pk', 'systolic', 'diastolic')[:BACKFILL_CHUNK_SIZE])
+            if not chunk:
+                break
+            pks, systolics, diastolics = zip(*chunk)
+            by_severity = defaultdict(list)
+            for pk, severity in zip(pks, classify_bp_batch(systolics, diastolics)):
+                by_severity[severity].append(pk)
+            for severity, severity_pks in by_severity.items():
+                model.objects.filter(pk__in=severity_pks).update(severity=severity)
+            last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0021_watch_raw_payload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodpressurereading',
+            name='severity',
+            field=hypertension.models.SeverityField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bpreading',
+            name='severity',
+            field=hypertension.models.SeverityField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='watchbloodpressure',
+            name='severity',
+            field=hypertension.models.SeverityField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bpreading',
+            index=models.Index(fields=['user', 'severity', 'day'], name='hypertensio_user_id_03c075_idx'),
+        ),
+        migrations.RunPython(backfill_severity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def build_bp_statistics(apps, schema_editor):
+    """Build today's statistics rows for users with readings inside the
+    longest window, with the scan rebuild_bp_statistics uses."""
+    from hypertension.bp_services import BP_STAT_WINDOWS, CHART_SOURCES, _build_bp_statistics, _window_start
+
+    BPReading = apps.get_model('hypertension', 'BPReading')
+    BPStatistics = apps.get_model('hypertension', 'BPStatistics')
+    as_of = timezone.localdate()
+    user_ids = sorted(set(
+        BPReading.objects.filter(day__gte=_window_start(as_of, max(BP_STAT_WINDOWS)))
+        .values_list('user_id', flat=True).order_by()
+    ))
+    rows = []
+    for user_id in user_ids:
+        for source in CHART_SOURCES:
+            rows.extend(_build_bp_statistics(user_id, source, as_of, BPReading, BPStatistics))
+        if len(rows) >= BACKFILL_BATCH_SIZE:
+            BPStatistics.objects.bulk_create(rows)
+            rows = []
+    BPStatistics.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hypertension', '0022_bp_severity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BPStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('manual', 'Manual'), ('watch', 'Watch')], max_length=8)),
+                ('window_days', models.PositiveSmallIntegerField()),
+                ('as_of', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('systolic_mean', models.FloatField(default=0.0)),
+                ('systolic_m2', models.FloatField(default=0.0)),
+                ('diastolic_mean', models.FloatField(default=0.0)),
+                ('diastolic_m2', models.FloatField(default=0.0)),
+                ('morning_count', models.PositiveIntegerField(default=0)),
+                ('morning_systolic_sum', models.BigIntegerField(default=0)),
+                ('morning_diastolic_sum', models.BigIntegerField(default=0)),
+                ('evening_count', models.PositiveIntegerField(default=0)),
+                ('evening_systolic_sum', models.BigIntegerField(default=0)),
+                ('evening_diastolic_sum', models.BigIntegerField(default=0)),
+                ('arv_count', models.PositiveIntegerField(default=0)),
+                ('systolic_arv_sum', models.BigIntegerField(default=0)),
+                ('diastolic_arv_sum', models.BigIntegerField(default=0)),
+                ('last_systolic', models.IntegerField(blank=True, null=True)),
+                ('last_diastolic', models.IntegerField(blank=True, null=True)),
+                ('last_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bp_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'source', 'window_days')},
+            },
+        ),
+        migrations.RunPython(build_bp_statistics, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,82 @@
 ﻿from django.db import models
 from django.conf import settings
 from django.utils import timezone
+import json
 import uuid
+import zlib
+
+from .utils import SEVERITY_KEYS, classify_bp
+
+
+class LocalDateField(models.DateField):
+    """Date of `source` (a DateTimeField) in the project time zone.
+
+    Filled on every save and bulk_create from the source timestamp (declare it
+    after the source field so auto_now_add has already run), which lets
+    day-level queries use equality on an indexed column instead of rebuilding
+    a timezone range. QuerySet.update() does not maintain it; update the
+    source field through save() or set the day explicitly.
+    """
+
+    def __init__(self, *args, source='recorded_at', **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        if kwargs.get('editable') is False:
+            del kwargs['editable']
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.source)
+        if value is not None:
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            value = timezone.localdate(value)
+            setattr(model_instance, self.attname, value)
+        return value
+
+
+class SeverityField(models.CharField):
+    """ACC/AHA severity key (see utils.classify_bp) of the row's systolic and
+    diastolic values.
+
+    Like LocalDateField it is recomputed on every save and bulk_create, so
+    stage counts can be grouped in the database. QuerySet.update() does not
+    maintain it; run `backfill_bp_severity` after bulk SQL changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 10)
+        kwargs.setdefault('choices', [(key, key) for key in SEVERITY_KEYS])
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        for key in ('max_length', 'choices', 'editable'):
+            kwargs.pop(key, None)
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = classify_bp(model_instance.systolic, model_instance.diastolic)[3]
+        setattr(model_instance, self.attname, value)
+        return value
+
 
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Bumped on every meal/reading/alert write (see data_version.py); read APIs
+    # derive ETag/Last-Modified from it to answer polls with 304.
+    data_version = models.PositiveBigIntegerField(default=0)
+    data_changed_at = models.DateTimeField(null=True, blank=True)
+    # Newest manual / watch reading, maintained on write (bp_services) so the
+    # dashboard never scans reading history to find them.
+    latest_manual = models.ForeignKey('BloodPressureReading', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    latest_watch = models.ForeignKey('WatchBloodPressure', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
 
     def __str__(self):
         return f"{self.user.username} Profile"
@@ -17,9 +89,12 @@ class BloodPressureReading(models.Model):
     pulse = models.PositiveIntegerField(null=True, blank=True)
     notes = models.TextField(blank=True)
     recorded_at = models.DateTimeField(auto_now_add=True)
+    day = LocalDateField(null=True, blank=True)
+    severity = SeverityField(null=True, blank=True)
 
     class Meta:
         ordering = ['-recorded_at']
+        indexes = [models.Index(fields=['profile', 'day'])]
 
     def __str__(self):
         ts = self.recorded_at.strftime("%Y-%m-%d %H:%M") if self.recorded_at else "unknown time"
@@ -45,15 +120,61 @@ class WatchBloodPressure(models.Model):
     diastolic = models.IntegerField()
     pulse = models.PositiveIntegerField(null=True, blank=True)
     recorded_at = models.DateTimeField(default=timezone.now)
-    raw = models.JSONField(null=True, blank=True)
+    day = LocalDateField(null=True, blank=True)
+    severity = SeverityField(null=True, blank=True)
 
     class Meta:
         ordering = ['-recorded_at']
+        indexes = [models.Index(fields=['watch_sync', 'day'])]
+        constraints = [
+            # A watch reports each stored reading once per timestamp; re-syncs skip these.
+            models.UniqueConstraint(fields=['watch_sync', 'recorded_at'], name='uniq_watch_reading_time'),
+        ]
 
     def __str__(self):
         ts = self.recorded_at.strftime("%Y-%m-%d %H:%M") if self.recorded_at else "unknown time"
         return f"Watch {self.systolic}/{self.diastolic} @ {ts}"
 
+    @property
+    def raw(self):
+        """The vendor payload sent with this reading, or None if it was not
+        kept. Loaded from WatchRawPayload (one query) on first access."""
+        try:
+            return self.raw_payload.decode()
+        except WatchRawPayload.DoesNotExist:
+            return None
+
+
+class WatchRawPayload(models.Model):
+    """Compressed raw watch payload, kept apart from the hot reading table.
+
+    Only a sample of readings keep one and old payloads are pruned (see
+    bp_services.store_raw_payloads / prune_raw_payloads). `size` is the
+    uncompressed JSON size in bytes.
+    """
+    CODEC_CHOICES = [
+        ('zlib', 'zlib'),
+    ]
+    reading = models.OneToOneField(
+        WatchBloodPressure, primary_key=True, on_delete=models.CASCADE, related_name='raw_payload',
+    )
+    codec = models.CharField(max_length=8, choices=CODEC_CHOICES, default='zlib')
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Raw payload for watch reading {self.reading_id} ({self.size} bytes)'
+
+    @staticmethod
+    def encode(payload):
+        """(compressed bytes, uncompressed size) for a JSON-serializable payload."""
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return zlib.compress(raw, 6), len(raw)
+
+    def decode(self):
+        return json.loads(zlib.decompress(bytes(self.data)).decode('utf-8'))
+
 
 # -----------------------------
 # Sodium intake models
@@ -70,14 +191,23 @@ class Meal(models.Model):
     portion = models.CharField(max_length=64, blank=True)
     source = models.CharField(max_length=16, choices=SOURCE_CHOICES, default='manual')
     recorded_at = models.DateTimeField()
+    # Local calendar day of recorded_at; DailySummary rows are keyed by it.
+    day = LocalDateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Device that posted the meal and its client-supplied idempotency key
+    # (sequence number or UUID), so retried posts are not stored twice.
+    device = models.ForeignKey('Device', null=True, blank=True, on_delete=models.SET_NULL, related_name='meals')
+    reading_id = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         ordering = ['-recorded_at']
-        indexes = [models.Index(fields=['user', 'recorded_at'])]
+        indexes = [models.Index(fields=['user', 'recorded_at']), models.Index(fields=['user', 'day'])]
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'reading_id'], name='uniq_meal_device_reading'),
+        ]
 
     def __str__(self):
-        return f'{self.name or "Meal"} {self.sodium_mg}mg @ {self.recorded_at.date()}'
+        return f'{self.name or "Meal"} {self.sodium_mg}mg @ {self.day or timezone.localdate(self.recorded_at)}'
 
 
 class DailySummary(models.Model):
@@ -86,6 +216,8 @@ class DailySummary(models.Model):
     total_mg = models.PositiveIntegerField(default=0)
     percent_of_limit = models.FloatField(default=0.0)
     highest_meal = models.ForeignKey(Meal, null=True, blank=True, on_delete=models.SET_NULL)
+    # sodium_mg of highest_meal, kept on the row so incremental updates can compare in SQL
+    highest_mg = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -96,6 +228,26 @@ class DailySummary(models.Model):
         return f'{self.user} {self.date} {self.total_mg}mg'
 
 
+class DirtySummaryDay(models.Model):
+    """A (user, day) whose DailySummary/alerts still need recomputing.
+
+    Written by the request path when summaries run in deferred mode and drained
+    by the `process_dirty_summaries` worker. The unique key coalesces repeated
+    marks; `marked_at` is bumped on every mark so the worker never drops a key
+    that was re-marked while it was being processed.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='dirty_summary_days')
+    date = models.DateField()
+    marked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['marked_at']
+
+    def __str__(self):
+        return f'Dirty {self.user} {self.date}'
+
+
 class Alert(models.Model):
     THRESHOLD_CHOICES = [
         ('50', '50%'),
@@ -122,7 +274,11 @@ class Alert(models.Model):
     device = models.ForeignKey('Device', null=True, blank=True, on_delete=models.SET_NULL)
 
     class Meta:
-        indexes = [models.Index(fields=['user', 'date', 'threshold'])]
+        # One alert per user/day/threshold; the alert engine relies on this to
+        # insert with ignore_conflicts instead of check-then-create.
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'threshold'], name='uniq_alert_user_date_threshold'),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
@@ -145,6 +301,34 @@ class WeeklyReport(models.Model):
         return f'WeeklyReport {self.user} {self.week_start}'
 
 
+class SodiumRollup(models.Model):
+    """Sodium totals for one user over a calendar month or year.
+
+    Maintained from DailySummary changes (see sodium_services) so long-range
+    trends read a handful of rows instead of hundreds of daily ones.
+    `period_start` is the first day of the month/year.
+    """
+    PERIOD_CHOICES = [
+        ('month', 'Month'),
+        ('year', 'Year'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sodium_rollups')
+    period = models.CharField(max_length=8, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    total_mg = models.PositiveBigIntegerField(default=0)
+    days_logged = models.PositiveSmallIntegerField(default=0)
+    days_over_limit = models.PositiveSmallIntegerField(default=0)
+    max_day_mg = models.PositiveIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'period', 'period_start')
+        ordering = ['period', '-period_start']
+
+    def __str__(self):
+        return f'{self.period.title()} rollup {self.user} {self.period_start} {self.total_mg}mg'
+
+
 class Device(models.Model):
     """Represents a paired hardware device (salt-sensing spoon, watch, etc.)
     Devices authenticate using a token to post measurements on behalf of a user.
@@ -160,3 +344,159 @@ class Device(models.Model):
 
     def __str__(self):
         return f'Device {self.name or self.token[:8]} ({self.user})'
+
+
+class BPReading(models.Model):
+    """Manual and watch BP readings in one table, keyed directly on the user.
+
+    A derived copy of BloodPressureReading/WatchBloodPressure (which remain
+    the write API): every legacy insert, edit and delete is mirrored here by
+    bp_services, and `source_id` is the legacy row's pk. Merged timelines read
+    one (user, recorded_at) index range instead of two joined scans.
+
+    Nothing references this table by foreign key, so it can be range
+    partitioned on `recorded_at` without touching other tables.
+    """
+    SOURCE_CHOICES = [
+        ('manual', 'Manual'),
+        ('watch', 'Watch'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='unified_bp_readings')
+    source = models.CharField(max_length=8, choices=SOURCE_CHOICES)
+    source_id = models.BigIntegerField()
+    systolic = models.IntegerField()
+    diastolic = models.IntegerField()
+    pulse = models.PositiveIntegerField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+    recorded_at = models.DateTimeField()
+    day = LocalDateField(null=True, blank=True)
+    severity = SeverityField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-recorded_at']
+        unique_together = ('source', 'source_id')
+        indexes = [
+            models.Index(fields=['user', 'recorded_at']),
+            models.Index(fields=['user', 'day']),
+            models.Index(fields=['user', 'severity', 'day']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_source_display()} BP {self.systolic}/{self.diastolic} {self.user} @ {self.recorded_at}'
+
+
+class BPStatistics(models.Model):
+    """Rolling BP statistics for one user and source over the last
+    `window_days` local days, maintained online by bp_services.record_bp_statistics.
+
+    Means and variances are kept with Welford's method (`*_m2` is the sum of
+    squared deviations); average real variability (ARV) is the mean absolute
+    difference between consecutive readings. `as_of` is the local date the
+    window ends on; writes and the daily `rebuild_bp_statistics` run rebuild
+    rows whose windows have moved, reads never do.
+    """
+    SOURCE_CHOICES = [
+        ('manual', 'Manual'),
+        ('watch', 'Watch'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bp_statistics')
+    source = models.CharField(max_length=8, choices=SOURCE_CHOICES)
+    window_days = models.PositiveSmallIntegerField()
+    as_of = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    systolic_mean = models.FloatField(default=0.0)
+    systolic_m2 = models.FloatField(default=0.0)
+    diastolic_mean = models.FloatField(default=0.0)
+    diastolic_m2 = models.FloatField(default=0.0)
+    morning_count = models.PositiveIntegerField(default=0)
+    morning_systolic_sum = models.BigIntegerField(default=0)
+    morning_diastolic_sum = models.BigIntegerField(default=0)
+    evening_count = models.PositiveIntegerField(default=0)
+    evening_systolic_sum = models.BigIntegerField(default=0)
+    evening_diastolic_sum = models.BigIntegerField(default=0)
+    arv_count = models.PositiveIntegerField(default=0)
+    systolic_arv_sum = models.BigIntegerField(default=0)
+    diastolic_arv_sum = models.BigIntegerField(default=0)
+    last_systolic = models.IntegerField(null=True, blank=True)
+    last_diastolic = models.IntegerField(null=True, blank=True)
+    last_recorded_at = models.DateTimeField(null=True, blank=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'source', 'window_days')
+
+    def __str__(self):
+        return f'{self.get_source_display()} BP stats {self.user} {self.window_days}d (n={self.count})'
+
+    @property
+    def systolic_sd(self):
+        return (self.systolic_m2 / (self.count - 1)) ** 0.5 if self.count > 1 else None
+
+    @property
+    def diastolic_sd(self):
+        return (self.diastolic_m2 / (self.count - 1)) ** 0.5 if self.count > 1 else None
+
+    @property
+    def systolic_arv(self):
+        return self.systolic_arv_sum / self.arv_count if self.arv_count else None
+
+    @property
+    def diastolic_arv(self):
+        return self.diastolic_arv_sum / self.arv_count if self.arv_count else None
+
+
+class BPAggregate(models.Model):
+    """Per-user blood pressure statistics for one local hour or day, per source.
+
+    Sums and sums of squares (rather than means) are stored so inserts can be
+    folded in by adding to them; mean and variance are derived from them.
+    `period_start` is the aware start of the local hour/day. Maintained by
+    bp_services on every reading insert, edit and delete.
+    """
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    SOURCE_CHOICES = [
+        ('manual', 'Manual'),
+        ('watch', 'Watch'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bp_aggregates')
+    source = models.CharField(max_length=8, choices=SOURCE_CHOICES)
+    period = models.CharField(max_length=8, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    systolic_sum = models.BigIntegerField(default=0)
+    systolic_sum_sq = models.BigIntegerField(default=0)
+    systolic_min = models.IntegerField(null=True, blank=True)
+    systolic_max = models.IntegerField(null=True, blank=True)
+    diastolic_sum = models.BigIntegerField(default=0)
+    diastolic_sum_sq = models.BigIntegerField(default=0)
+    diastolic_min = models.IntegerField(null=True, blank=True)
+    diastolic_max = models.IntegerField(null=True, blank=True)
+    # Pulse is optional on readings, so it keeps its own count.
+    pulse_count = models.PositiveIntegerField(default=0)
+    pulse_sum = models.BigIntegerField(default=0)
+    pulse_sum_sq = models.BigIntegerField(default=0)
+    pulse_min = models.IntegerField(null=True, blank=True)
+    pulse_max = models.IntegerField(null=True, blank=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'source', 'period', 'period_start')
+        ordering = ['period', '-period_start']
+
+    def __str__(self):
+        return f'{self.get_source_display()} BP {self.period} {self.user} {self.period_start} (n={self.count})'
+
+    @property
+    def systolic_mean(self):
+        return self.systolic_sum / self.count if self.count else None
+
+    @property
+    def diastolic_mean(self):
+        return self.diastolic_sum / self.count if self.count else None
+
+    @property
+    def pulse_mean(self):
+        return self.pulse_sum / self.pulse_count if self.pulse_count else None
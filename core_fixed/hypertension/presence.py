@@ -0,0 +1,109 @@
+"""
+Write-coalesced device presence (`Device.last_seen`).
+
+Device posts call `touch()` / `atouch()` instead of writing the Device row. Timestamps are
+kept in a per-process dict and flushed with one bulk UPDATE at most every
+DEVICE_PRESENCE_FLUSH_INTERVAL seconds (by the next touch after the interval,
+and at process exit), so a busy device costs one row write per interval
+instead of one per reading.
+
+`online_devices()` answers "which devices were seen recently" from the stored
+`last_seen` plus this process's pending timestamps, so it never goes through
+the per-row write path. With several worker processes, `last_seen` may lag by
+up to one flush interval; keep DEVICE_ONLINE_WINDOW well above it.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Q, Value, When
+from django.utils import timezone
+
+from .models import Device
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTracker:
+    """Buffers device_id -> last seen time and flushes them in batches."""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, device_id, when=None):
+        """Record that `device_id` was seen (now by default); returns True if a flush is due."""
+        when = when or timezone.now()
+        with self._lock:
+            seen = self._pending.get(device_id)
+            if seen is None or when > seen:
+                self._pending[device_id] = when
+            return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def pending(self):
+        """Snapshot of timestamps not yet written to the database."""
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """Write all pending timestamps with one UPDATE; returns rows updated."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+        seen_at = Case(
+            *[When(pk=pk, then=Value(ts)) for pk, ts in batch.items()],
+            output_field=DateTimeField(),
+        )
+        try:
+            return (
+                Device.objects
+                .filter(pk__in=batch.keys())
+                # Never move last_seen backwards (another process may have
+                # flushed a newer time for the same device).
+                .filter(Q(last_seen__isnull=True) | Q(last_seen__lt=seen_at))
+                .update(last_seen=seen_at)
+            )
+        except Exception:
+            # Put the batch back so the next flush retries it.
+            logger.exception("Failed to flush presence for %d devices", len(batch))
+            with self._lock:
+                for pk, ts in batch.items():
+                    if pk not in self._pending or ts > self._pending[pk]:
+                        self._pending[pk] = ts
+            return 0
+
+
+tracker = PresenceTracker(getattr(settings, 'DEVICE_PRESENCE_FLUSH_INTERVAL', 30))
+atexit.register(tracker.flush)
+
+
+def touch(device):
+    """Mark `device` (a Device or its pk) as seen now."""
+    if tracker.record(getattr(device, 'pk', device)):
+        tracker.flush()
+
+
+async def atouch(device):
+    """Async `touch`: only hops to a thread when a flush is actually due."""
+    if tracker.record(getattr(device, 'pk', device)):
+        await sync_to_async(tracker.flush)()
+
+
+def online_devices(user=None, within=None):
+    """Devices seen in the last `within` (default DEVICE_ONLINE_WINDOW seconds)."""
+    if within is None:
+        within = timedelta(seconds=getattr(settings, 'DEVICE_ONLINE_WINDOW', 300))
+    cutoff = timezone.now() - within
+    recent_pending = [pk for pk, ts in tracker.pending().items() if ts >= cutoff]
+    qs = Device.objects.filter(Q(last_seen__gte=cutoff) | Q(pk__in=recent_pending))
+    if user is not None:
+        qs = qs.filter(user=user)
+    return qs
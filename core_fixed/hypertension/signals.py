@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,3 +28,123 @@ def create_or_update_profile(sender, instance, created, **kwargs):
     except Exception as e:
         # Catch unexpected DB errors so signal doesn't crash management commands.
         logger.exception("Failed creating/updating Profile for user %s: %s", getattr(instance, 'username', None), str(e))
+
+
+@receiver(post_save, sender='hypertension.Device')
+@receiver(post_delete, sender='hypertension.Device')
+def invalidate_device_auth_cache(sender, instance, **kwargs):
+    """Drop the cached token so a revoked/reassigned device stops authenticating here."""
+    from .device_auth import invalidate_token
+    invalidate_token(instance.token)
+
+
+def _reading_owner(sender, instance):
+    """(user_id, source) of a BloodPressureReading/WatchBloodPressure, or None
+    when it has no owner (left over or deleted together with its owner)."""
+    try:
+        if sender.__name__ == 'BloodPressureReading':
+            if instance.profile_id is None:
+                return None
+            return instance.profile.user_id, 'manual'
+        return instance.watch_sync.user_id, 'watch'
+    except ObjectDoesNotExist:
+        # Deleted together with its owner (cascade); nothing left to maintain.
+        return None
+
+
+@receiver(post_save, sender='hypertension.BloodPressureReading')
+@receiver(post_save, sender='hypertension.WatchBloodPressure')
+@receiver(post_delete, sender='hypertension.BloodPressureReading')
+@receiver(post_delete, sender='hypertension.WatchBloodPressure')
+def maintain_latest_readings(sender, instance, created=False, **kwargs):
+    """Keep Profile latest-reading pointers, the dashboard cache and the data
+    version in step with single-row reading writes (views, admin, commands).
+    Bulk inserts go through bp_services.add_watch_readings_bulk instead.
+    """
+    from .bp_services import advance_latest_reading, refresh_latest_readings
+    from .data_version import bump_data_version
+    owner = _reading_owner(sender, instance)
+    if owner is None:
+        return
+    user_id, source = owner
+    if created:
+        advance_latest_reading(user_id, f'latest_{source}', instance)
+    else:
+        refresh_latest_readings(user_id)
+    bump_data_version(user_id)
+
+
+@receiver(post_save, sender='hypertension.BloodPressureReading')
+@receiver(post_save, sender='hypertension.WatchBloodPressure')
+@receiver(post_delete, sender='hypertension.BloodPressureReading')
+@receiver(post_delete, sender='hypertension.WatchBloodPressure')
+def mirror_unified_readings(sender, instance, **kwargs):
+    """Dual-write single-row legacy reading changes into BPReading."""
+    from .bp_services import mirror_bp_readings, unmirror_bp_reading
+    owner = _reading_owner(sender, instance)
+    if owner is None:
+        return
+    user_id, source = owner
+    if kwargs['signal'] is post_delete:
+        unmirror_bp_reading(source, instance.pk)
+    else:
+        mirror_bp_readings(user_id, source, [instance])
+
+
+@receiver(pre_save, sender='hypertension.BloodPressureReading')
+@receiver(pre_save, sender='hypertension.WatchBloodPressure')
+def remember_recorded_at(sender, instance, **kwargs):
+    """Keep the stored timestamp of an edited reading, so the aggregate
+    bucket it leaves is recomputed too."""
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_recorded_at = (
+            sender.objects.filter(pk=instance.pk).values_list('recorded_at', flat=True).first()
+        )
+
+
+@receiver(post_save, sender='hypertension.BloodPressureReading')
+@receiver(post_save, sender='hypertension.WatchBloodPressure')
+@receiver(post_delete, sender='hypertension.BloodPressureReading')
+@receiver(post_delete, sender='hypertension.WatchBloodPressure')
+def maintain_bp_aggregates(sender, instance, created=False, **kwargs):
+    """Fold single-row reading writes into the hourly/daily BPAggregate rows.
+    Bulk inserts go through bp_services.add_watch_readings_bulk instead.
+    """
+    from .bp_services import apply_bp_aggregate_inserts, refresh_bp_aggregates
+    owner = _reading_owner(sender, instance)
+    if owner is None:
+        return
+    user_id, source = owner
+    if created:
+        apply_bp_aggregate_inserts(user_id, source, [instance])
+    else:
+        previous = getattr(instance, '_previous_recorded_at', None)
+        refresh_bp_aggregates(user_id, source, [ts for ts in (instance.recorded_at, previous) if ts])
+
+
+@receiver(post_save, sender='hypertension.BloodPressureReading')
+@receiver(post_save, sender='hypertension.WatchBloodPressure')
+@receiver(post_delete, sender='hypertension.BloodPressureReading')
+@receiver(post_delete, sender='hypertension.WatchBloodPressure')
+def maintain_bp_statistics(sender, instance, created=False, **kwargs):
+    """Fold single-row reading inserts into the rolling BPStatistics rows;
+    edits and deletes rebuild them. Bulk inserts go through
+    bp_services.add_watch_readings_bulk instead.
+    """
+    from .bp_services import rebuild_bp_statistics, record_bp_statistics
+    owner = _reading_owner(sender, instance)
+    if owner is None:
+        return
+    user_id, source = owner
+    if created:
+        record_bp_statistics(user_id, source, [instance])
+    else:
+        rebuild_bp_statistics(user_id, [source])
+
+
+@receiver(post_save, sender='hypertension.WatchSync')
+def watch_sync_changed(sender, instance, **kwargs):
+    from .bp_services import invalidate_dashboard
+    from .data_version import bump_data_version
+    invalidate_dashboard(instance.user_id)
+    bump_data_version(instance.user_id)
@@ -1,8 +1,17 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Avg, BigIntegerField, Case, Count, DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Greatest, Round, TruncMonth, TruncWeek, TruncYear
 from django.conf import settings
-from .models import Meal, DailySummary, Alert, WeeklyReport
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from . import events
+from .data_version import bump_data_version
+from .models import Meal, DailySummary, DirtySummaryDay, Alert, WeeklyReport, SodiumRollup
 
 DAILY_LIMIT_MG = getattr(settings, 'SODIUM_DAILY_LIMIT_MG', 2000)
 
@@ -21,12 +30,8 @@ ALERT_MESSAGES = {
 }
 
 
-def _get_date(dt):
-    return dt.date()
-
-
 @transaction.atomic
-def add_meal_and_update(user, name, sodium_mg, recorded_at=None, portion='', source='manual'):
+def add_meal_and_update(user, name, sodium_mg, recorded_at=None, portion='', source='manual', device=None, reading_id=None):
     if recorded_at is None:
         recorded_at = timezone.now()
     meal = Meal.objects.create(
@@ -36,18 +41,230 @@ def add_meal_and_update(user, name, sodium_mg, recorded_at=None, portion='', sou
         portion=portion or '',
         source=source,
         recorded_at=recorded_at,
+        device=device,
+        reading_id=reading_id or None,
     )
-    day = _get_date(recorded_at)
-    _recompute_daily_summary(user, day)
+    day = meal.day
+    if summaries_deferred():
+        mark_summary_days_dirty(user, [day])
+    else:
+        _apply_daily_delta(user, day, meal.sodium_mg, meal, device=device)
+    _data_changed(user, [day])
     return meal
 
 
-def _recompute_daily_summary(user, day_date):
-    from django.db.models import Sum
-    tz = timezone.get_current_timezone()
-    start = timezone.datetime.combine(day_date, timezone.datetime.min.time()).replace(tzinfo=tz)
-    end = timezone.datetime.combine(day_date, timezone.datetime.max.time()).replace(tzinfo=tz)
-    meals = Meal.objects.filter(user=user, recorded_at__range=(start, end))
+def add_device_meal(user, device, reading_id=None, **meal_kwargs):
+    """Idempotent variant of ``add_meal_and_update`` for device posts.
+
+    When ``reading_id`` was already stored for ``device`` the existing meal is
+    returned and summaries/alerts are left untouched. Returns ``(meal, created)``.
+    """
+    if device is not None and reading_id:
+        existing = Meal.objects.filter(device=device, reading_id=reading_id).first()
+        if existing:
+            return existing, False
+    try:
+        meal = add_meal_and_update(user, device=device, reading_id=reading_id, **meal_kwargs)
+    except IntegrityError:
+        if device is None or not reading_id:
+            raise
+        # A concurrent retry of the same reading won the insert.
+        return Meal.objects.get(device=device, reading_id=reading_id), False
+    return meal, True
+
+
+def _stored_readings(device, reading_ids):
+    if device is None or not reading_ids:
+        return {}
+    return {m.reading_id: m for m in Meal.objects.filter(device=device, reading_id__in=reading_ids)}
+
+
+@transaction.atomic
+def add_meals_bulk(user, meals, source='manual', device=None):
+    """Insert many meals with one INSERT and refresh each affected day once.
+
+    ``meals`` is a list of dicts using the keyword names of
+    ``add_meal_and_update`` (name, sodium_mg, recorded_at, portion, reading_id).
+    Readings whose ``reading_id`` is already stored for ``device`` (or repeated
+    within the batch) are not inserted again. Returns ``(results, summaries)``:
+    ``results`` is a ``(meal, created)`` pair per input item and ``summaries``
+    maps each touched day to its DailySummary (empty in deferred mode, where
+    the days are only marked dirty).
+    """
+    now = timezone.now()
+    keys = {m['reading_id'] for m in meals if m.get('reading_id')} if device is not None else set()
+    stored = _stored_readings(device, keys)
+
+    results = []
+    objs = []
+    for m in meals:
+        key = m.get('reading_id') if device is not None else None
+        if key and key in stored:
+            results.append((stored[key], False))
+            continue
+        meal = Meal(
+            user=user,
+            name=m.get('name') or '',
+            sodium_mg=int(max(0, int(m.get('sodium_mg', 0)))),
+            portion=m.get('portion') or '',
+            source=source,
+            recorded_at=m.get('recorded_at') or now,
+            device=device,
+            reading_id=m.get('reading_id') or None,
+        )
+        if key:
+            stored[key] = meal
+        objs.append(meal)
+        results.append((meal, True))
+    if not objs:
+        return results, {}
+
+    try:
+        with transaction.atomic():
+            Meal.objects.bulk_create(objs)
+    except IntegrityError:
+        # A concurrent retry stored some of these readings first; skip those.
+        raced = _stored_readings(device, {m.reading_id for m in objs if m.reading_id})
+        objs = [m for m in objs if m.reading_id not in raced]
+        results = [
+            (raced[meal.reading_id], False) if meal.reading_id in raced else (meal, created)
+            for meal, created in results
+        ]
+        Meal.objects.bulk_create(objs)
+
+    by_day = {}
+    for meal in objs:
+        by_day.setdefault(meal.day, []).append(meal)
+    _data_changed(user, by_day)
+    if summaries_deferred():
+        mark_summary_days_dirty(user, by_day)
+        return results, {}
+    summaries = {}
+    for day in sorted(by_day):
+        day_meals = by_day[day]
+        top = max(day_meals, key=lambda m: m.sodium_mg)
+        summaries[day] = _apply_daily_delta(user, day, sum(m.sodium_mg for m in day_meals), top, device=device)
+    return results, summaries
+
+
+def _data_changed(user, days):
+    """After a write: bump the user's data version and drop cached today snapshots."""
+    bump_data_version(user)
+    invalidate_today_snapshots(user, days)
+
+
+def summaries_deferred():
+    """True when summary/alert maintenance is handed to the write-behind worker."""
+    return getattr(settings, 'SODIUM_SUMMARY_MODE', 'sync') == 'deferred'
+
+
+def mark_summary_days_dirty(user, days):
+    """Record (user, day) keys for the worker with a single upsert.
+
+    Repeated marks coalesce on the unique key and only bump ``marked_at``.
+    """
+    now = timezone.now()
+    DirtySummaryDay.objects.bulk_create(
+        [DirtySummaryDay(user=user, date=day, marked_at=now) for day in days],
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['marked_at'],
+    )
+
+
+def process_dirty_summaries(batch_size=500):
+    """Drain up to ``batch_size`` dirty user-days, oldest first.
+
+    Each key is recomputed once no matter how many meals marked it. A key is
+    only removed if it was not re-marked while being processed, so meals
+    arriving mid-run are picked up by the next pass. Returns the number of
+    user-days recomputed.
+    """
+    pending = list(
+        DirtySummaryDay.objects.order_by('marked_at').values_list('pk', 'user_id', 'date', 'marked_at')[:batch_size]
+    )
+    if not pending:
+        return 0
+    users = get_user_model().objects.in_bulk({user_id for _, user_id, _, _ in pending})
+    for pk, user_id, day, marked_at in pending:
+        user = users.get(user_id)
+        if user is not None:
+            with transaction.atomic():
+                _recompute_daily_summary(user, day)
+                _data_changed(user, [day])
+        DirtySummaryDay.objects.filter(pk=pk, marked_at=marked_at).delete()
+    return len(pending)
+
+
+def _percent_of_limit_expr(total_expr):
+    # Cast to numeric before ROUND: PostgreSQL has no ROUND(double precision, int).
+    return Round(Cast(total_expr * 100.0 / DAILY_LIMIT_MG, DecimalField(max_digits=12, decimal_places=4)), 1)
+
+
+def _apply_daily_delta(user, day_date, added_mg, top_meal, device=None):
+    """Fold newly inserted sodium into the day's summary with one atomic UPDATE.
+
+    ``total_mg`` is incremented in SQL and ``highest_meal`` is replaced only when
+    ``top_meal`` is larger than the stored highest, so concurrent inserts for the
+    same user/day never overwrite each other. Cost does not depend on how many
+    meals the day already has. Edits and deletes must use the full recompute.
+    """
+    if not DAILY_LIMIT_MG:
+        return _recompute_daily_summary(user, day_date, device=device)
+
+    def _increment():
+        return DailySummary.objects.filter(user=user, date=day_date).update(
+            total_mg=F('total_mg') + added_mg,
+            percent_of_limit=_percent_of_limit_expr(F('total_mg') + added_mg),
+            highest_meal=Case(
+                When(Q(highest_meal__isnull=True) | Q(highest_mg__lt=top_meal.sodium_mg), then=Value(top_meal.pk)),
+                default=F('highest_meal'),
+                output_field=BigIntegerField(),
+            ),
+            highest_mg=Greatest(F('highest_mg'), Value(top_meal.sodium_mg)),
+            last_updated=timezone.now(),
+        )
+
+    created = False
+    if not _increment():
+        try:
+            with transaction.atomic():
+                DailySummary.objects.create(
+                    user=user, date=day_date,
+                    total_mg=added_mg,
+                    percent_of_limit=round((added_mg / DAILY_LIMIT_MG) * 100, 1),
+                    highest_meal=top_meal,
+                    highest_mg=top_meal.sodium_mg,
+                )
+            created = True
+        except IntegrityError:
+            # Another request created the row first; fold into it instead.
+            _increment()
+
+    summary = DailySummary.objects.get(user=user, date=day_date)
+    evaluate_alerts(user, day_date, summary.total_mg, device=device)
+    refresh_closed_week(user, day_date)
+    _apply_rollup_delta(user, day_date, added_mg, summary.total_mg, created)
+    events.publish(user, 'summary', summary_as_dict(summary))
+    return summary
+
+
+def recompute_daily_summary(user, day_date):
+    """Rebuild a day's summary from its meals (repair, see recompute_daily_summaries)."""
+    summary = _recompute_daily_summary(user, day_date)
+    _data_changed(user, [day_date])
+    return summary
+
+
+@transaction.atomic
+def _recompute_daily_summary(user, day_date, device=None):
+    # Lock the day's summary so the rollup delta below is taken against the
+    # total it replaces; concurrent increments wait for this recompute.
+    previous = (
+        DailySummary.objects.select_for_update().filter(user=user, date=day_date)
+        .values_list('total_mg', flat=True).first()
+    )
+    meals = Meal.objects.filter(user=user, day=day_date)
     total_mg = meals.aggregate(total=Sum('sodium_mg'))['total'] or 0
 
     percent = (total_mg / DAILY_LIMIT_MG) * 100 if DAILY_LIMIT_MG else 0
@@ -60,25 +277,517 @@ def _recompute_daily_summary(user, day_date):
             'total_mg': int(total_mg),
             'percent_of_limit': round(percent, 1),
             'highest_meal': highest,
+            'highest_mg': highest.sodium_mg if highest else 0,
         }
     )
 
-    _create_threshold_alerts(user, day_date, total_mg)
+    evaluate_alerts(user, day_date, total_mg, device=device)
+    refresh_closed_week(user, day_date)
+    _apply_rollup_delta(user, day_date, int(total_mg) - (previous or 0), int(total_mg), created)
+    events.publish(user, 'summary', summary_as_dict(summary))
     return summary
 
 
-def _create_threshold_alerts(user, day_date, total_mg):
-    for code, value, severity in THRESHOLDS:
-        if total_mg >= value:
-            exists = Alert.objects.filter(user=user, date=day_date, threshold=code).exists()
-            if not exists:
-                Alert.objects.create(
-                    user=user,
-                    date=day_date,
-                    threshold=code,
-                    severity=severity,
-                    message=ALERT_MESSAGES.get(code, ''),
-                )
+def crossed_thresholds(total_mg):
+    """THRESHOLDS entries reached by ``total_mg``, lowest first (pure, no queries)."""
+    return [t for t in THRESHOLDS if total_mg >= t[1]]
+
+
+def highest_alert(total_mg):
+    """``(threshold, severity, message)`` for the highest threshold reached, or Nones."""
+    crossed = crossed_thresholds(total_mg)
+    if not crossed:
+        return None, None, None
+    code, _, severity = crossed[-1]
+    return code, severity, ALERT_MESSAGES.get(code, '')
+
+
+def evaluate_alerts(user, day_date, total_mg, device=None):
+    """Single-pass threshold alert engine.
+
+    Computes every crossed threshold in memory, loads the thresholds already
+    alerted for the user/day in one query and inserts the missing ones with one
+    ``bulk_create(ignore_conflicts=True)``: at most two statements. The unique
+    (user, date, threshold) constraint makes concurrent evaluations safe.
+    ``device`` is recorded on newly created alerts for attribution. Returns
+    the alerts this call tried to insert; when the user has open event
+    streams, the ones it actually stored are published as `alert` events
+    after commit.
+    """
+    crossed = crossed_thresholds(total_mg)
+    if not crossed:
+        return []
+    existing = set(
+        Alert.objects.filter(user=user, date=day_date).values_list('threshold', flat=True)
+    )
+    percent = round((total_mg / DAILY_LIMIT_MG) * 100, 1) if DAILY_LIMIT_MG else None
+    new_alerts = [
+        Alert(
+            user=user,
+            date=day_date,
+            threshold=code,
+            severity=severity,
+            message=ALERT_MESSAGES.get(code, ''),
+            sodium_total=total_mg,
+            threshold_percent=percent,
+            device=device,
+        )
+        for code, _, severity in crossed
+        if code not in existing
+    ]
+    if new_alerts:
+        Alert.objects.bulk_create(new_alerts, ignore_conflicts=True)
+        user_id = getattr(user, 'pk', user)
+        if events.broker.subscriber_count(user_id):
+            transaction.on_commit(lambda: _publish_stored_alerts(user_id, day_date, new_alerts))
+    return new_alerts
+
+
+def _publish_stored_alerts(user_id, day_date, alerts):
+    # ignore_conflicts skips rows a concurrent evaluation inserted first (and
+    # sets no pks): publish only the rows stored with our created_at.
+    stored = dict(
+        Alert.objects.filter(user_id=user_id, date=day_date, threshold__in=[a.threshold for a in alerts])
+        .values_list('threshold', 'created_at')
+    )
+    for alert in alerts:
+        if stored.get(alert.threshold) == alert.created_at:
+            events.broker.publish(user_id, 'alert', {
+                'date': str(day_date),
+                'threshold': alert.threshold,
+                'severity': alert.severity,
+                'message': alert.message,
+                'sodium_total': alert.sodium_total,
+                'threshold_percent': alert.threshold_percent,
+            })
+
+
+def week_start(day_date):
+    """Monday of ``day_date``'s ISO week."""
+    return day_date - timedelta(days=day_date.weekday())
+
+
+def generate_weekly_reports(user_ids=None, since=None, until=None):
+    """Materialize WeeklyReport rows from DailySummary with set-based queries.
+
+    One grouped query computes every (user, ISO week) in the range, including
+    the highest day via a correlated subquery, and one upsert writes them.
+    ``since``/``until`` are widened to whole weeks; ``user_ids`` limits the
+    users (callers chunk large populations). Returns the rows written.
+    """
+    summaries = DailySummary.objects.all()
+    if user_ids is not None:
+        summaries = summaries.filter(user_id__in=user_ids)
+    if since is not None:
+        summaries = summaries.filter(date__gte=week_start(since))
+    if until is not None:
+        summaries = summaries.filter(date__lte=week_start(until) + timedelta(days=6))
+
+    highest_day = (
+        DailySummary.objects
+        .annotate(week=TruncWeek('date'))
+        .filter(user=OuterRef('user_id'), week=OuterRef('week'))
+        .order_by('-total_mg', 'date')
+        .values('date')[:1]
+    )
+    rows = (
+        summaries
+        .annotate(week=TruncWeek('date'))
+        .values('user_id', 'week')
+        .annotate(
+            avg_daily_mg=Avg('total_mg'),
+            days_over_limit=Count('pk', filter=Q(total_mg__gte=DAILY_LIMIT_MG)),
+            highest_day=Subquery(highest_day),
+        )
+        .order_by()
+    )
+    reports = [
+        WeeklyReport(
+            user_id=row['user_id'],
+            week_start=row['week'],
+            avg_daily_mg=round(float(row['avg_daily_mg'] or 0), 1),
+            days_over_limit=row['days_over_limit'],
+            highest_day=row['highest_day'],
+        )
+        for row in rows
+    ]
+    WeeklyReport.objects.bulk_create(
+        reports,
+        update_conflicts=True,
+        unique_fields=['user', 'week_start'],
+        update_fields=['avg_daily_mg', 'days_over_limit', 'highest_day', 'generated_at'],
+    )
+    return len(reports)
+
+
+def refresh_closed_week(user, day_date):
+    """Incremental hook: re-materialize the report of a past week whose day changed.
+
+    The current week is always computed live, so only back-dated changes pay
+    for the (single-week, single-user) regeneration.
+    """
+    if week_start(day_date) < week_start(timezone.localdate()):
+        generate_weekly_reports(user_ids=[user.pk], since=day_date, until=day_date)
+
+
+def get_weekly_report(user, day_date):
+    """Weekly figures for the ISO week containing ``day_date``.
+
+    Returns ``(report, summaries)``. Past weeks come from the materialized
+    WeeklyReport row (generated on first access if missing) with ``summaries``
+    set to None. The current week is computed from its DailySummary rows,
+    which are returned too; ``report`` is then an unsaved WeeklyReport.
+    """
+    start = week_start(day_date)
+    if start < week_start(timezone.localdate()):
+        report = WeeklyReport.objects.filter(user=user, week_start=start).first()
+        if report is None and generate_weekly_reports(user_ids=[user.pk], since=start, until=start):
+            report = WeeklyReport.objects.filter(user=user, week_start=start).first()
+        return report, None
+    summaries = list(
+        DailySummary.objects.filter(user=user, date__range=(start, start + timedelta(days=6))).order_by('date')
+    )
+    return _weekly_report_from_summaries(user, start, summaries), summaries
+
+
+async def aget_weekly_report(user, day_date):
+    """Async ORM twin of ``get_weekly_report`` for ASGI views."""
+    start = week_start(day_date)
+    if start < week_start(timezone.localdate()):
+        report = await WeeklyReport.objects.filter(user=user, week_start=start).afirst()
+        if report is None:
+            return await sync_to_async(get_weekly_report)(user, day_date)
+        return report, None
+    summaries = [
+        s async for s in DailySummary.objects.filter(
+            user=user, date__range=(start, start + timedelta(days=6))
+        ).order_by('date')
+    ]
+    return _weekly_report_from_summaries(user, start, summaries), summaries
+
+
+def _weekly_report_from_summaries(user, start, summaries):
+    totals = [s.total_mg for s in summaries]
+    highest = max(summaries, key=lambda s: s.total_mg, default=None)
+    return WeeklyReport(
+        user=user,
+        week_start=start,
+        avg_daily_mg=round(sum(totals) / len(totals), 1) if totals else 0.0,
+        days_over_limit=sum(1 for total in totals if total >= DAILY_LIMIT_MG),
+        highest_day=highest.date if highest else None,
+    )
+
+
+def month_start(day_date):
+    return day_date.replace(day=1)
+
+
+def year_start(day_date):
+    return day_date.replace(month=1, day=1)
+
+
+def rebuild_sodium_rollups(user_ids=None, since=None, until=None):
+    """Recompute month and year SodiumRollup rows with set-based queries.
+
+    Months are grouped from DailySummary, then years from the month rows, each
+    with one grouped query and one upsert. ``since``/``until`` are widened to
+    whole years. Returns the number of rows written.
+    """
+    summaries = DailySummary.objects.all()
+    months = SodiumRollup.objects.filter(period='month')
+    if user_ids is not None:
+        summaries = summaries.filter(user_id__in=user_ids)
+        months = months.filter(user_id__in=user_ids)
+    if since is not None:
+        summaries = summaries.filter(date__gte=year_start(since))
+        months = months.filter(period_start__gte=year_start(since))
+    if until is not None:
+        end = date(until.year, 12, 31)
+        summaries = summaries.filter(date__lte=end)
+        months = months.filter(period_start__lte=end)
+
+    month_rows = (
+        summaries
+        .annotate(start=TruncMonth('date'))
+        .values('user_id', 'start')
+        .annotate(
+            total=Sum('total_mg'),
+            days=Count('pk'),
+            over=Count('pk', filter=Q(total_mg__gte=DAILY_LIMIT_MG)),
+            peak=Max('total_mg'),
+        )
+        .order_by()
+    )
+    written = _upsert_rollups('month', month_rows)
+    year_rows = (
+        months
+        .annotate(start=TruncYear('period_start'))
+        .values('user_id', 'start')
+        .annotate(
+            total=Sum('total_mg'),
+            days=Sum('days_logged'),
+            over=Sum('days_over_limit'),
+            peak=Max('max_day_mg'),
+        )
+        .order_by()
+    )
+    return written + _upsert_rollups('year', year_rows)
+
+
+def _upsert_rollups(period, rows):
+    rollups = [
+        SodiumRollup(
+            user_id=row['user_id'],
+            period=period,
+            period_start=row['start'],
+            total_mg=row['total'] or 0,
+            days_logged=row['days'] or 0,
+            days_over_limit=row['over'] or 0,
+            max_day_mg=row['peak'] or 0,
+        )
+        for row in rows
+    ]
+    SodiumRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['user', 'period', 'period_start'],
+        update_fields=['total_mg', 'days_logged', 'days_over_limit', 'max_day_mg', 'last_updated'],
+    )
+    return len(rollups)
+
+
+def _apply_rollup_delta(user, day_date, added_mg, day_total, day_created):
+    """Fold a DailySummary change (``added_mg``, negative for a decrease, that
+    left the day at ``day_total``) into its month and year rows: one UPDATE of
+    SQL increments, so concurrent writes to the same period never overwrite
+    each other.
+
+    A new day first creates both rows empty (ignoring conflicts), so the first
+    writes to a period land as increments too. A decrease cannot un-apply the
+    peak day, so it is re-read from DailySummary (one query bounded by the
+    year). Rebuilding from scratch is left to ``rebuild_sodium_rollups``.
+    """
+    month, year = month_start(day_date), year_start(day_date)
+    if day_created:
+        SodiumRollup.objects.bulk_create(
+            [
+                SodiumRollup(user=user, period='month', period_start=month),
+                SodiumRollup(user=user, period='year', period_start=year),
+            ],
+            ignore_conflicts=True,
+        )
+    previous = day_total - added_mg
+    over = int(day_total >= DAILY_LIMIT_MG) - int(not day_created and previous >= DAILY_LIMIT_MG)
+    if added_mg >= 0:
+        peak = Greatest(F('max_day_mg'), Value(day_total))
+    else:
+        peaks = DailySummary.objects.filter(user=user, date__gte=year, date__lt=date(year.year + 1, 1, 1)).aggregate(
+            month=Max('total_mg', filter=Q(date__gte=month, date__lt=_next_month(month))),
+            year=Max('total_mg'),
+        )
+        peak = Case(
+            When(period='month', then=Value(peaks['month'] or 0)),
+            default=Value(peaks['year'] or 0),
+        )
+    SodiumRollup.objects.filter(
+        Q(period='month', period_start=month) | Q(period='year', period_start=year),
+        user=user,
+    ).update(
+        total_mg=F('total_mg') + added_mg,
+        days_logged=F('days_logged') + (1 if day_created else 0),
+        days_over_limit=F('days_over_limit') + over,
+        max_day_mg=peak,
+        last_updated=timezone.now(),
+    )
+
+
+RANGE_RESOLUTIONS = ('day', 'month', 'quarter', 'year')
+
+
+def _bucket_start(day_date, resolution):
+    if resolution == 'day':
+        return day_date
+    if resolution == 'month':
+        return month_start(day_date)
+    if resolution == 'quarter':
+        return day_date.replace(month=(day_date.month - 1) // 3 * 3 + 1, day=1)
+    return year_start(day_date)
+
+
+def _next_month(day_date):
+    return date(day_date.year + day_date.month // 12, day_date.month % 12 + 1, 1)
+
+
+def _bucket_end(bucket_start, resolution):
+    if resolution == 'day':
+        return bucket_start
+    months = {'month': 1, 'quarter': 3, 'year': 12}[resolution]
+    end = bucket_start
+    for _ in range(months):
+        end = _next_month(end)
+    return end - timedelta(days=1)
+
+
+def get_sodium_range(user, start, end, resolution):
+    """Sodium totals for ``start``..``end`` (inclusive) grouped by ``resolution``.
+
+    Each bucket is answered from the coarsest data that covers it: whole years
+    from year rollups (resolution 'year'), whole months from month rollups and
+    only the partial months at the range edges from DailySummary. That is at
+    most two queries regardless of the range length. Returns a list of dicts
+    ordered by bucket start.
+    """
+    if resolution not in RANGE_RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RANGE_RESOLUTIONS)}")
+    if end < start:
+        raise ValueError('end must not be before start')
+
+    # Split the range into edge days and whole months/years.
+    day_ranges = []
+    if resolution == 'day':
+        day_ranges.append((start, end))
+        first_month = last_month = None
+    else:
+        # First and last whole months, as month starts.
+        first_month = start if start.day == 1 else _next_month(start)
+        if (end + timedelta(days=1)).day == 1:
+            last_month = month_start(end)
+        else:
+            last_month = month_start(month_start(end) - timedelta(days=1))
+        if first_month > last_month:
+            day_ranges.append((start, end))
+            first_month = last_month = None
+        else:
+            if start < first_month:
+                day_ranges.append((start, first_month - timedelta(days=1)))
+            if end >= _next_month(last_month):
+                day_ranges.append((_next_month(last_month), end))
+
+    pieces = []  # (date inside the bucket, total, days, over, peak)
+    if first_month is not None:
+        month_keys = set()
+        year_keys = set()
+        cursor = first_month
+        while cursor <= last_month:
+            if resolution == 'year' and cursor.month == 1 and date(cursor.year, 12, 1) <= last_month:
+                year_keys.add(cursor)
+                cursor = date(cursor.year + 1, 1, 1)
+            else:
+                month_keys.add(cursor)
+                cursor = _next_month(cursor)
+        periods = Q(period='month', period_start__in=month_keys) | Q(period='year', period_start__in=year_keys)
+        pieces.extend(
+            SodiumRollup.objects.filter(periods, user=user)
+            .values_list('period_start', 'total_mg', 'days_logged', 'days_over_limit', 'max_day_mg')
+        )
+    if day_ranges:
+        days = Q()
+        for lo, hi in day_ranges:
+            days |= Q(date__range=(lo, hi))
+        pieces.extend(
+            (row[0], row[1], 1, 1 if row[1] >= DAILY_LIMIT_MG else 0, row[1])
+            for row in DailySummary.objects.filter(days, user=user).values_list('date', 'total_mg')
+        )
+
+    buckets = {}
+    for piece_date, total, days_logged, over, peak in pieces:
+        key = _bucket_start(piece_date, resolution)
+        bucket = buckets.setdefault(key, {'total_mg': 0, 'days_logged': 0, 'days_over_limit': 0, 'max_day_mg': 0})
+        bucket['total_mg'] += total
+        bucket['days_logged'] += days_logged
+        bucket['days_over_limit'] += over
+        bucket['max_day_mg'] = max(bucket['max_day_mg'], peak)
+    result = []
+    for key in sorted(buckets):
+        bucket = buckets[key]
+        bucket['start'] = max(key, start)
+        bucket['end'] = min(_bucket_end(key, resolution), end)
+        bucket['avg_daily_mg'] = round(bucket['total_mg'] / bucket['days_logged'], 1) if bucket['days_logged'] else 0.0
+        result.append(bucket)
+    return result
+
+
+TODAY_CACHE_TIMEOUT = getattr(settings, 'SODIUM_TODAY_CACHE_TIMEOUT', 300)
+
+
+def _today_cache_key(user_id, day_date):
+    return f'sodium:today:{user_id}:{day_date.isoformat()}'
+
+
+def summary_as_dict(summary):
+    if not summary:
+        return None
+    return {
+        'date': str(summary.date),
+        'total_mg': summary.total_mg,
+        'percent_of_limit': summary.percent_of_limit,
+    }
+
+
+def today_snapshot(user, day_date, version=None):
+    """Serialized summary, advice and unread alerts for ``user`` on ``day_date``.
+
+    Read through the cache keyed by (user, day). Writes drop the key
+    (``invalidate_today_snapshots``); ``version``, the user's data version when
+    the caller knows it, additionally rejects entries cached before a write
+    made by another process when the cache is not shared.
+    """
+    key = _today_cache_key(user.pk, day_date)
+    cached = cache.get(key)
+    if cached is not None and (version is None or cached['version'] == version):
+        return cached['snapshot']
+    summary, advice = get_daily_summary_and_advice(user, day_date)
+    snapshot = {
+        'summary': summary_as_dict(summary),
+        'advice': advice,
+        'alerts': list(
+            Alert.objects.filter(user=user, date=day_date, is_read=False)
+            .values('threshold', 'message', 'severity', 'created_at')
+        ),
+    }
+    cache.set(key, {'version': version, 'snapshot': snapshot}, TODAY_CACHE_TIMEOUT)
+    return snapshot
+
+
+async def atoday_snapshot(user, day_date, version=None):
+    """Async twin of ``today_snapshot`` for ASGI views."""
+    key = _today_cache_key(user.pk, day_date)
+    cached = await cache.aget(key)
+    if cached is not None and (version is None or cached['version'] == version):
+        return cached['snapshot']
+    summary, advice = await aget_daily_summary_and_advice(user, day_date)
+    snapshot = {
+        'summary': summary_as_dict(summary),
+        'advice': advice,
+        'alerts': [
+            a async for a in Alert.objects.filter(user=user, date=day_date, is_read=False)
+            .values('threshold', 'message', 'severity', 'created_at')
+        ],
+    }
+    await cache.aset(key, {'version': version, 'snapshot': snapshot}, TODAY_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_today_snapshots(user, days):
+    """Drop cached snapshots of ``days`` once the current transaction commits."""
+    keys = [_today_cache_key(getattr(user, 'pk', user), day) for day in days]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def mark_alerts_read(user, alert_ids=None):
+    """Mark ``user``'s unread alerts (all, or only ``alert_ids``) as read.
+
+    Returns the number of alerts changed.
+    """
+    alerts = Alert.objects.filter(user=user, is_read=False)
+    if alert_ids is not None:
+        alerts = alerts.filter(pk__in=alert_ids)
+    with transaction.atomic():
+        days = set(alerts.values_list('date', flat=True).distinct().order_by())
+        changed = alerts.update(is_read=True)
+        if changed:
+            _data_changed(user, days)
+    return changed
 
 
 def get_daily_summary_and_advice(user, day_date):
@@ -86,7 +795,16 @@ def get_daily_summary_and_advice(user, day_date):
         summary = DailySummary.objects.get(user=user, date=day_date)
     except DailySummary.DoesNotExist:
         summary = None
+    return summary, advice_for_summary(summary)
 
+
+async def aget_daily_summary_and_advice(user, day_date):
+    """Async ORM twin of ``get_daily_summary_and_advice`` for ASGI views."""
+    summary = await DailySummary.objects.filter(user=user, date=day_date).afirst()
+    return summary, advice_for_summary(summary)
+
+
+def advice_for_summary(summary):
     advice = ''
     if summary:
         pct = summary.percent_of_limit
@@ -102,5 +820,4 @@ def get_daily_summary_and_advice(user, day_date):
             advice = 'You are within safe limits — keep choosing low-sodium options.'
     else:
         advice = 'No meals recorded today. Add a meal or take a spoon reading.'
-
-    return summary, advice
+    return advice
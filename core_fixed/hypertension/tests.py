@@ -1,3 +1,756 @@
-from django.test import TestCase
+import base64
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bp_services, events, presence
+from .bp_services import (
+    BP_STAT_WINDOWS, add_watch_readings_bulk, bp_chart_series, bp_statistics, bp_timeline,
+    decode_timeline_cursor, encode_timeline_cursor, get_watch_sync, rebuild_bp_aggregates, rebuild_bp_statistics,
+)
+from .models import (
+    Alert, BloodPressureReading, BPAggregate, BPStatistics, DailySummary, Device, DirtySummaryDay, Meal, Profile,
+    WatchBloodPressure, WatchRawPayload, WatchSync,
+)
+from . import sodium_services
+from .sodium_services import (
+    _recompute_daily_summary, add_device_meal, add_meal_and_update, add_meals_bulk, evaluate_alerts,
+    get_sodium_range, process_dirty_summaries,
+)
+
+
+def local_noon(day_date):
+    return timezone.make_aware(datetime.combine(day_date, time(12)))
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrate back to ``migrate_from``, let the test seed rows through the
+    historical models, then migrate forward to ``migrate_to``."""
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        self.apps = self.migrate(self.migrate_from)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self, name):
+        target = [('hypertension', name)]
+        MigrationExecutor(connection).migrate(target)
+        executor = MigrationExecutor(connection)
+        return executor.loader.project_state(target).apps
+
+
+class LocalDayBackfillTests(MigrationTestCase):
+    migrate_from = '0013_meal_device_reading_id'
+    migrate_to = '0014_local_day_columns'
+
+    def test_day_is_the_local_date_of_recorded_at(self):
+        user = self.apps.get_model('auth', 'User').objects.create(username='alice')
+        profile = self.apps.get_model('hypertension', 'Profile').objects.create(user_id=user.pk)
+        sync = self.apps.get_model('hypertension', 'WatchSync').objects.create(user_id=user.pk)
+        # 20:00 UTC on 1 January is 01:30 on 2 January in Asia/Kolkata.
+        recorded_at = datetime(2026, 1, 1, 20, 0, tzinfo=dt_timezone.utc)
+        self.apps.get_model('hypertension', 'Meal').objects.create(
+            user_id=user.pk, name='Soup', sodium_mg=900, recorded_at=recorded_at)
+        manual = self.apps.get_model('hypertension', 'BloodPressureReading')
+        manual.objects.create(profile_id=profile.pk, systolic=120, diastolic=80)
+        manual.objects.update(recorded_at=recorded_at)  # auto_now_add ignores the kwarg
+        self.apps.get_model('hypertension', 'WatchBloodPressure').objects.create(
+            watch_sync_id=sync.pk, systolic=130, diastolic=85, recorded_at=recorded_at)
+
+        apps = self.migrate(self.migrate_to)
+
+        for name in ('Meal', 'BloodPressureReading', 'WatchBloodPressure'):
+            days = list(apps.get_model('hypertension', name).objects.values_list('day', flat=True))
+            self.assertEqual(days, [date(2026, 1, 2)], name)
+
+
+
+class AggregateBackfillTests(MigrationTestCase):
+    migrate_from = '0017_profile_latest_readings'
+    migrate_to = '0018_bpaggregate'
+
+    def test_hour_and_day_aggregates_are_built_from_existing_readings(self):
+        user = self.apps.get_model('auth', 'User').objects.create(username='alice')
+        profile = self.apps.get_model('hypertension', 'Profile').objects.create(user_id=user.pk)
+        sync = self.apps.get_model('hypertension', 'WatchSync').objects.create(user_id=user.pk)
+        manual = self.apps.get_model('hypertension', 'BloodPressureReading')
+        # 04:00 and 04:20 UTC are 09:30 and 09:50 in Asia/Kolkata; 05:30 UTC is 11:00.
+        for minute, systolic, pulse in ((0, 120, 70), (20, 140, None), (90, 130, 80)):
+            reading = manual.objects.create(profile_id=profile.pk, systolic=systolic, diastolic=80, pulse=pulse)
+            manual.objects.filter(pk=reading.pk).update(
+                recorded_at=datetime(2026, 1, 1, 4, 0, tzinfo=dt_timezone.utc) + timedelta(minutes=minute))
+        self.apps.get_model('hypertension', 'WatchBloodPressure').objects.create(
+            watch_sync_id=sync.pk, systolic=150, diastolic=95, recorded_at=datetime(2026, 1, 1, 20, 0, tzinfo=dt_timezone.utc))
+
+        apps = self.migrate(self.migrate_to)
+
+        rows = apps.get_model('hypertension', 'BPAggregate').objects.order_by('source', 'period', 'period_start')
+        self.assertEqual(
+            [
+                (row.source, row.period, timezone.localtime(row.period_start).strftime('%m-%d %H'), row.count,
+                 row.systolic_sum, row.systolic_sum_sq, row.systolic_max, row.pulse_count, row.pulse_sum)
+                for row in rows
+            ],
+            [
+                ('manual', 'day', '01-01 00', 3, 390, 50900, 140, 2, 150),
+                ('manual', 'hour', '01-01 09', 2, 260, 34000, 140, 1, 70),
+                ('manual', 'hour', '01-01 11', 1, 130, 16900, 130, 1, 80),
+                ('watch', 'day', '01-02 00', 1, 150, 22500, 150, 0, 0),
+                ('watch', 'hour', '01-02 01', 1, 150, 22500, 150, 0, 0),
+            ],
+        )
+
+class UnifiedReadingBackfillTests(MigrationTestCase):
+    migrate_from = '0018_bpaggregate'
+    migrate_to = '0019_bpreading'
+
+    def test_copies_both_sources_with_local_day(self):
+        user = self.apps.get_model('auth', 'User').objects.create(username='alice')
+        profile = self.apps.get_model('hypertension', 'Profile').objects.create(user_id=user.pk)
+        sync = self.apps.get_model('hypertension', 'WatchSync').objects.create(user_id=user.pk)
+        recorded_at = datetime(2026, 1, 1, 20, 0, tzinfo=dt_timezone.utc)
+        manual = self.apps.get_model('hypertension', 'BloodPressureReading')
+        watch = self.apps.get_model('hypertension', 'WatchBloodPressure')
+        reading = manual.objects.create(profile_id=profile.pk, systolic=120, diastolic=80)
+        watch_reading = watch.objects.create(watch_sync_id=sync.pk, systolic=130, diastolic=85, recorded_at=recorded_at)
+        # Rows written before `day` was maintained carry NULL there.
+        manual.objects.update(recorded_at=recorded_at, day=None)
+        watch.objects.update(day=None)
+
+        apps = self.migrate(self.migrate_to)
+
+        rows = apps.get_model('hypertension', 'BPReading').objects.order_by('source')
+        self.assertEqual(
+            list(rows.values_list('user_id', 'source', 'source_id', 'systolic', 'recorded_at', 'day')),
+            [
+                (user.pk, 'manual', reading.pk, 120, recorded_at, date(2026, 1, 2)),
+                (user.pk, 'watch', watch_reading.pk, 130, recorded_at, date(2026, 1, 2)),
+            ],
+        )
+
+class SeverityBackfillTests(MigrationTestCase):
+    migrate_from = '0021_watch_raw_payload'
+    migrate_to = '0022_bp_severity'
+
+    def test_existing_readings_are_classified(self):
+        user = self.apps.get_model('auth', 'User').objects.create(username='alice')
+        profile = self.apps.get_model('hypertension', 'Profile').objects.create(user_id=user.pk)
+        sync = self.apps.get_model('hypertension', 'WatchSync').objects.create(user_id=user.pk)
+        now = timezone.now()
+        manual = self.apps.get_model('hypertension', 'BloodPressureReading')
+        watch = self.apps.get_model('hypertension', 'WatchBloodPressure')
+        unified = self.apps.get_model('hypertension', 'BPReading')
+        values = [(115, 75), (125, 75), (135, 85), (150, 95), (185, 100)]
+        for i, (systolic, diastolic) in enumerate(values):
+            reading = manual.objects.create(profile_id=profile.pk, systolic=systolic, diastolic=diastolic)
+            watch.objects.create(watch_sync_id=sync.pk, systolic=systolic, diastolic=diastolic, recorded_at=now - timedelta(minutes=i))
+            unified.objects.create(
+                user_id=user.pk, source='manual', source_id=reading.pk,
+                systolic=systolic, diastolic=diastolic, recorded_at=now - timedelta(minutes=i),
+            )
+
+        apps = self.migrate(self.migrate_to)
+
+        expected = ['normal', 'elevated', 'stage1', 'stage2', 'emergency']
+        for name in ('BloodPressureReading', 'WatchBloodPressure', 'BPReading'):
+            severities = list(apps.get_model('hypertension', name).objects.order_by('systolic').values_list('severity', flat=True))
+            self.assertEqual(severities, expected, name)
+
+class StatisticsBackfillTests(MigrationTestCase):
+    migrate_from = '0022_bp_severity'
+    migrate_to = '0023_bpstatistics'
+
+    def test_rows_are_built_for_users_with_recent_readings(self):
+        User = self.apps.get_model('auth', 'User')
+        unified = self.apps.get_model('hypertension', 'BPReading')
+        active, idle = User.objects.create(username='alice'), User.objects.create(username='bob')
+        now = timezone.now()
+        for i, (user, systolic, days_ago) in enumerate([(active, 120, 1), (active, 140, 10), (idle, 150, 40)]):
+            unified.objects.create(
+                user_id=user.pk, source='manual', source_id=i + 1, systolic=systolic, diastolic=80,
+                recorded_at=now - timedelta(days=days_ago),
+            )
+
+        apps = self.migrate(self.migrate_to)
+
+        rows = apps.get_model('hypertension', 'BPStatistics').objects.order_by('source', 'window_days')
+        self.assertEqual(
+            list(rows.values_list('user_id', 'source', 'window_days', 'as_of', 'count', 'systolic_mean')),
+            [
+                (active.pk, 'manual', 7, timezone.localdate(), 1, 120.0),
+                (active.pk, 'manual', 30, timezone.localdate(), 2, 130.0),
+                (active.pk, 'watch', 7, timezone.localdate(), 0, 0.0),
+                (active.pk, 'watch', 30, timezone.localdate(), 0, 0.0),
+            ],
+        )
+
+class SodiumRangeTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        # One meal a day either side of each month and year edge used below,
+        # plus two whole months and a whole year the rollups must answer.
+        self.meals = {
+            date(2024, 12, 14): 300, date(2024, 12, 15): 2500, date(2024, 12, 31): 400,
+            date(2025, 1, 1): 1000, date(2025, 6, 30): 2200, date(2025, 12, 31): 700,
+            date(2026, 1, 1): 800, date(2026, 1, 31): 2100, date(2026, 2, 1): 600,
+            date(2026, 2, 10): 500, date(2026, 2, 11): 900,
+        }
+        for day, sodium_mg in self.meals.items():
+            add_meal_and_update(self.user, 'Meal', sodium_mg, recorded_at=local_noon(day))
+
+    def expected(self, start, end):
+        return {day: mg for day, mg in self.meals.items() if start <= day <= end}
+
+    def test_month_buckets_split_partial_edges_from_whole_months(self):
+        start, end = date(2025, 12, 20), date(2026, 2, 10)
+        with self.assertNumQueries(2):
+            buckets = get_sodium_range(self.user, start, end, 'month')
+
+        self.assertEqual(
+            [(b['start'], b['end'], b['total_mg'], b['days_logged']) for b in buckets],
+            [
+                (date(2025, 12, 20), date(2025, 12, 31), 700, 1),
+                (date(2026, 1, 1), date(2026, 1, 31), 2900, 2),
+                (date(2026, 2, 1), date(2026, 2, 10), 1100, 2),
+            ],
+        )
+        self.assertEqual(sum(b['total_mg'] for b in buckets), sum(self.expected(start, end).values()))
+        self.assertEqual(buckets[1]['days_over_limit'], 1)
+        self.assertEqual(buckets[1]['max_day_mg'], 2100)
+
+    def test_year_buckets_use_year_rollups_and_daily_edges(self):
+        start, end = date(2024, 12, 15), date(2026, 1, 10)
+        with self.assertNumQueries(2):
+            buckets = get_sodium_range(self.user, start, end, 'year')
+
+        self.assertEqual(
+            [(b['start'], b['end'], b['total_mg'], b['days_over_limit']) for b in buckets],
+            [
+                (date(2024, 12, 15), date(2024, 12, 31), 2900, 1),
+                (date(2025, 1, 1), date(2025, 12, 31), 3900, 1),
+                (date(2026, 1, 1), date(2026, 1, 10), 800, 0),
+            ],
+        )
+        self.assertEqual(buckets[1]['avg_daily_mg'], 1300.0)
+
+    def test_range_inside_one_month_reads_daily_summaries_only(self):
+        buckets = get_sodium_range(self.user, date(2026, 1, 2), date(2026, 1, 31), 'month')
+
+        self.assertEqual(len(buckets), 1)
+        self.assertEqual((buckets[0]['start'], buckets[0]['end']), (date(2026, 1, 2), date(2026, 1, 31)))
+        self.assertEqual(buckets[0]['total_mg'], 2100)
+
+    def test_day_buckets_and_invalid_arguments(self):
+        buckets = get_sodium_range(self.user, date(2026, 1, 31), date(2026, 2, 1), 'day')
+        self.assertEqual([(b['start'], b['total_mg']) for b in buckets], [(date(2026, 1, 31), 2100), (date(2026, 2, 1), 600)])
+
+        with self.assertRaises(ValueError):
+            get_sodium_range(self.user, date(2026, 2, 1), date(2026, 1, 31), 'month')
+        with self.assertRaises(ValueError):
+            get_sodium_range(self.user, date(2026, 1, 1), date(2026, 1, 31), 'week')
+
+
+class DailySummaryDeltaTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.day = date(2026, 3, 10)
+
+    def summary(self, day):
+        return DailySummary.objects.filter(user=self.user, date=day).values(
+            'total_mg', 'percent_of_limit', 'highest_meal_id', 'highest_mg',
+        ).get()
+
+    def test_increments_match_a_full_recompute(self):
+        other_day = self.day + timedelta(days=1)
+        for sodium_mg in (400, 1200, 300):
+            add_meal_and_update(self.user, 'Meal', sodium_mg, recorded_at=local_noon(self.day))
+        add_meals_bulk(self.user, [
+            {'name': 'Bulk', 'sodium_mg': 1500, 'recorded_at': local_noon(self.day)},
+            {'name': 'Bulk', 'sodium_mg': 250, 'recorded_at': local_noon(other_day)},
+            {'name': 'Bulk', 'sodium_mg': 900, 'recorded_at': local_noon(other_day)},
+        ])
+        incremental = {day: self.summary(day) for day in (self.day, other_day)}
+        self.assertEqual(incremental[self.day]['total_mg'], 3400)
+        self.assertEqual(incremental[self.day]['highest_mg'], 1500)
+
+        for day in (self.day, other_day):
+            _recompute_daily_summary(self.user, day)
+            self.assertEqual(self.summary(day), incremental[day], day)
+
+    def test_insert_cost_does_not_grow_with_meals_per_day(self):
+        # The first meal crosses the 50% alert, so every later one sees the same alert state.
+        add_meal_and_update(self.user, 'First', 1000, recorded_at=local_noon(self.day))
+        with CaptureQueriesContext(connection) as second:
+            add_meal_and_update(self.user, 'Second', 10, recorded_at=local_noon(self.day))
+        for _ in range(10):
+            add_meal_and_update(self.user, 'More', 10, recorded_at=local_noon(self.day))
+        with self.assertNumQueries(len(second)):
+            add_meal_and_update(self.user, 'Last', 10, recorded_at=local_noon(self.day))
+
+@override_settings(SODIUM_SUMMARY_MODE='deferred')
+class DeferredSummaryTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.days = [date(2026, 3, 10), date(2026, 3, 11)]
+        for sodium_mg in (600, 900):
+            add_meal_and_update(self.user, 'Meal', sodium_mg, recorded_at=local_noon(self.days[0]))
+        add_meals_bulk(self.user, [
+            {'name': 'Bulk', 'sodium_mg': 700, 'recorded_at': local_noon(self.days[0])},
+            {'name': 'Bulk', 'sodium_mg': 300, 'recorded_at': local_noon(self.days[1])},
+        ])
+
+    def test_writes_only_mark_days_and_coalesce(self):
+        self.assertFalse(DailySummary.objects.exists())
+        self.assertEqual(
+            sorted(DirtySummaryDay.objects.filter(user=self.user).values_list('date', flat=True)),
+            self.days,
+        )
+
+    def test_drain_recomputes_each_day_once(self):
+        with mock.patch.object(sodium_services, '_recompute_daily_summary', wraps=_recompute_daily_summary) as recompute:
+            self.assertEqual(process_dirty_summaries(), 2)
+        self.assertEqual(sorted(call.args[1] for call in recompute.call_args_list), self.days)
+        self.assertFalse(DirtySummaryDay.objects.exists())
+        self.assertEqual(
+            dict(DailySummary.objects.filter(user=self.user).values_list('date', 'total_mg')),
+            {self.days[0]: 2200, self.days[1]: 300},
+        )
+        self.assertEqual(
+            sorted(Alert.objects.filter(user=self.user, date=self.days[0]).values_list('threshold', flat=True)),
+            ['100', '50', '75'],
+        )
+        self.assertEqual(process_dirty_summaries(), 0)
+
+    def test_days_marked_during_the_drain_stay_queued(self):
+        def recompute_then_meal_arrives(user, day, *args, **kwargs):
+            summary = _recompute_daily_summary(user, day, *args, **kwargs)
+            if day == self.days[1]:
+                add_meal_and_update(self.user, 'Late', 50, recorded_at=local_noon(day) + timedelta(minutes=1))
+            return summary
+
+        with mock.patch.object(sodium_services, '_recompute_daily_summary', side_effect=recompute_then_meal_arrives):
+            process_dirty_summaries()
+        self.assertEqual(list(DirtySummaryDay.objects.values_list('date', flat=True)), [self.days[1]])
+
+        process_dirty_summaries()
+        self.assertFalse(DirtySummaryDay.objects.exists())
+        self.assertEqual(DailySummary.objects.get(user=self.user, date=self.days[1]).total_mg, 350)
+
+class AlertEngineTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.day = date(2026, 3, 10)
+
+    def thresholds(self):
+        return sorted(Alert.objects.filter(user=self.user, date=self.day).values_list('threshold', flat=True), key=int)
+
+    def test_one_alert_per_threshold_however_often_evaluated(self):
+        for total in (1100, 1600, 1600, 2500):
+            evaluate_alerts(self.user, self.day, total)
+        self.assertEqual(self.thresholds(), ['50', '75', '100', '120'])
+        self.assertEqual(Alert.objects.get(user=self.user, date=self.day, threshold='50').sodium_total, 1100)
+
+    def test_meal_ingestion_raises_each_alert_once(self):
+        for sodium_mg in (800, 400, 500, 400):
+            add_meal_and_update(self.user, 'Meal', sodium_mg, recorded_at=local_noon(self.day))
+        self.assertEqual(self.thresholds(), ['50', '75', '100'])
+
+    def test_unique_constraint_rejects_duplicates(self):
+        Alert.objects.create(user=self.user, date=self.day, threshold='50', message='first')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Alert.objects.create(user=self.user, date=self.day, threshold='50', message='second')
+
+    def test_concurrently_stored_alert_is_skipped(self):
+        # Stored after this evaluation's lookup: the INSERT skips it instead of failing.
+        insert = Alert.objects.bulk_create
+
+        def racing_insert(alerts, **kwargs):
+            Alert.objects.create(user=self.user, date=self.day, threshold='75', message='concurrent')
+            return insert(alerts, **kwargs)
+
+        with mock.patch.object(Alert.objects, 'bulk_create', side_effect=racing_insert):
+            evaluate_alerts(self.user, self.day, 1600)
+        self.assertEqual(self.thresholds(), ['50', '75'])
+        self.assertEqual(Alert.objects.get(user=self.user, date=self.day, threshold='75').message, 'concurrent')
+
+    def test_statement_budget(self):
+        with self.assertNumQueries(0):
+            evaluate_alerts(self.user, self.day, 500)
+        with self.assertNumQueries(2):
+            evaluate_alerts(self.user, self.day, 2500)
+        with self.assertNumQueries(1):
+            evaluate_alerts(self.user, self.day, 2600)
+
+class MealIdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.device = Device.objects.create(user=self.user, name='Spoon')
+        # Device posts buffer last_seen in the process-wide tracker; write it
+        # while the test database still exists.
+        self.addCleanup(presence.tracker.flush)
+        self.day = date(2026, 3, 10)
+
+    def total(self):
+        return DailySummary.objects.get(user=self.user, date=self.day).total_mg
+
+    def test_replayed_reading_is_stored_once(self):
+        meal, created = add_device_meal(self.user, self.device, reading_id='r-1', name='Soup', sodium_mg=900,
+                                        recorded_at=local_noon(self.day))
+        replay, replay_created = add_device_meal(self.user, self.device, reading_id='r-1', name='Soup', sodium_mg=900,
+                                                 recorded_at=local_noon(self.day))
+        self.assertEqual((created, replay_created, replay.pk), (True, False, meal.pk))
+        self.assertEqual(Meal.objects.filter(device=self.device).count(), 1)
+        self.assertEqual(self.total(), 900)
+
+    def test_same_reading_id_on_another_device_is_a_new_meal(self):
+        other = Device.objects.create(user=self.user, name='Spare')
+        for device in (self.device, other):
+            add_device_meal(self.user, device, reading_id='r-1', name='Soup', sodium_mg=300, recorded_at=local_noon(self.day))
+        self.assertEqual(self.total(), 600)
+
+    def test_racing_replay_returns_the_stored_meal(self):
+        meal, _ = add_device_meal(self.user, self.device, reading_id='r-1', name='Soup', sodium_mg=900, recorded_at=local_noon(self.day))
+        lookup = Meal.objects.filter
+        lookups = []
+
+        def racing_lookup(*args, **kwargs):
+            # The replay's lookup runs before the first post commits.
+            lookups.append(kwargs)
+            return Meal.objects.none() if len(lookups) == 1 else lookup(*args, **kwargs)
+
+        with mock.patch.object(Meal.objects, 'filter', side_effect=racing_lookup):
+            replay, created = add_device_meal(self.user, self.device, reading_id='r-1', name='Soup', sodium_mg=900,
+                                              recorded_at=local_noon(self.day))
+        self.assertEqual((replay.pk, created), (meal.pk, False))
+        self.assertEqual(self.total(), 900)
+
+    def test_bulk_replays_skip_stored_and_repeated_readings(self):
+        add_device_meal(self.user, self.device, reading_id='r-1', name='Soup', sodium_mg=500, recorded_at=local_noon(self.day))
+        batch = [
+            {'reading_id': 'r-1', 'sodium_mg': 500, 'recorded_at': local_noon(self.day)},
+            {'reading_id': 'r-2', 'sodium_mg': 200, 'recorded_at': local_noon(self.day)},
+            {'reading_id': 'r-2', 'sodium_mg': 200, 'recorded_at': local_noon(self.day)},
+        ]
+        results, _ = add_meals_bulk(self.user, batch, source='spoon', device=self.device)
+        self.assertEqual([created for _, created in results], [False, True, False])
+        self.assertEqual(results[1][0].pk, results[2][0].pk)
+
+        results, _ = add_meals_bulk(self.user, batch, source='spoon', device=self.device)
+        self.assertEqual([created for _, created in results], [False, False, False])
+        self.assertEqual(Meal.objects.filter(device=self.device).count(), 2)
+        self.assertEqual(self.total(), 700)
+
+    def test_api_replay_reports_duplicate(self):
+        url = reverse('hypertension:api_add_meal')
+        body = {'reading_id': 'r-9', 'sodium_mg': 400, 'recorded_at': local_noon(self.day).isoformat()}
+        responses = [
+            self.client.post(url, body, content_type='application/json', HTTP_X_DEVICE_TOKEN=str(self.device.token)).json()
+            for _ in range(2)
+        ]
+        self.assertEqual([r['duplicate'] for r in responses], [False, True])
+        self.assertEqual(responses[0]['meal_id'], responses[1]['meal_id'])
+        self.assertEqual(responses[1]['summary']['total_mg'], 400)
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('hypertension:api_today_summary')
+
+    def test_matching_etag_gets_304_until_the_data_changes(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['Cache-Control'], 'private, no-cache')
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            add_meal_and_update(self.user, 'Soup', 900)
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(changed.json()['summary']['total_mg'], 900)
+
+    def test_if_modified_since_gets_304(self):
+        first = self.client.get(self.url)
+        cached = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first.headers['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(self.url).headers['ETag']
+        other = get_user_model().objects.create_user('bob', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    async def test_async_view_answers_304(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('hypertension:api_today_summary_async')
+        first = await self.async_client.get(url)
+        self.assertEqual(first.status_code, 200)
+        cached = await self.async_client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+
+class TimelineCursorTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        profile = Profile.objects.get(user=self.user)
+        sync = WatchSync.objects.create(user=self.user)
+        base = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        # Manual and watch readings share timestamps, so pages break inside ties.
+        for i in range(7):
+            recorded_at = base + timedelta(minutes=i // 2)
+            reading = BloodPressureReading.objects.create(profile=profile, systolic=120 + i, diastolic=80)
+            reading.recorded_at = recorded_at  # auto_now_add ignores the kwarg on create
+            reading.save()
+            WatchBloodPressure.objects.create(watch_sync=sync, systolic=130 + i, diastolic=85, recorded_at=base + timedelta(minutes=i))
+
+    def test_cursor_round_trip(self):
+        row = {'recorded_at': timezone.now(), 'source': 'watch', 'pk': 42}
+        self.assertEqual(
+            decode_timeline_cursor(encode_timeline_cursor(row)),
+            (row['recorded_at'], 'watch', 42),
+        )
+
+    def test_malformed_cursors_raise_value_error(self):
+        bad = [
+            'not base64!',
+            base64.urlsafe_b64encode(b'2026-01-01T00:00:00+00:00|manual').decode(),
+            base64.urlsafe_b64encode(b'2026-01-01T00:00:00+00:00|fitbit|1').decode(),
+            base64.urlsafe_b64encode(b'yesterday|manual|1').decode(),
+            base64.urlsafe_b64encode(b'2026-01-01T00:00:00+00:00|manual|one').decode(),
+        ]
+        for value in bad:
+            with self.assertRaises(ValueError, msg=value):
+                decode_timeline_cursor(value)
+
+    def test_pages_cover_the_timeline_once_in_order(self):
+        expected, _ = bp_timeline(self.user, limit=100)
+        self.assertEqual(len(expected), 14)
+
+        seen, cursor = [], None
+        while True:
+            rows, next_cursor = bp_timeline(self.user, limit=3, cursor=cursor)
+            seen.extend(rows)
+            if next_cursor is None:
+                break
+            cursor = decode_timeline_cursor(next_cursor)
+
+        key = [(row['recorded_at'], row['source'], row['pk']) for row in seen]
+        self.assertEqual(key, [(row['recorded_at'], row['source'], row['pk']) for row in expected])
+        self.assertEqual(key, sorted(key, reverse=True))
+
+    def test_bp_list_follows_cursor_and_ignores_bad_ones(self):
+        self.client.force_login(self.user)
+        url = reverse('hypertension:bp_list')
+        _, next_cursor = bp_timeline(self.user, limit=5)
+
+        page = self.client.get(url, {'cursor': next_cursor})
+        self.assertEqual(page.status_code, 200)
+        self.assertFalse(page.context['is_first_page'])
+        self.assertEqual(page.context['readings'], bp_timeline(self.user, cursor=decode_timeline_cursor(next_cursor))[0])
+
+        fallback = self.client.get(url, {'cursor': 'garbage'})
+        self.assertEqual(fallback.status_code, 200)
+        self.assertTrue(fallback.context['is_first_page'])
+
+
+class BPChartSeriesTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        sync = get_watch_sync(self.user)
+        now = timezone.now()
+        # bulk_create skips the signals, like rows written before BPAggregate existed.
+        WatchBloodPressure.objects.bulk_create([
+            WatchBloodPressure(
+                watch_sync=sync, systolic=110 + i % 40, diastolic=70 + i % 25,
+                recorded_at=now - timedelta(minutes=30 * i), day=timezone.localdate(now - timedelta(minutes=30 * i)),
+            )
+            for i in range(600)
+        ])
+
+    def assert_bounded(self, chart, points):
+        self.assertLessEqual(len(chart['labels']), points)
+        self.assertEqual(len(chart['systolic']), len(chart['labels']))
+        self.assertEqual(len(chart['diastolic']), len(chart['labels']))
+
+    def test_short_ranges_use_raw_rows(self):
+        chart = bp_chart_series(self.user, 'watch', points=50)
+        self.assertEqual((chart['resolution'], chart['count']), ('raw', 600))
+        self.assert_bounded(chart, 50)
+
+    @mock.patch.object(bp_services, 'BP_CHART_RAW_LIMIT', 100)
+    def test_long_ranges_without_aggregates_are_grouped_by_day(self):
+        self.assertFalse(BPAggregate.objects.exists())
+        with self.assertNumQueries(4):
+            chart = bp_chart_series(self.user, 'watch', points=5)
+        self.assertEqual((chart['resolution'], chart['count']), ('day', 600))
+        self.assert_bounded(chart, 5)
+
+    @mock.patch.object(bp_services, 'BP_CHART_RAW_LIMIT', 400)
+    def test_long_ranges_use_built_aggregates(self):
+        rebuild_bp_aggregates()
+        with self.assertNumQueries(3):
+            chart = bp_chart_series(self.user, 'watch', points=20)
+        self.assertEqual((chart['resolution'], chart['count']), ('hour', 600))
+        self.assert_bounded(chart, 20)
+
+
+class BPStatisticsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        # Readings every 7 hours over the last 20 days, oldest first, so both
+        # windows, the morning/evening hours and the ARV pairs are exercised.
+        end = timezone.now().replace(microsecond=0)
+        self.readings = [
+            {'systolic': 110 + (i * 37) % 60, 'diastolic': 70 + (i * 13) % 30, 'recorded_at': end - timedelta(hours=7 * (68 - i))}
+            for i in range(69)
+        ]
+
+    def stored(self):
+        return {
+            (row['source'], row['window_days']): row
+            for row in BPStatistics.objects.filter(user=self.user).values()
+        }
+
+    def assert_matches_rebuild(self, incremental):
+        rebuilt = {(row.source, row.window_days): row for row in rebuild_bp_statistics(self.user, ['watch'])}
+        self.assertEqual(set(incremental), set(rebuilt))
+        for key, row in incremental.items():
+            for field in ('count', 'morning_count', 'evening_count', 'morning_systolic_sum', 'evening_diastolic_sum',
+                          'arv_count', 'systolic_arv_sum', 'diastolic_arv_sum', 'last_systolic', 'last_recorded_at'):
+                self.assertEqual(row[field], getattr(rebuilt[key], field), (key, field))
+            for field in ('systolic_mean', 'systolic_m2', 'diastolic_mean', 'diastolic_m2'):
+                self.assertAlmostEqual(row[field], getattr(rebuilt[key], field), places=6, msg=(key, field))
+
+    def test_incremental_batches_match_a_rebuild(self):
+        add_watch_readings_bulk(self.user, self.readings[:5])  # no rows yet: built from scratch
+        with mock.patch.object(bp_services, 'rebuild_bp_statistics', wraps=rebuild_bp_statistics) as rebuild:
+            for i in range(5, len(self.readings), 8):
+                add_watch_readings_bulk(self.user, self.readings[i:i + 8])
+        rebuild.assert_not_called()
+        self.assert_matches_rebuild(self.stored())
+
+    def test_single_inserts_match_a_rebuild(self):
+        sync = get_watch_sync(self.user)
+        WatchBloodPressure.objects.create(watch_sync=sync, **self.readings[0])
+        with mock.patch.object(bp_services, 'rebuild_bp_statistics', wraps=rebuild_bp_statistics) as rebuild:
+            for values in self.readings[1:]:
+                WatchBloodPressure.objects.create(watch_sync=sync, **values)
+        rebuild.assert_not_called()
+        self.assert_matches_rebuild(self.stored())
+
+    def test_reads_do_not_write(self):
+        add_watch_readings_bulk(self.user, self.readings)
+        BPStatistics.objects.update(as_of=timezone.localdate() - timedelta(days=1))
+        with self.assertNumQueries(1):
+            stats = bp_statistics(self.user)
+        self.assertEqual(stats['watch']['30d']['count'], 69)
+        self.assertEqual(stats['manual'][f'{BP_STAT_WINDOWS[0]}d']['count'], 0)
+        self.assertFalse(BPStatistics.objects.filter(as_of=timezone.localdate()).exists())
+
+
+class LiveEventTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.today = timezone.localdate()
+
+    def test_alerts_without_subscribers_cost_two_statements(self):
+        with self.assertNumQueries(2), self.captureOnCommitCallbacks() as callbacks:
+            created = evaluate_alerts(self.user, self.today, 2500)
+        self.assertEqual(len(created), Alert.objects.filter(user=self.user).count())
+        self.assertEqual(callbacks, [])
+
+    def test_only_alerts_this_call_stored_are_published(self):
+        insert = Alert.objects.bulk_create
+
+        def racing_insert(alerts, **kwargs):
+            # A concurrent evaluation stores the 50% alert first.
+            Alert.objects.create(user=self.user, date=self.today, threshold='50', message='concurrent')
+            return insert(alerts, **kwargs)
+
+        with mock.patch.object(events.broker, 'subscriber_count', return_value=1), \
+                mock.patch.object(events.broker, 'publish') as publish, \
+                mock.patch.object(Alert.objects, 'bulk_create', side_effect=racing_insert):
+            with self.captureOnCommitCallbacks(execute=True):
+                evaluate_alerts(self.user, self.today, 1600)
+        self.assertEqual([c.args[2]['threshold'] for c in publish.call_args_list], ['75'])
+        self.assertEqual(publish.call_args.args[2]['sodium_total'], 1600)
+
+    def test_connect_watch_stores_no_empty_raw_payload(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('hypertension:connect_watch'))
+        self.assertEqual(WatchBloodPressure.objects.filter(watch_sync__user=self.user).count(), 1)
+        self.assertFalse(WatchRawPayload.objects.exists())
+
+        now = timezone.now()
+        add_watch_readings_bulk(self.user, [
+            {'systolic': 120, 'diastolic': 80, 'recorded_at': now - timedelta(minutes=1), 'raw': {}},
+            {'systolic': 121, 'diastolic': 80, 'recorded_at': now - timedelta(minutes=2), 'raw': {'hr': [70, 71]}},
+        ])
+        self.assertEqual(list(WatchRawPayload.objects.values_list('reading__systolic', flat=True)), [121])
+
+
+class WatchSyncTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='pw')
+        self.device = Device.objects.create(user=self.user, name='Watch')
+        self.addCleanup(presence.tracker.flush)
+        self.url = reverse('hypertension:api_watch_sync')
+        self.now = timezone.now().replace(microsecond=0)
+
+    def sync(self, readings):
+        return self.client.post(
+            self.url, {'readings': readings}, content_type='application/json',
+            HTTP_X_DEVICE_TOKEN=str(self.device.token),
+        )
+
+    def reading(self, minutes_ago, systolic=120):
+        return {'systolic': systolic, 'diastolic': 80, 'recorded_at': (self.now - timedelta(minutes=minutes_ago)).isoformat()}
+
+    def test_readings_without_timestamp_are_rejected_per_item(self):
+        response = self.sync([
+            self.reading(1),
+            {'systolic': 121, 'diastolic': 80},
+            {'systolic': 122, 'diastolic': 80, 'recorded_at': 'later'},
+            self.reading(1),
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['duplicates'], body['failed']), (1, 1, 2))
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2])
+
+    def test_overlapping_upload_skips_only_the_clashing_rows(self):
+        # Another upload from the same watch stores one timestamp between this
+        # upload's duplicate lookup and its INSERT: the first lookup misses it.
+        WatchBloodPressure.objects.create(
+            watch_sync=get_watch_sync(self.user), systolic=150, diastolic=90,
+            recorded_at=self.now - timedelta(minutes=2),
+        )
+        lookup = WatchBloodPressure.objects.filter
+        lookups = []
+
+        def racing_lookup(*args, **kwargs):
+            lookups.append(kwargs)
+            return WatchBloodPressure.objects.none() if len(lookups) == 1 else lookup(*args, **kwargs)
+
+        with mock.patch.object(WatchBloodPressure.objects, 'filter', side_effect=racing_lookup):
+            response = self.sync([self.reading(minutes) for minutes in (1, 2, 3)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['created'], response.json()['duplicates']), (2, 1))
+        stored = WatchBloodPressure.objects.filter(watch_sync__user=self.user).order_by('recorded_at')
+        self.assertEqual(list(stored.values_list('systolic', flat=True)), [120, 150, 120])
@@ -26,8 +26,25 @@ urlpatterns = [
     path("devices/connect/", views.connect_watch, name="connect_watch"),
     # Sodium intake API
     path('api/sodium/add-meal/', views_sodium.api_add_meal, name='api_add_meal'),
+    path('api/sodium/add-meals/', views_sodium.api_add_meals_batch, name='api_add_meals_batch'),
+    path('api/ingest/ndjson/', views_sodium.api_ingest_ndjson, name='api_ingest_ndjson'),
     path('api/sodium/today/', views_sodium.api_today_summary, name='api_today_summary'),
     path('api/sodium/weekly/', views_sodium.api_weekly_summary, name='api_weekly_summary'),
+    path('api/sodium/range/', views_sodium.api_sodium_range, name='api_sodium_range'),
     path('api/sodium/alerts/', views_sodium.api_get_alerts, name='api_get_alerts'),
+    path('api/sodium/alerts/mark-read/', views_sodium.api_mark_alerts_read, name='api_mark_alerts_read'),
+    path('api/watch/sync/', views_sodium.api_watch_sync, name='api_watch_sync'),
+    path('api/watch/readings/<int:pk>/raw/', views_sodium.api_watch_raw_payload, name='api_watch_raw_payload'),
+    path('api/bp/chart/', views_sodium.api_bp_chart, name='api_bp_chart'),
+    path('api/bp/stages/', views_sodium.api_bp_stages, name='api_bp_stages'),
+    path('api/bp/statistics/', views_sodium.api_bp_statistics, name='api_bp_statistics'),
+    path('api/export/<str:kind>/', views_sodium.api_export, name='api_export'),
+    path('api/devices/online/', views_sodium.api_online_devices, name='api_online_devices'),
+    # Async variants of the sodium API (used when served via core_fixed.asgi)
+    path('api/async/sodium/add-meal/', views_sodium.api_add_meal_async, name='api_add_meal_async'),
+    path('api/async/sodium/today/', views_sodium.api_today_summary_async, name='api_today_summary_async'),
+    path('api/async/sodium/weekly/', views_sodium.api_weekly_summary_async, name='api_weekly_summary_async'),
+    # Live events (SSE); needs the ASGI server mode
+    path('api/events/', views_sodium.api_events_stream, name='api_events_stream'),
     path("reminders/", views.reminders_home, name="reminders_home"),
 ]
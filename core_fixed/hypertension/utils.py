@@ -2,15 +2,24 @@
 """
 ACC/AHA-only BP classification helper (elder-friendly).
 
-Function:
+Functions:
     classify_bp(systolic:int, diastolic:int) -> (label, badge, advice, severity)
+    classify_bp_batch(systolics, diastolics) -> [severity, ...]
 
  - label: human label
  - badge: bootstrap color (success, info, warning, danger, dark)
  - advice: short elder-friendly sentence to show on dashboard
  - severity: simple key ('normal','elevated','stage1','stage2','urgency','emergency','unknown')
 """
-from typing import Tuple
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Severity keys from least to most severe ('unknown' last).
+SEVERITY_KEYS = ('normal', 'elevated', 'stage1', 'stage2', 'urgency', 'emergency', 'unknown')
 
 def classify_bp(systolic: int, diastolic: int) -> Tuple[str, str, str, str]:
     # coerce to ints where possible
@@ -42,15 +51,42 @@ def classify_bp(systolic: int, diastolic: int) -> Tuple[str, str, str, str]:
         return ("Elevated", "info",
                 "Slightly raised. Try salt reduction, walking, and avoid smoking.", "elevated")
 
+    # Stage 2 (checked before stage 1: the higher of the two readings decides)
+    if s >= 140 or d >= 90:
+        return ("Stage 2 Hypertension", "danger",
+                "High blood pressure — see a doctor. Medication may be needed.", "stage2")
+
     # Stage 1
     if (130 <= s <= 139) or (80 <= d <= 89):
         return ("Stage 1 Hypertension", "warning",
                 "Mild high blood pressure — check with your doctor and try lifestyle changes.", "stage1")
 
-    # Stage 2
-    if s >= 140 or d >= 90:
-        return ("Stage 2 Hypertension", "danger",
-                "High blood pressure — see a doctor. Medication may be needed.", "stage2")
-
     # fallback
     return ("Uncertain", "dark", "Unable to classify. Please re-check your reading.", "unknown")
+
+
+def classify_bp_batch(systolics: Sequence[int], diastolics: Sequence[int]) -> List[str]:
+    """Severity keys for many readings at once, same rules as classify_bp.
+
+    Uses NumPy boolean masks when NumPy is installed (None values become
+    'unknown'); otherwise falls back to classify_bp per reading.
+    """
+    if np is None or not len(systolics):
+        return [classify_bp(s, d)[3] if s is not None and d is not None else "unknown"
+                for s, d in zip(systolics, diastolics)]
+
+    s = np.array([np.nan if v is None else v for v in systolics], dtype=float)
+    d = np.array([np.nan if v is None else v for v in diastolics], dtype=float)
+    valid = ~(np.isnan(s) | np.isnan(d))
+    # Checked in the same order as classify_bp; np.select takes the first match.
+    conditions = [
+        ~valid,
+        (s >= 180) | (d >= 120),
+        d >= 110,
+        (s < 120) & (d < 80),
+        (s >= 120) & (s <= 129) & (d < 80),
+        (s >= 140) | (d >= 90),
+        ((s >= 130) & (s <= 139)) | ((d >= 80) & (d <= 89)),
+    ]
+    choices = ["unknown", "emergency", "urgency", "normal", "elevated", "stage2", "stage1"]
+    return np.select(conditions, choices, default="unknown").tolist()
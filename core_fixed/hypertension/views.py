@@ -11,8 +11,13 @@ from django.contrib import messages
 from django.http import HttpRequest, HttpResponse
 from django.apps import apps
 import json
+from datetime import timedelta
 
 from .models import BloodPressureReading, WatchSync, WatchBloodPressure
+from .bp_services import (
+    add_watch_readings_bulk, bp_chart_buckets, bp_chart_series, bp_statistics, bp_timeline, dashboard_snapshot,
+    decode_timeline_cursor,
+)
 from .forms import BPReadingForm
 
 
@@ -71,86 +76,24 @@ def signup(request: HttpRequest):
 @login_required
 def dashboard_view(request: HttpRequest):
 
-    Profile = _get_profile_model()
-    profile, _ = Profile.objects.get_or_create(user=request.user)
-
-    # Query ordered descending (newest first) but don't slice yet if we
-    # may need to reorder later for charts.
-    readings_qs = BloodPressureReading.objects.filter(profile=profile).order_by("-recorded_at")
-
-    # Take the latest 50 readings for display (descending)
-    readings = readings_qs[:50]
-
-    # latest reading for the card
-    latest = readings.first()
-
-    # charts (chronological ascending)
-    # Re-order on the unsliced queryset, then slice to last 50 and convert to list
-    chart_qs = readings_qs.order_by("recorded_at")[:50]
-    chart = list(chart_qs)
-
-    labels = [r.recorded_at.strftime("%Y-%m-%d %H:%M") for r in chart]
-    systolic = [r.systolic for r in chart]
-    diastolic = [r.diastolic for r in chart]
-
-    # Classification helper (simple guideline)
-    def classify_bp(s, d):
-        if s is None or d is None:
-            return None, None, None
-        # Hypertensive crisis
-        if s > 180 or d > 120:
-            return "Hypertensive Crisis", "danger", "Seek emergency medical attention immediately."
-        # Stage 2
-        if s >= 140 or d >= 90:
-            return "Stage 2 Hypertension", "danger", "This is high — contact your healthcare provider."
-        # Stage 1
-        if (130 <= s <= 139) or (80 <= d <= 89):
-            return "Stage 1 Hypertension", "warning", "Lifestyle changes advised; consult your doctor."
-        # Elevated
-        if 120 <= s <= 129 and d < 80:
-            return "Elevated", "info", "Elevated blood pressure — monitor and adopt healthy habits."
-        # Normal
-        if s < 120 and d < 80:
-            return "Normal", "success", "Blood pressure is in the normal range. Keep it up!"
-        return None, None, None
-
-    stage = None
-    advice = None
-    if latest:
-        label, color, msg = classify_bp(latest.systolic, latest.diastolic)
-        if label:
-            stage = (label, color)
-            advice = msg
-
-    try:
-        watchsync = WatchSync.objects.get(user=request.user)
-    except WatchSync.DoesNotExist:
-        watchsync = None
-
-    # latest watch reading (for dashboard critical area)
-    latest_watch = WatchBloodPressure.objects.filter(watch_sync__user=request.user).order_by("-recorded_at").first()
-
-    # classification for latest watch (for color alerts)
-    watch_stage = None
-    watch_advice = None
-    if latest_watch:
-        wlabel, wcolor, wmsg = classify_bp(latest_watch.systolic, latest_watch.diastolic)
-        if wlabel:
-            watch_stage = (wlabel, wcolor)
-            watch_advice = wmsg
+    # Cached snapshot: latest manual/watch cards with classification plus the
+    # chart arrays (last 50 manual readings, chronological). Reading writes
+    # bump the user's data version, which invalidates it.
+    snapshot = dashboard_snapshot(request.user)
 
     return render(request, "hypertension/dashboard.html", {
-        "readings": readings,
-        "latest": latest,
-        "labels_json": json.dumps(labels),
-        "systolic_json": json.dumps(systolic),
-        "diastolic_json": json.dumps(diastolic),
-        "stage": stage,
-        "advice": advice,
-        "watchsync": watchsync,
-        "latest_watch": latest_watch,
-        "watch_stage": watch_stage,
-        "watch_advice": watch_advice,
+        "latest": snapshot["latest"],
+        "labels_json": json.dumps(snapshot["labels"]),
+        "systolic_json": json.dumps(snapshot["systolic"]),
+        "diastolic_json": json.dumps(snapshot["diastolic"]),
+        "stage": snapshot["stage"],
+        "advice": snapshot["advice"],
+        "watchsync": snapshot["watchsync"],
+        "latest_watch": snapshot["latest_watch"],
+        "watch_stage": snapshot["watch_stage"],
+        "watch_advice": snapshot["watch_advice"],
+        # Rolling 7/30-day statistics, maintained on every reading write.
+        "bp_stats": bp_statistics(request.user),
     })
 
 
@@ -161,113 +104,64 @@ def dashboard_view(request: HttpRequest):
 @login_required
 def bp_list(request: HttpRequest):
 
-    Profile = _get_profile_model()
-    profile, _ = Profile.objects.get_or_create(user=request.user)
-
-    # manual readings (chronological ascending)
-    manual_qs = BloodPressureReading.objects.filter(profile=profile).order_by("recorded_at")
-
-    # watch readings (chronological ascending)
-    watch_qs = WatchBloodPressure.objects.filter(watch_sync__user=request.user).order_by("recorded_at")
-
-    # Build combined chronological list (ascending)
-    combined = []
-    for r in manual_qs:
-        combined.append({
-            "source": "manual",
-            "recorded_at": r.recorded_at,
-            "systolic": r.systolic,
-            "diastolic": r.diastolic,
-            "pulse": getattr(r, 'pulse', None),
-            "notes": getattr(r, 'notes', '')
-        })
-    for r in watch_qs:
-        combined.append({
-            "source": "watch",
-            "recorded_at": r.recorded_at,
-            "systolic": r.systolic,
-            "diastolic": r.diastolic,
-            "pulse": getattr(r, 'pulse', None),
-            "notes": ''
-        })
-
-    # Sort ascending by datetime
-    combined_sorted = sorted(combined, key=lambda x: x["recorded_at"])
-
-    # Build labels and per-source maps using minute resolution
-    labels = []
-    manual_sys_map = {}
-    manual_dia_map = {}
-    watch_sys_map = {}
-    watch_dia_map = {}
-
-    for item in combined_sorted:
-        label = item["recorded_at"].strftime("%Y-%m-%d %H:%M")
-        if label not in labels:
-            labels.append(label)
-        if item["source"] == "manual":
-            manual_sys_map[label] = item["systolic"]
-            manual_dia_map[label] = item["diastolic"]
-        else:
-            watch_sys_map[label] = item["systolic"]
-            watch_dia_map[label] = item["diastolic"]
-
-    # Limit labels to last 50
-    if len(labels) > 50:
-        labels = labels[-50:]
+    # Table: manual + watch readings from the unified BPReading table, paginated
+    # in the database (ORDER BY/LIMIT), newest first, with an opaque keyset cursor.
+    cursor = None
+    if request.GET.get("cursor"):
+        try:
+            cursor = decode_timeline_cursor(request.GET["cursor"])
+        except ValueError:
+            messages.error(request, "That page link is no longer valid; showing the latest readings.")
+    readings, next_cursor = bp_timeline(request.user, limit=50, cursor=cursor)
 
-    manual_systolic = [manual_sys_map.get(l, None) for l in labels]
-    manual_diastolic = [manual_dia_map.get(l, None) for l in labels]
-    watch_systolic = [watch_sys_map.get(l, None) for l in labels]
-    watch_diastolic = [watch_dia_map.get(l, None) for l in labels]
+    # Chart: newest 50 minutes with readings, bucketed per source
+    # (manual and watch arrays are kept separate, not merged).
+    chart = bp_chart_buckets(request.user, points=50)
 
-    # merged_recent for the table (descending)
-    merged_recent = sorted(combined, key=lambda x: x["recorded_at"], reverse=True)[:50]
     return render(request, "hypertension/bp_list.html", {
-        "readings": merged_recent,
-        # pass manual and watch arrays separately (do NOT merge)
-        "labels_json": json.dumps(labels),
-        "manual_systolic_json": json.dumps(manual_systolic),
-        "manual_diastolic_json": json.dumps(manual_diastolic),
-        "watch_systolic_json": json.dumps(watch_systolic),
-        "watch_diastolic_json": json.dumps(watch_diastolic),
+        "readings": readings,
+        "next_cursor": next_cursor,
+        "is_first_page": cursor is None,
+        "labels_json": json.dumps(chart["labels"]),
+        "manual_systolic_json": json.dumps(chart["manual_systolic"]),
+        "manual_diastolic_json": json.dumps(chart["manual_diastolic"]),
+        "watch_systolic_json": json.dumps(chart["watch_systolic"]),
+        "watch_diastolic_json": json.dumps(chart["watch_diastolic"]),
     })
 
 
 
+GRAPH_RANGES = {"7d": 7, "30d": 30, "90d": 90, "1y": 365, "all": None}
+
+
+def _graph_context(request: HttpRequest, source: str):
+    """Downsampled chart context for the range picked with ?range= (default all)."""
+    selected = request.GET.get("range")
+    if selected not in GRAPH_RANGES:
+        selected = "all"
+    days = GRAPH_RANGES[selected]
+    start = timezone.localdate() - timedelta(days=days - 1) if days else None
+    chart = bp_chart_series(request.user, source, start=start)
+    return {
+        "ranges": list(GRAPH_RANGES),
+        "selected_range": selected,
+        "resolution": chart["resolution"],
+        "labels_json": json.dumps(chart["labels"]),
+        "systolic_json": json.dumps(chart["systolic"]),
+        "diastolic_json": json.dumps(chart["diastolic"]),
+    }
+
+
 @login_required
 def manual_bp_graph(request: HttpRequest):
     """Render a dedicated manual BP graph (elder-friendly styling)."""
-    Profile = _get_profile_model()
-    profile, _ = Profile.objects.get_or_create(user=request.user)
-
-    manual_qs = BloodPressureReading.objects.filter(profile=profile).order_by("recorded_at")[:200]
-    chart = list(manual_qs)
-    labels = [r.recorded_at.strftime("%Y-%m-%d %H:%M") for r in chart]
-    systolic = [r.systolic for r in chart]
-    diastolic = [r.diastolic for r in chart]
-
-    return render(request, "hypertension/manual_bp_graph.html", {
-        "labels_json": json.dumps(labels),
-        "systolic_json": json.dumps(systolic),
-        "diastolic_json": json.dumps(diastolic),
-    })
+    return render(request, "hypertension/manual_bp_graph.html", _graph_context(request, "manual"))
 
 
 @login_required
 def watch_bp_graph(request: HttpRequest):
     """Render a dedicated watch BP graph (elder-friendly styling)."""
-    watch_qs = WatchBloodPressure.objects.filter(watch_sync__user=request.user).order_by("recorded_at")[:200]
-    chart = list(watch_qs)
-    labels = [r.recorded_at.strftime("%Y-%m-%d %H:%M") for r in chart]
-    systolic = [r.systolic for r in chart]
-    diastolic = [r.diastolic for r in chart]
-
-    return render(request, "hypertension/watch_bp_graph.html", {
-        "labels_json": json.dumps(labels),
-        "systolic_json": json.dumps(systolic),
-        "diastolic_json": json.dumps(diastolic),
-    })
+    return render(request, "hypertension/watch_bp_graph.html", _graph_context(request, "watch"))
 
 
 # ======================================================
@@ -385,14 +279,12 @@ def connect_watch(request):
     # Simulate receiving a watch-recorded blood pressure reading on sync.
     # Replace with real payload parsing when available.
     try:
-        WatchBloodPressure.objects.create(
-            watch_sync=sync,
-            systolic=120,
-            diastolic=78,
-            pulse=72,
-            recorded_at=timezone.now(),
-            raw={}
-        )
+        add_watch_readings_bulk(request.user, [{
+            'systolic': 120,
+            'diastolic': 78,
+            'pulse': 72,
+            'recorded_at': timezone.now(),
+        }], watch_sync=sync)
     except Exception:
         pass
 
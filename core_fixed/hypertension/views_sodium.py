@@ -1,15 +1,171 @@
+﻿import asyncio
 import json
 from datetime import timedelta
 
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.conf import settings
 
-from .sodium_services import add_meal_and_update, get_daily_summary_and_advice
-from .models import DailySummary, Alert, Device
+from .sodium_services import (
+    add_device_meal, add_meals_bulk, aget_daily_summary_and_advice, aget_weekly_report, atoday_snapshot,
+    get_daily_summary_and_advice, get_sodium_range, get_weekly_report, highest_alert, mark_alerts_read,
+    summaries_deferred, summary_as_dict, today_snapshot, week_start,
+)
+from .bp_services import (
+    BP_CHART_POINTS, add_watch_readings_bulk, bp_chart_series, bp_stage_distribution, bp_statistics, sync_watch_batch,
+)
+from .data_version import conditional_on_data_version, poll_data_version
+from .exports import EXPORT_FORMATS, EXPORTS, stream_export, user_export_queryset
+from . import events, presence
+from .models import Alert, WatchRawPayload
+
+
+def _get_request_device(request):
+    """The device authenticated by DeviceTokenMiddleware (None for session
+    requests), marked as seen via the presence tracker.
+    """
+    device = getattr(request, 'device', None)
+    if device is not None:
+        presence.touch(device)
+    return device
+
+
+def _parse_timestamp(value):
+    """Parse an ISO timestamp; naive values are taken as local time, missing or
+    unparseable ones default to now."""
+    recorded_at = parse_datetime(value) if value else None
+    if recorded_at is None:
+        return timezone.now()
+    if timezone.is_naive(recorded_at):
+        recorded_at = timezone.make_aware(recorded_at)
+    return recorded_at
+
+
+def _parse_meal_payload(data):
+    """Validate one meal payload and return kwargs for the sodium services."""
+    if not isinstance(data, dict):
+        raise ValueError('Meal must be a JSON object')
+    try:
+        sodium_mg = int(data.get('sodium_mg', 0))
+    except (TypeError, ValueError):
+        raise ValueError('sodium_mg must be an integer')
+    recorded_at = _parse_timestamp(data.get('recorded_at'))
+    # Optional idempotency key (device sequence number or UUID) reused on retries.
+    reading_id = data.get('reading_id')
+    reading_id = str(reading_id).strip()[:64] if reading_id not in (None, '') else None
+    return {
+        'name': data.get('name', ''),
+        'sodium_mg': sodium_mg,
+        'portion': data.get('portion', ''),
+        'recorded_at': recorded_at,
+        'reading_id': reading_id,
+    }
+
+
+def _parse_watch_payload(data, require_timestamp=False):
+    """Validate one watch BP payload and return kwargs for the BP services.
+
+    With ``require_timestamp`` a missing or unparseable recorded_at is an
+    error instead of defaulting to now (readings deduplicate on it).
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Reading must be a JSON object')
+    try:
+        systolic = int(data['systolic'])
+        diastolic = int(data['diastolic'])
+        pulse = int(data['pulse']) if data.get('pulse') is not None else None
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('systolic and diastolic must be integers')
+    if require_timestamp and not (isinstance(data.get('recorded_at'), str) and parse_datetime(data['recorded_at'])):
+        raise ValueError('recorded_at must be an ISO timestamp')
+    recorded_at = _parse_timestamp(data.get('recorded_at'))
+    return {
+        'systolic': systolic,
+        'diastolic': diastolic,
+        'pulse': pulse,
+        'recorded_at': recorded_at,
+        'raw': data.get('raw'),
+    }
+
+
+def _iter_request_lines(request, max_line_bytes):
+    """Yield raw lines from the request stream without buffering the body.
+
+    Lines longer than ``max_line_bytes`` are drained and yielded as None.
+    """
+    while True:
+        line = request.readline(max_line_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = request.readline(max_line_bytes)
+            yield None
+            continue
+        yield line
+
+
+def _meal_day(meal):
+    # Retried readings stored before the `day` column existed may lack it.
+    return meal.day or timezone.localdate(meal.recorded_at)
+
+
+def _add_meal_payload(meal, created, summary, advice):
+    pending = summaries_deferred()
+    alert_level = alert_message = None
+    if summary and not pending:
+        # Alerts were already written by the alert engine; report the highest level reached.
+        _, alert_level, alert_message = highest_alert(summary.total_mg)
+    return {
+        'meal_id': meal.id,
+        'duplicate': not created,
+        'summary': summary_as_dict(summary),
+        'summary_pending': pending,
+        'advice': advice,
+        'alert_level': alert_level,
+        'alert_message': alert_message,
+    }
+
+
+def _weekly_payload(start, report, summaries):
+    """Weekly response for the ISO week starting `start`.
+
+    `daily_summaries` is only included for the current (live) week; past weeks
+    are answered from their materialized WeeklyReport row.
+    """
+    payload = {
+        'week_start': str(start),
+        'week_end': str(start + timedelta(days=6)),
+        'avg_daily_mg': report.avg_daily_mg if report else 0.0,
+        'days_over_limit': report.days_over_limit if report else 0,
+        'highest_day': str(report.highest_day) if report and report.highest_day else None,
+        'materialized': summaries is None,
+    }
+    if summaries is not None:
+        payload['daily_summaries'] = [summary_as_dict(s) for s in summaries]
+    return payload
+
+
+def _requested_week(request):
+    """Day named by `?week=YYYY-MM-DD` (any day of the wanted week), default today."""
+    value = request.GET.get('week')
+    if not value:
+        return timezone.localdate()
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError('week must be a date (YYYY-MM-DD)')
+    return day
 
 
 @csrf_exempt
@@ -17,23 +173,7 @@ from .models import DailySummary, Alert, Device
 def api_add_meal(request):
     # Allow device token auth via `Authorization: Token <token>` or `X-Device-Token` header.
     data = json.loads(request.body.decode('utf-8'))
-    device = None
-    token = None
-    auth_hdr = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_hdr:
-        if auth_hdr.lower().startswith('token '):
-            token = auth_hdr.split(None, 1)[1].strip()
-        else:
-            token = auth_hdr.strip()
-    if not token:
-        token = request.META.get('HTTP_X_DEVICE_TOKEN')
-    if token:
-        try:
-            device = Device.objects.get(token=token)
-            device.last_seen = timezone.now()
-            device.save(update_fields=['last_seen'])
-        except Device.DoesNotExist:
-            device = None
+    device = _get_request_device(request)
 
     # Determine user (device -> device.user, else session user)
     if device:
@@ -43,152 +183,282 @@ def api_add_meal(request):
             return JsonResponse({'error': 'Authentication required'}, status=401)
         user_obj = request.user
 
-    name = data.get('name', '')
-    sodium_mg = int(data.get('sodium_mg', 0))
-    recorded_at = data.get('recorded_at')
-    if recorded_at:
-        from django.utils.dateparse import parse_datetime
-        recorded_at = parse_datetime(recorded_at)
-        if recorded_at is None:
-            recorded_at = timezone.now()
+    try:
+        meal_kwargs = _parse_meal_payload(data)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    source = 'spoon' if device else 'manual'
+    meal, created = add_device_meal(user_obj, device, source=source, **meal_kwargs)
+    summary, advice = get_daily_summary_and_advice(user_obj, _meal_day(meal))
+    return JsonResponse(_add_meal_payload(meal, created, summary, advice))
+
+
+@csrf_exempt
+@require_POST
+def api_add_meals_batch(request):
+    """Ingest a buffered replay of meals in one request.
+
+    Accepts `{"meals": [...]}` (or a bare JSON array) where each item uses the
+    same fields as `api_add_meal`. Valid items are inserted together and the
+    daily summary/alerts are refreshed once per affected day; invalid items are
+    reported per index without aborting the rest of the batch. Items carrying a
+    `reading_id` that was already stored for the device are reported as
+    duplicates and not counted again.
+    """
+    device = _get_request_device(request)
+    if device:
+        user_obj = device.user
     else:
-        recorded_at = timezone.now()
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        user_obj = request.user
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    items = data.get('meals') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return JsonResponse({'error': 'Expected a list of meals'}, status=400)
+    max_items = getattr(settings, 'SODIUM_BATCH_MAX_MEALS', 500)
+    if len(items) > max_items:
+        return JsonResponse({'error': f'Batch too large (max {max_items} meals)'}, status=400)
+
+    results = [None] * len(items)
+    valid_indexes = []
+    valid_meals = []
+    for index, item in enumerate(items):
+        try:
+            valid_meals.append(_parse_meal_payload(item))
+            valid_indexes.append(index)
+        except ValueError as exc:
+            results[index] = {'index': index, 'error': str(exc)}
 
     source = 'spoon' if device else 'manual'
-    meal = add_meal_and_update(user_obj, name=name, sodium_mg=sodium_mg, recorded_at=recorded_at, source=source)
-    day = recorded_at.date()
-    summary, advice = get_daily_summary_and_advice(user_obj, day)
-    # Determine alert level/message based on cumulative daily sodium thresholds
-    alert_level = None
-    alert_message = None
-    if summary:
-        pct = summary.percent_of_limit
-        if pct >= 120:
-            alert_level = 'danger'
-            alert_message = 'Sodium intake is above 120% of your daily limit — high risk.'
-            threshold_value = 120
-        elif pct >= 100:
-            alert_level = 'danger'
-            alert_message = 'You have reached or exceeded your daily sodium limit.'
-            threshold_value = 100
-        elif pct >= 75:
-            alert_level = 'warning'
-            alert_message = 'You have reached 75% of your daily sodium limit — consider reducing intake.'
-            threshold_value = 75
-        elif pct >= 50:
-            alert_level = 'info'
-            alert_message = 'You have reached 50% of your daily sodium limit.'
-            threshold_value = 50
-        else:
-            threshold_value = None
-
-    # Persist an Alert row when thresholds are crossed
-    try:
-        if alert_level and alert_message:
-            # Deduplicate: one alert per device per day per alert_level.
-            # If an alert for the same device/day/level exists, update it.
-            # If threshold increases (e.g., info -> warning -> danger), update an existing lower-severity alert.
-            severity_order = {'info': 1, 'warning': 2, 'danger': 3}
-            new_weight = severity_order.get(alert_level, 0)
-
-            existing_exact = Alert.objects.filter(user=user_obj, device=device if device else None, date=day, severity=alert_level).first()
-            if existing_exact:
-                existing_exact.message = alert_message
-                existing_exact.sodium_total = summary.total_mg if summary else None
-                existing_exact.threshold_percent = summary.percent_of_limit if summary else None
-                existing_exact.threshold = str(int(threshold_value)) if threshold_value else existing_exact.threshold
-                existing_exact.save(update_fields=['message', 'sodium_total', 'threshold_percent', 'threshold'])
-            else:
-                # Look for any alert for same user/device/day with lower severity to upgrade
-                candidate = None
-                for a in Alert.objects.filter(user=user_obj, device=device if device else None, date=day):
-                    w = severity_order.get(a.severity, 0)
-                    if w < new_weight:
-                        if candidate is None or w > severity_order.get(candidate.severity, 0):
-                            candidate = a
-                if candidate:
-                    candidate.severity = alert_level
-                    candidate.message = alert_message
-                    candidate.sodium_total = summary.total_mg if summary else None
-                    candidate.threshold_percent = summary.percent_of_limit if summary else None
-                    candidate.threshold = str(int(threshold_value)) if threshold_value else candidate.threshold
-                    candidate.save(update_fields=['severity', 'message', 'sodium_total', 'threshold_percent', 'threshold'])
-                else:
-                    Alert.objects.create(
-                        user=user_obj,
-                        date=day,
-                        threshold=str(int(threshold_value)) if threshold_value else '',
-                        severity=alert_level,
-                        message=alert_message,
-                        sodium_total=summary.total_mg if summary else None,
-                        threshold_percent=summary.percent_of_limit if summary else None,
-                        device=device if device else None,
-                    )
-    except Exception:
-        # Don't fail the API if alert persistence has problems
-        pass
+    stored, summaries = add_meals_bulk(user_obj, valid_meals, source=source, device=device)
+    created_count = 0
+    for index, (meal, created) in zip(valid_indexes, stored):
+        created_count += created
+        results[index] = {'index': index, 'meal_id': meal.id, 'duplicate': not created}
+
+    days = []
+    for summary in summaries.values():
+        _, alert_level, alert_message = highest_alert(summary.total_mg)
+        days.append({
+            'summary': summary_as_dict(summary),
+            'alert_level': alert_level,
+            'alert_message': alert_message,
+        })
 
     return JsonResponse({
-        'meal_id': meal.id,
-        'summary': {
-            'date': str(summary.date),
-            'total_mg': summary.total_mg,
-            'percent_of_limit': summary.percent_of_limit,
-        } if summary else None,
-        'advice': advice,
-        'alert_level': alert_level,
-        'alert_message': alert_message,
+        'created': created_count,
+        'duplicates': len(stored) - created_count,
+        'summary_pending': summaries_deferred(),
+        'failed': len(items) - len(stored),
+        'results': results,
+        'days': days,
     })
 
 
+@csrf_exempt
+@require_POST
+def api_watch_sync(request):
+    """Upload a batch of readings stored on the user's watch.
+
+    Device-token only. Accepts `{"readings": [...], "battery_level": 80,
+    "device_name": "..."}` where each reading has systolic, diastolic,
+    recorded_at and optional pulse and raw. Readings are inserted together;
+    timestamps already synced for the watch (including by an overlapping
+    upload) are reported as duplicates and invalid items per index, without
+    aborting the rest of the batch.
+    """
+    device = _get_request_device(request)
+    if device is None:
+        return JsonResponse({'error': 'Device token required'}, status=401)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    items = data.get('readings') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return JsonResponse({'error': 'Expected a list of readings'}, status=400)
+    max_items = getattr(settings, 'WATCH_SYNC_MAX_READINGS', 20000)
+    if len(items) > max_items:
+        return JsonResponse({'error': f'Batch too large (max {max_items} readings)'}, status=400)
+    battery_level = data.get('battery_level')
+    if battery_level is not None:
+        try:
+            battery_level = int(battery_level)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'battery_level must be an integer'}, status=400)
+
+    errors = []
+    readings = []
+    for index, item in enumerate(items):
+        try:
+            readings.append(_parse_watch_payload(item, require_timestamp=True))
+        except ValueError as exc:
+            errors.append({'index': index, 'error': str(exc)})
+
+    try:
+        created = sync_watch_batch(
+            device.user, readings,
+            battery_level=battery_level,
+            device_name=str(data.get('device_name') or '')[:100] or None,
+        )
+    except IntegrityError:
+        # Overlapping uploads kept clashing after add_watch_readings_bulk's retries.
+        return JsonResponse({'error': 'Concurrent sync in progress, retry'}, status=409)
+
+    return JsonResponse({
+        'created': len(created),
+        'duplicates': len(readings) - len(created),
+        'failed': len(errors),
+        'errors': errors,
+    })
+
+
+@login_required
+@require_GET
+def api_watch_raw_payload(request, pk):
+    """The decompressed raw payload of one of the user's watch readings
+    (404 if the reading is not theirs or its payload was not kept)."""
+    payload = (
+        WatchRawPayload.objects
+        .filter(reading_id=pk, reading__watch_sync__user=request.user)
+        .first()
+    )
+    if payload is None:
+        return JsonResponse({'error': 'No raw payload for this reading'}, status=404)
+    return JsonResponse({'reading_id': pk, 'size': payload.size, 'raw': payload.decode()})
+
+
 @login_required
 @require_GET
+def api_export(request, kind):
+    """Download all of the user's rows of one kind (bp, watch, readings,
+    meals, alerts) as ?format=csv (default) or ndjson, streamed."""
+    if kind not in EXPORTS:
+        return JsonResponse({'error': f"Unknown export; use one of: {', '.join(EXPORTS)}"}, status=404)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+    return stream_export(user_export_queryset(kind, request.user), kind, fmt)
+
+
+@login_required
+@require_GET
+@conditional_on_data_version
 def api_today_summary(request):
-    today = timezone.localdate()
-    summary, advice = get_daily_summary_and_advice(request.user, today)
-    unread_alerts = list(request.user.sodium_alerts.filter(date=today, is_read=False).values('threshold','message','severity','created_at'))
+    snapshot = today_snapshot(request.user, timezone.localdate(), version=request.data_version)
+    return JsonResponse(snapshot)
+
+
+@login_required
+@require_GET
+@conditional_on_data_version
+def api_weekly_summary(request):
+    # ISO week containing ?week= (default: the current week)
+    try:
+        day = _requested_week(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    report, summaries = get_weekly_report(request.user, day)
+    return JsonResponse(_weekly_payload(week_start(day), report, summaries))
+
+
+@login_required
+@require_GET
+@conditional_on_data_version
+def api_sodium_range(request):
+    """Sodium totals between ?start= and ?end= (YYYY-MM-DD, inclusive), bucketed
+    by ?resolution=day|month|quarter|year (default month). Served from the
+    month/year rollups; `day` resolution is limited to SODIUM_RANGE_MAX_DAYS."""
+    try:
+        start = parse_date(request.GET.get('start') or '')
+        end = parse_date(request.GET.get('end') or '')
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return JsonResponse({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=400)
+    resolution = request.GET.get('resolution', 'month')
+    max_days = getattr(settings, 'SODIUM_RANGE_MAX_DAYS', 366)
+    if resolution == 'day' and (end - start).days >= max_days:
+        return JsonResponse({'error': f'day resolution is limited to {max_days} days'}, status=400)
+    try:
+        buckets = get_sodium_range(request.user, start, end, resolution)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    for bucket in buckets:
+        bucket['start'] = str(bucket['start'])
+        bucket['end'] = str(bucket['end'])
     return JsonResponse({
-        'summary': {
-            'date': str(summary.date),
-            'total_mg': summary.total_mg,
-            'percent_of_limit': summary.percent_of_limit,
-        } if summary else None,
-        'advice': advice,
-        'alerts': unread_alerts,
+        'start': str(start),
+        'end': str(end),
+        'resolution': resolution,
+        'buckets': buckets,
     })
 
+@login_required
+@require_GET
+@conditional_on_data_version
+def api_bp_chart(request):
+    """Downsampled BP series for ?source=manual|watch, optionally limited to
+    ?start= / ?end= (YYYY-MM-DD, inclusive), with at most ?points= points per
+    series (default BP_CHART_POINTS, capped at BP_CHART_MAX_POINTS)."""
+    try:
+        start = parse_date(request.GET['start']) if request.GET.get('start') else None
+        end = parse_date(request.GET['end']) if request.GET.get('end') else None
+        points = int(request.GET.get('points', BP_CHART_POINTS))
+    except ValueError:
+        start = end = points = None
+    if points is None or (request.GET.get('start') and start is None) or (request.GET.get('end') and end is None):
+        return JsonResponse({'error': 'start/end must be dates (YYYY-MM-DD) and points an integer'}, status=400)
+    points = min(max(points, 3), getattr(settings, 'BP_CHART_MAX_POINTS', 2000))
+    try:
+        chart = bp_chart_series(request.user, request.GET.get('source', ''), start, end, points)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    chart['start'] = str(start) if start else None
+    chart['end'] = str(end) if end else None
+    return JsonResponse(chart)
 
 @login_required
 @require_GET
-def api_weekly_summary(request):
-    # last 7 days ending today
-    today = timezone.localdate()
-    start = today - timedelta(days=6)
-    summaries = DailySummary.objects.filter(user=request.user, date__range=(start, today)).order_by('date')
-    # basic aggregates
-    total_days = summaries.count()
-    avg = float(sum(s.total_mg for s in summaries) / total_days) if total_days else 0.0
-    daily_limit = getattr(settings, 'SODIUM_DAILY_LIMIT_MG', 2000)
-    days_over = sum(1 for s in summaries if s.total_mg >= daily_limit)
-    daily_summaries = [
-        {
-            'date': str(s.date),
-            'total_mg': s.total_mg,
-            'percent_of_limit': s.percent_of_limit,
-        }
-        for s in summaries
-    ]
+@conditional_on_data_version
+def api_bp_stages(request):
+    """Reading counts per ACC/AHA stage and time in range, optionally limited
+    to ?start= / ?end= (YYYY-MM-DD, inclusive) and ?source=manual|watch."""
+    try:
+        start = parse_date(request.GET['start']) if request.GET.get('start') else None
+        end = parse_date(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        start = end = None
+    if (request.GET.get('start') and start is None) or (request.GET.get('end') and end is None):
+        return JsonResponse({'error': 'start/end must be dates (YYYY-MM-DD)'}, status=400)
+    try:
+        distribution = bp_stage_distribution(request.user, start, end, request.GET.get('source') or None)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
     return JsonResponse({
-        'week_start': str(start),
-        'week_end': str(today),
-        'avg_daily_mg': round(avg, 1),
-        'days_over_limit': days_over,
-        'daily_summaries': daily_summaries,
+        'start': str(start) if start else None,
+        'end': str(end) if end else None,
+        **distribution,
     })
 
+@login_required
+@require_GET
+@conditional_on_data_version
+def api_bp_statistics(request):
+    """Rolling 7- and 30-day BP statistics per source: mean, SD and average
+    real variability (ARV), plus morning and evening means."""
+    return JsonResponse(bp_statistics(request.user))
 
 @login_required
 @require_GET
+@conditional_on_data_version
 def api_get_alerts(request):
     # return recent alerts (unread first)
     alerts_qs = Alert.objects.filter(user=request.user).order_by('-created_at')[:50]
@@ -205,3 +475,228 @@ def api_get_alerts(request):
         for a in alerts_qs
     ]
     return JsonResponse({'alerts': alerts})
+
+
+@login_required
+@require_GET
+def api_online_devices(request):
+    """The user's devices seen within DEVICE_ONLINE_WINDOW seconds."""
+    pending = presence.tracker.pending()
+    devices = [
+        {
+            'id': d.id,
+            'name': d.name,
+            'last_seen': max(filter(None, [d.last_seen, pending.get(d.id)])).isoformat(),
+        }
+        for d in presence.online_devices(user=request.user).order_by('name', 'id')
+    ]
+    return JsonResponse({'devices': devices})
+
+
+@login_required
+@require_POST
+def api_mark_alerts_read(request):
+    """Mark alerts as read: `{"ids": [...]}` for specific alerts, or an empty
+    body for all unread alerts."""
+    try:
+        data = json.loads(request.body.decode('utf-8') or '{}')
+    except (UnicodeDecodeError, ValueError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if ids is not None:
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'ids must be a list of integers'}, status=400)
+    return JsonResponse({'marked_read': mark_alerts_read(request.user, ids)})
+
+@csrf_exempt
+@require_POST
+def api_ingest_ndjson(request):
+    """Streaming bulk upload for gateways (`Content-Type: application/x-ndjson`).
+
+    Each line is one JSON object: a meal (`"type": "meal"`, the default, same
+    fields as `api_add_meal`) or a watch BP reading (`"type": "watch"` with
+    systolic/diastolic/pulse/recorded_at/raw). Lines are read from the request
+    stream and stored in fixed-size chunks, so memory stays flat for any upload
+    size. The response is NDJSON too: one `error` event per bad line, one
+    `progress` event per stored chunk and a final `done` event. A chunk that
+    conflicts with a concurrent upload is rolled back, and its lines are
+    reported as errors and counted as `rejected`.
+    """
+    device = _get_request_device(request)
+    if device:
+        user_obj = device.user
+    else:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        user_obj = request.user
+
+    chunk_size = getattr(settings, 'NDJSON_INGEST_CHUNK_SIZE', 500)
+    max_line_bytes = getattr(settings, 'NDJSON_MAX_LINE_BYTES', 64 * 1024)
+    source = 'spoon' if device else 'manual'
+
+    def events():
+        counts = {'lines': 0, 'meals': 0, 'watch_readings': 0, 'duplicates': 0, 'rejected': 0, 'errors': 0}
+        # (line number, parsed payload) of the lines waiting for the next flush.
+        meals, watch = [], []
+
+        def rejected(pending):
+            # A concurrent upload stored conflicting rows first; the chunk
+            # was rolled back, so report its lines instead of failing the stream.
+            counts['rejected'] += len(pending)
+            return [
+                json.dumps({'event': 'error', 'line': line_no, 'error': 'Conflicts with a concurrent upload; not stored'}) + '\n'
+                for line_no, _ in pending
+            ]
+
+        def flush():
+            lines = []
+            if meals:
+                try:
+                    stored, _ = add_meals_bulk(user_obj, [item for _, item in meals], source=source, device=device)
+                except IntegrityError:
+                    lines += rejected(meals)
+                else:
+                    created = sum(1 for _, was_created in stored if was_created)
+                    counts['meals'] += created
+                    counts['duplicates'] += len(stored) - created
+            if watch:
+                try:
+                    created = len(add_watch_readings_bulk(user_obj, [item for _, item in watch]))
+                except IntegrityError:
+                    lines += rejected(watch)
+                else:
+                    counts['watch_readings'] += created
+                    counts['duplicates'] += len(watch) - created
+            meals.clear()
+            watch.clear()
+            return lines + [json.dumps({'event': 'progress', **counts}) + '\n']
+
+        for line in _iter_request_lines(request, max_line_bytes):
+            counts['lines'] += 1
+            if line is not None and not line.strip():
+                continue
+            try:
+                if line is None:
+                    raise ValueError(f'Line exceeds {max_line_bytes} bytes')
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError('Line must be a JSON object')
+                kind = item.get('type', 'meal')
+                if kind == 'meal':
+                    meals.append((counts['lines'], _parse_meal_payload(item)))
+                elif kind == 'watch':
+                    watch.append((counts['lines'], _parse_watch_payload(item)))
+                else:
+                    raise ValueError(f'Unknown record type: {kind}')
+            except ValueError as exc:
+                counts['errors'] += 1
+                yield json.dumps({'event': 'error', 'line': counts['lines'], 'error': str(exc)}) + '\n'
+                continue
+            if len(meals) + len(watch) >= chunk_size:
+                yield from flush()
+
+        if meals or watch:
+            yield from flush()
+        yield json.dumps({'event': 'done', **counts}) + '\n'
+
+    return StreamingHttpResponse(events(), content_type='application/x-ndjson')
+
+
+# ======================================================
+#  ASYNC (ASGI) VARIANTS
+#  Served natively when running under core_fixed.asgi; a slow device
+#  connection then waits on the event loop instead of holding a worker.
+# ======================================================
+
+@csrf_exempt
+@require_POST
+async def api_add_meal_async(request):
+    """Async version of `api_add_meal` (same request and response body)."""
+    user_obj = await request.auser()
+    if not user_obj.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    try:
+        meal_kwargs = _parse_meal_payload(json.loads(request.body.decode('utf-8')))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    device = getattr(request, 'device', None)
+    if device:
+        await presence.atouch(device)
+    source = 'spoon' if device else 'manual'
+    # The write path needs a transaction, which the async ORM does not offer yet.
+    meal, created = await sync_to_async(add_device_meal)(user_obj, device, source=source, **meal_kwargs)
+    summary, advice = await aget_daily_summary_and_advice(user_obj, _meal_day(meal))
+    return JsonResponse(_add_meal_payload(meal, created, summary, advice))
+
+
+@login_required
+@require_GET
+@conditional_on_data_version
+async def api_today_summary_async(request):
+    user = await request.auser()
+    snapshot = await atoday_snapshot(user, timezone.localdate(), version=request.data_version)
+    return JsonResponse(snapshot)
+
+
+@login_required
+@require_GET
+@conditional_on_data_version
+async def api_weekly_summary_async(request):
+    user = await request.auser()
+    try:
+        day = _requested_week(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    report, summaries = await aget_weekly_report(user, day)
+    return JsonResponse(_weekly_payload(week_start(day), report, summaries))
+
+
+def _sse_message(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+@login_required
+@require_GET
+async def api_events_stream(request):
+    """Server-Sent Events for the logged-in user: `summary` (DailySummary
+    totals), `alert` (new sodium alerts), `watch_reading` (new watch BP) and
+    `refresh` (data changed in another process; refetch). Requires the ASGI
+    server mode; a sync worker would be pinned by each open stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event streams need SERVER_MODE=asgi'}, status=501)
+    user = await request.auser()
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_SECONDS', 20)
+
+    async def stream():
+        queue = events.broker.subscribe(user.pk)
+        try:
+            # The session lookups above opened this request's DB connection;
+            # polling closes it, so an idle stream holds none between heartbeats.
+            version = await sync_to_async(poll_data_version)(user)
+            delivered = False
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    latest = await sync_to_async(poll_data_version)(user)
+                    if latest != version and not delivered:
+                        yield _sse_message('refresh', {'version': latest})
+                    else:
+                        yield ': keepalive\n\n'
+                    version, delivered = latest, False
+                    continue
+                delivered = True
+                yield _sse_message(message['event'], message['data'])
+        finally:
+            events.broker.unsubscribe(user.pk, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+# Start script for Render.com deployment
+#
+# SERVER_MODE=wsgi (default): classic sync gunicorn workers.
+# SERVER_MODE=asgi: gunicorn managing uvicorn workers on core_fixed.asgi, so
+# the async device/sodium views can hold many slow connections per process.
+
+set -o errexit  # Exit on error
+
+cd core_fixed
+
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn core_fixed.asgi:application \
+        --worker-class uvicorn_worker.UvicornWorker \
+        --workers "${WEB_CONCURRENCY:-2}"
+else
+    exec gunicorn core_fixed.wsgi:application
+fi
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Load-test the sodium API in sync (WSGI) and async (ASGI) serving modes.
+
+Opens many concurrent device connections with a stdlib asyncio HTTP client, so
+the benchmark itself can hold thousands of sockets. `--trickle` sends each
+request body in small pieces over N seconds to mimic slow spoon/gateway
+uplinks, which is what pins a sync worker for the whole upload.
+
+Usage:
+  # WSGI (sync workers) against the classic endpoints
+  cd core_fixed && gunicorn core_fixed.wsgi:application -w 4 -b 127.0.0.1:8000
+  python tools/bench_sodium_api.py --token <DEVICE_TOKEN> --mode sync
+
+  # ASGI (uvicorn workers) against the async endpoints
+  cd core_fixed && SERVER_MODE=asgi gunicorn core_fixed.asgi:application \\
+      -k uvicorn_worker.UvicornWorker -w 4 -b 127.0.0.1:8000
+  python tools/bench_sodium_api.py --token <DEVICE_TOKEN> --mode async
+
+  # Both endpoint families back to back against the same server
+  python tools/bench_sodium_api.py --token <DEVICE_TOKEN> --mode both --connections 1000 --trickle 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+PATHS = {
+    'sync': {
+        'add-meal': '/dashboard/api/sodium/add-meal/',
+        'today': '/dashboard/api/sodium/today/',
+    },
+    'async': {
+        'add-meal': '/dashboard/api/async/sodium/add-meal/',
+        'today': '/dashboard/api/async/sodium/today/',
+    },
+}
+
+
+async def send_request(host, port, method, path, token, body, trickle):
+    """Send one HTTP/1.1 request and return (status, seconds)."""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = (
+            f'{method} {path} HTTP/1.1\r\n'
+            f'Host: {host}\r\n'
+            f'Authorization: Token {token}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n'
+        )
+        writer.write(head.encode('ascii'))
+        if trickle and body:
+            pieces = 8
+            step = max(1, len(body) // pieces)
+            for offset in range(0, len(body), step):
+                writer.write(body[offset:offset + step])
+                await writer.drain()
+                await asyncio.sleep(trickle / pieces)
+        else:
+            writer.write(body)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        status = int(status_line.split()[1]) if status_line else 0
+    finally:
+        writer.close()
+    return status, time.perf_counter() - started
+
+
+async def run_mode(args, mode):
+    url = urlsplit(args.base_url)
+    host, port = url.hostname, url.port or 80
+    path = PATHS[mode][args.endpoint]
+    method = 'POST' if args.endpoint == 'add-meal' else 'GET'
+    semaphore = asyncio.Semaphore(args.connections)
+
+    async def client():
+        results = []
+        for _ in range(args.requests):
+            body = b''
+            if method == 'POST':
+                body = json.dumps({
+                    'name': 'bench',
+                    'sodium_mg': 5,
+                    'reading_id': uuid.uuid4().hex,
+                }).encode('utf-8')
+            async with semaphore:
+                try:
+                    results.append(await send_request(host, port, method, path, args.token, body, args.trickle))
+                except OSError as exc:
+                    logging.debug('Connection failed: %s', exc)
+                    results.append((0, 0.0))
+        return results
+
+    started = time.perf_counter()
+    per_client = await asyncio.gather(*(client() for _ in range(args.connections)))
+    elapsed = time.perf_counter() - started
+
+    results = [r for rs in per_client for r in rs]
+    ok = sorted(t for status, t in results if 200 <= status < 300)
+    failed = len(results) - len(ok)
+    summary = {
+        'mode': mode,
+        'path': path,
+        'requests': len(results),
+        'ok': len(ok),
+        'failed': failed,
+        'seconds': round(elapsed, 2),
+        'req_per_s': round(len(ok) / elapsed, 1) if elapsed else 0.0,
+    }
+    if ok:
+        summary.update({
+            'p50_ms': round(statistics.median(ok) * 1000, 1),
+            'p95_ms': round(ok[int(len(ok) * 0.95) - 1] * 1000, 1),
+            'p99_ms': round(ok[int(len(ok) * 0.99) - 1] * 1000, 1),
+            'max_ms': round(ok[-1] * 1000, 1),
+        })
+    return summary
+
+
+async def main_async(args):
+    modes = ['sync', 'async'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        logging.info('Running %s mode: %d connections x %d requests', mode, args.connections, args.requests)
+        print(json.dumps(await run_mode(args, mode)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server base URL')
+    parser.add_argument('--token', required=True, help='Device token used for every request')
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--endpoint', choices=['add-meal', 'today'], default='add-meal')
+    parser.add_argument('--connections', type=int, default=200, help='Concurrent device connections')
+    parser.add_argument('--requests', type=int, default=5, help='Requests per connection')
+    parser.add_argument('--trickle', type=float, default=0.0, help='Seconds to spread each request body over')
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,9 @@ import time
 import os
 import argparse
 import logging
+import queue
+import threading
+import uuid
 
 import requests
 from bleak import BleakScanner, BleakClient
@@ -70,28 +73,48 @@ async def run(args):
     if not target:
         raise SystemExit('No BLE device found')
 
+    headers = {
+        'Authorization': f'Token {token}',
+        'Content-Type': 'application/json',
+    }
+
+    def post_readings(pending):
+        """Worker thread: POST queued readings, retrying with backoff, so a
+        slow server never blocks the event loop handling BLE notifications."""
+        while True:
+            payload = pending.get()
+            if payload is None:
+                return
+            for attempt in range(1, args.retries + 2):
+                try:
+                    r = requests.post(api_url, json=payload, headers=headers, timeout=8)
+                    logging.info('Posted %d mg → %s (%s)', payload['sodium_mg'], r.status_code, r.text[:200])
+                    if r.status_code < 500:
+                        break
+                except Exception as e:
+                    logging.warning('Failed to POST reading (attempt %d): %s', attempt, e)
+                if attempt <= args.retries:
+                    time.sleep(min(2 ** (attempt - 1), 8))
+
+    pending = queue.Queue()
+    poster = threading.Thread(target=post_readings, args=(pending,), daemon=True)
+    poster.start()
+
     async with BleakClient(target) as client:
         logging.info('Connected: %s', client.is_connected)
 
         def handle(sender, data):
             cond = parse_measurement(data)
             mg = max(0, round(args.a * cond + args.b))
-            payload = {
+            pending.put({
                 'name': args.name or 'Spoon reading',
                 'sodium_mg': int(mg),
                 'portion': args.portion or 'spoon',
                 'source': 'spoon',
                 'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-            }
-            headers = {
-                'Authorization': f'Token {token}',
-                'Content-Type': 'application/json',
-            }
-            try:
-                r = requests.post(api_url, json=payload, headers=headers, timeout=8)
-                logging.info('Posted %d mg → %s (%s)', mg, r.status_code, r.text[:200])
-            except Exception as e:
-                logging.warning('Failed to POST reading: %s', e)
+                # Same id on every retry so the server stores the reading only once.
+                'reading_id': uuid.uuid4().hex,
+            })
 
         logging.info('Starting notifications on %s', args.char_uuid)
         await client.start_notify(args.char_uuid, handle)
@@ -101,6 +124,10 @@ async def run(args):
         finally:
             await client.stop_notify(args.char_uuid)
 
+    # Let readings still queued (or being retried) go out before exiting.
+    pending.put(None)
+    await asyncio.to_thread(poster.join)
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -114,6 +141,7 @@ def main():
     parser.add_argument('--duration', type=int, default=120, help='Listen time in seconds')
     parser.add_argument('--name', help='Name to send with readings')
     parser.add_argument('--portion', help='Portion text to send', default='spoon')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per reading on timeout/server error')
     args = parser.parse_args()
 
     # map names to chars (Bleak uses characteristic UUID directly)